@@ -0,0 +1,108 @@
+import os
+import time
+from typing import Optional, Dict, Any, List, Tuple, Iterable
+from .config import ACCOUNT_STATUS_TTL
+from .logger import create_logger
+from .metrics import metrics
+
+class AccountStatusIndex:
+    """
+    Cached login state of every account, keyed by (provider, profile directory
+    name), so an account name and its sanitized directory share one entry.
+
+    States are read from the saved auth cookies through the adapter's
+    `login_state`, so no browser is opened. An entry is trusted for `ttl`
+    seconds and never past the expiry of the cookies it was read from.
+    Browser flows record what the page showed with `mark`, and transfers that
+    fail as not logged in mark the account "logged_out"; either corrects a
+    stale "valid" until the next read.
+    """
+
+    def __init__(self, ttl: int = ACCOUNT_STATUS_TTL) -> None:
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._stats = {"hits": 0, "misses": 0, "marks": 0}
+        self.logger = create_logger("accounts")
+
+    def _key(self, adapter, account: Optional[str]) -> Tuple[str, str]:
+        # Keyed by the profile directory name, which is also what `list` finds on disk
+        return adapter.name, adapter._sanitize(account) if account else "default"
+
+    def _store(self, key: Tuple[str, str], state: str, expires_at: Optional[float], source: str) -> Dict[str, Any]:
+        now = time.time()
+        fresh_until = now + self.ttl
+        if expires_at is not None:
+            fresh_until = min(fresh_until, expires_at)
+        entry = {
+            "provider": key[0],
+            "account": key[1],
+            "state": state,
+            "expires_at": expires_at,
+            "checked_at": now,
+            "source": source,
+            "fresh_until": fresh_until,
+        }
+        self._entries[key] = entry
+        return entry
+
+    async def get(self, adapter, account: Optional[str] = None, refresh: bool = False) -> Dict[str, Any]:
+        """
+        Returns the cached status of an account, re-reading its cookies when the
+        entry is missing, stale or `refresh` is set.
+        """
+        key = self._key(adapter, account)
+        entry = self._entries.get(key)
+        if entry is not None and not refresh and entry["fresh_until"] > time.time():
+            self._stats["hits"] += 1
+            return entry
+        self._stats["misses"] += 1
+        try:
+            result = await adapter.login_state(account)
+        except Exception as e:
+            self.logger.warning(f"Failed to read login state of {key[0]}/{key[1]}: {e}")
+            result = {"state": "unknown", "expires_at": None}
+        return self._store(key, result["state"], result.get("expires_at"), "cookies")
+
+    async def is_valid(self, adapter, account: Optional[str] = None) -> bool:
+        return (await self.get(adapter, account))["state"] == "valid"
+
+    def mark(self, adapter, account: Optional[str], state: str, source: str = "browser") -> None:
+        """Records the login state a browser flow, or a transfer result (`source="transfer"`), observed for an account."""
+        key = self._key(adapter, account)
+        previous = self._entries.get(key)
+        self._stats["marks"] += 1
+        self._store(key, state, previous["expires_at"] if previous and state == "valid" else None, source)
+
+    def invalidate(self, adapter, account: Optional[str] = None) -> None:
+        self._entries.pop(self._key(adapter, account), None)
+
+    async def list(self, adapters: Iterable[Any], refresh: bool = False) -> List[Dict[str, Any]]:
+        """Returns the status of every account that has a profile directory under each adapter."""
+        statuses = []
+        for adapter in adapters:
+            base = getattr(adapter, "user_data_dir", None)
+            if not base or not os.path.isdir(base):
+                continue
+            for entry in sorted(os.scandir(base), key=lambda e: e.name):
+                if entry.is_dir():
+                    statuses.append(await self.get(adapter, entry.name, refresh=refresh))
+        return statuses
+
+    def counts(self) -> Dict[Tuple[str, str], int]:
+        """Number of cached accounts per (provider, state)."""
+        counts: Dict[Tuple[str, str], int] = {}
+        for entry in self._entries.values():
+            key = (entry["provider"], entry["state"])
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._entries), "ttl": self.ttl, **self._stats}
+
+account_status = AccountStatusIndex()
+
+metrics.gauge(
+    "pss_account_status",
+    "Cached account login states",
+    lambda: [({"provider": provider, "state": state}, n) for (provider, state), n in account_status.counts().items()],
+)
@@ -1,98 +1,41 @@
 import os
-from typing import Optional, Dict, Any, Union
+import json
+import time
+from typing import Optional, Dict, Any, Union, List, Tuple
 import re
 from urllib.parse import urlparse, parse_qs
-from ..config import HEADLESS, ALIPAN_NODE_PATH, ALIPAN_TARGET_FOLDER, ALIPAN_USER_DATA_DIR
-from ..browser import manager
-from ..base import ShareAdapter
+from ..config import HEADLESS, ALIPAN_NODE_PATH, ALIPAN_TARGET_FOLDER, ALIPAN_USER_DATA_DIR, ALIPAN_TRANSFER_ENGINE
+from ..base import ShareAdapter, NOT_LOGGED_IN
+from ..accounts import account_status
 from ..logger import create_logger
+from ..utils.http import HttpFallback
+from ..utils.waits import wait_any, wait_visible, wait_hidden, StepTimer, ResponseWatcher
+from .alipan_http import alipan_http, copy_failures, describe_failures, parse_expiry
 
 class AlipanAdapter(ShareAdapter):
     def __init__(self) -> None:
         super().__init__()
-        self._sessions = {}
         self.user_data_dir = ALIPAN_USER_DATA_DIR
         self.logger = create_logger("alipan")
+        # The token lives in localStorage, so there is no auth cookie to watch
+        self.login_selector = "text=文件分类"
 
-    async def get_qr_code(self, account: Optional[str] = None):
-        import uuid, time, asyncio
+    async def _open_login(self, page) -> Tuple[bool, bytes]:
+        self.logger.info("Opening Alipan home page")
+        await page.goto("https://www.alipan.com/drive/home", wait_until="domcontentloaded", timeout=40000)
+        if await wait_any(page, ["text=文件分类", "text=扫码登录"]) == "text=文件分类":
+            return True, b""
         try:
-            for sid, s in list(self._sessions.items()):
-                try:
-                    ud = s.get("user_data_dir")
-                    if ud:
-                        await manager.close_context(ud)
-                    else:
-                        await s.get("ctx").close()
-                except Exception:
-                    pass
-                self._sessions.pop(sid, None)
+            btn = page.get_by_text("扫码登录", exact=False)
+            if await btn.count():
+                await btn.first.click()
         except Exception:
             pass
-        ud = self._resolve_user_data_dir(account)
-        ctx, page = await self.open_context_and_page(account)
-        try:
-            islogin = False
-            self.logger.info("Opening Alipan home page")
-            await page.goto("https://www.alipan.com/drive/home", wait_until="domcontentloaded", timeout=40000)
-            await asyncio.sleep(3)
-            btn = await page.query_selector("text=文件分类")
-            islogin = btn is not None
-            png_bytes = b""
-            if not islogin:
-                # try:
-                #     await page.goto("https://www.alipan.com/sign/in", timeout=30000)
-                # except Exception:
-                #     await page.goto("https://www.aliyundrive.com/sign/in", timeout=30000)
-                try:
-                    btn = page.get_by_text("扫码登录", exact=False)
-                    if await btn.count():
-                        await btn.first.click()
-                except Exception:
-                    pass
-                locator = page.locator(
-                    "div[class*='login']"
-                ).first
-                await asyncio.sleep(2)
-                png_bytes = await locator.screenshot()
-            session_id = str(uuid.uuid4())
-            self._sessions[session_id] = {
-                "ctx": ctx,
-                "page": page,
-                "expires_at": time.time() + 180,
-                "logged_in": islogin,
-                "user_data_dir": ud,
-            }
-            self.logger.info(f"Generated QR code session: {session_id}, login status: {islogin}")
-            return session_id, png_bytes, islogin
-        except Exception as e:
-            self.logger.error(f"get_qr_code error: {e}")
-            return str(uuid.uuid4()), b"", False
-
-    async def poll_login_status(self, session_id):
-        import asyncio, time
-        session = self._sessions.get(session_id)
-        if not session:
-            self.logger.warning(f"Session {session_id} not found for login polling")
-            return
-        page = session["page"]
-        self.logger.info(f"Starting login polling for session: {session_id}")
-        for i in range(60):
-            try:
-                btn = await page.query_selector("text=文件分类")
-                if btn is not None:
-                    session["logged_in"] = True
-                    self.logger.info(f"Login detected for session: {session_id}")
-                    try:
-                        await manager.close_context(session.get("user_data_dir"))
-                    except Exception:
-                        pass
-                    return
-            except Exception:
-                pass
-            await asyncio.sleep(3)
-        self.logger.warning(f"Login polling timed out for session: {session_id}")
-        self._sessions.pop(session_id, None)
+        locator = page.locator(
+            "div[class*='login']"
+        ).first
+        await wait_visible(locator)
+        return False, await locator.screenshot()
 
     @property
     def name(self) -> str:
@@ -115,33 +58,87 @@ class AlipanAdapter(ShareAdapter):
                 url = url.split(m2.group(1))[0]
         return {"url": url, "code": code}
 
-    async def transfer(self, link: str, account: Optional[str] = None, cookie_str: Optional[Any] = None) -> Dict[str, Any]:
-        self.logger.info(f"Starting transfer for link: {link[:50]}..." if len(link) > 50 else f"Starting transfer for link: {link}")
-        ctx, page = await self.open_context_and_page(account, cookie_str=cookie_str)
+    def _share_parts(self, url: str) -> Optional[re.Match]:
+        return re.match(r'^/s/([\w-]+)(?:/folder/([\w-]+))?', urlparse(url).path)
+
+    def share_key(self, link: str) -> str:
         info = self._extract(link)
         url = (info["url"] or "").strip().strip('`"')
+        m = self._share_parts(url)
+        if not m:
+            return super().share_key(url)
+        share = m.group(1) if not m.group(2) else f"{m.group(1)}/{m.group(2)}"
+        return f"{self.name}:{share}:{info.get('code') or ''}"
+
+    async def preflight(self, link: str) -> str:
+        info = self._extract(link)
+        url = (info["url"] or "").strip().strip('`"')
+        m = self._share_parts(url) if url else None
+        if not m:
+            return "unknown"
+        return await alipan_http.check(m.group(1), info.get("code"))
+
+    async def login_state(self, account: Optional[str] = None) -> Dict[str, Any]:
+        # The session is the web app's localStorage token rather than a cookie
+        value = await self.local_storage_item("alipan.com", "token", account)
         try:
-            self.logger.info("Opening Alipan home page")
+            token = json.loads(value) if value else None
+        except ValueError:
+            token = None
+        if not isinstance(token, dict) or not token.get("access_token"):
+            return {"state": "missing", "expires_at": None}
+        expires_at = parse_expiry(token.get("expire_time")) or None
+        if expires_at is None:
+            return {"state": "unknown", "expires_at": None}
+        return {"state": "valid" if expires_at > time.time() else "expired", "expires_at": expires_at}
+
+    def _fail(self, url: str, message: str, status: str = "fail") -> Dict[str, Any]:
+        return {
+            "status": status,
+            "provider": self.name,
+            "share_link": url,
+            "target_path": None,
+            "message": message,
+        }
+
+    async def _check_login(self, page) -> bool:
+        timer = StepTimer(self.logger, "check_login", self.name)
+        self.logger.info("Opening Alipan home page")
+        with timer.step("goto_home"):
             await page.goto("https://www.alipan.com/drive/home", timeout=30000)
-            await page.wait_for_timeout(1000)
-            await page.wait_for_selector("text=文件分类", timeout=30000)
-            self.logger.info(f"Opening share page: {url}")
+        with timer.step("login_marker"):
+            marker = await wait_any(page, ["text=文件分类", "text=扫码登录"], timeout=30000)
+        timer.log()
+        if marker != "text=文件分类":
+            self.logger.warning("Drive home did not load, login required")
+            return False
+        return True
+
+    async def _save_share(self, page, link: str) -> Dict[str, Any]:
+        timer = StepTimer(self.logger, "save_share", self.name)
+        try:
+            return await self._save_share_steps(page, link, timer)
+        finally:
+            timer.log()
+
+    async def _save_share_steps(self, page, link: str, timer: StepTimer) -> Dict[str, Any]:
+        info = self._extract(link)
+        url = (info["url"] or "").strip().strip('`"')
+        self.logger.info(f"Opening share page: {url}")
+        with timer.step("goto_share"):
             await page.goto(url, wait_until="domcontentloaded", timeout=40000)
-            await page.wait_for_timeout(1000)
-            try:
-                need_pwd = page.get_by_text("分享了文件", exact=False)
-                cnt = await need_pwd.count()
-                self.logger.info(f"Need password check: {cnt}")
-                if cnt:
-                    code = info.get("code")
-                    if not code:
-                        self.logger.error("Missing code for password-protected share")
-                        return {
-                            "status": "fail",
-                            "provider": self.name,
-                            "share_link": url,
-                            "message": "缺少提取码",
-                        }
+        with timer.step("share_ready"):
+            await wait_any(page, ["text=分享了文件", "text=立即保存"])
+        try:
+            need_pwd = page.get_by_text("分享了文件", exact=False)
+            cnt = await need_pwd.count()
+            self.logger.info(f"Need password check: {cnt}")
+            if cnt:
+                code = info.get("code")
+                if not code:
+                    self.logger.error("Missing code for password-protected share")
+                    return self._fail(url, "缺少提取码")
+                with timer.step("enter_code"):
                     inp = await page.query_selector("input[placeholder*=请输入提取码], input[type='text']")
                     if inp:
                         try:
@@ -158,97 +155,207 @@ class AlipanAdapter(ShareAdapter):
                         except Exception:
                             pass
                     await page.wait_for_load_state("domcontentloaded", timeout=30000)
-            except Exception as e:
-                self.logger.warning(f"Error during password handling: {e}")
-                pass
+        except Exception as e:
+            self.logger.warning(f"Error during password handling: {e}")
+            pass
 
+        try:
             try:
+                btn1 = page.get_by_role("button", name="立即保存", exact=False)
+                await btn1.wait_for(state="visible", timeout=30000)
+                self.logger.info("Clicking '立即保存'")
+                await btn1.first.click()
+            except Exception:
                 try:
-                    btn1 = page.get_by_role("button", name="立即保存", exact=False)
-                    await btn1.wait_for(state="visible", timeout=30000)
-                    self.logger.info("Clicking '立即保存'")
-                    await btn1.first.click()
-                except Exception:
-                    try:
-                        alt1 = page.get_by_text("立即保存", exact=False)
-                        alt1_cnt = await alt1.count()
-                        self.logger.info(f"Clicking '立即保存' alt: {alt1_cnt}")
-                        if alt1_cnt:
-                            await alt1.first.wait_for(state="visible", timeout=30000)
-                            await alt1.first.click()
-                        else:
-                            css1 = page.locator("button:has-text('立即保存'), [class*='btn-save']")
-                            css1_cnt = await css1.count()
-                            self.logger.info(f"Clicking '立即保存' css: {css1_cnt}")
-                            if css1_cnt:
-                                await css1.first.wait_for(state="visible", timeout=30000)
-                                await css1.first.click()
-                    except Exception as e_alt1:
-                        self.logger.warning(f"Error clicking '立即保存': {e_alt1}")
-                        pass
-            except Exception as e_primary1:
-                self.logger.warning(f"Error clicking primary '立即保存': {e_primary1}")
-                pass
+                    alt1 = page.get_by_text("立即保存", exact=False)
+                    alt1_cnt = await alt1.count()
+                    self.logger.info(f"Clicking '立即保存' alt: {alt1_cnt}")
+                    if alt1_cnt:
+                        await alt1.first.wait_for(state="visible", timeout=30000)
+                        await alt1.first.click()
+                    else:
+                        css1 = page.locator("button:has-text('立即保存'), [class*='btn-save']")
+                        css1_cnt = await css1.count()
+                        self.logger.info(f"Clicking '立即保存' css: {css1_cnt}")
+                        if css1_cnt:
+                            await css1.first.wait_for(state="visible", timeout=30000)
+                            await css1.first.click()
+                except Exception as e_alt1:
+                    self.logger.warning(f"Error clicking '立即保存': {e_alt1}")
+                    pass
+        except Exception as e_primary1:
+            self.logger.warning(f"Error clicking primary '立即保存': {e_primary1}")
+            pass
+
+        with timer.step("save_dialog"):
+            await wait_any(page, ["text=保存到根目录", "text=保存到此处"], timeout=10000)
+
+        try:
+            btn = page.get_by_text("保存到根目录", exact=False)
+            await btn.wait_for(state="visible", timeout=30000)
+            btn_root_cnt = await btn.count()
+            self.logger.info(f"Clicking '保存到根目录': {btn_root_cnt}")
+            if btn_root_cnt:
+                sbtn = page.get_by_text("来自分享", exact=False)
+                await sbtn.wait_for(state="visible", timeout=30000)
+                self.logger.info("Clicking '来自分享'")
+                await sbtn.first.click()
+        except Exception:
+            pass
+
+        with timer.step("save_done"):
+            status, message = await self._click_save_here(page)
+        if status != "success":
+            self.logger.warning(f"Transfer failed: {message}")
+            return self._fail(link, message, status=status)
+        self.logger.info("Transfer completed successfully")
+        return {
+            "status": "success",
+            "provider": self.name,
+            "share_link": link,
+            "target_path": None,
+            "message": message,
+        }
+
+    async def _click_save_here(self, page) -> Tuple[str, str]:
+        def _is_copy(r) -> bool:
+            return r.request.method == "POST" and ("/batch" in r.url or "/file/copy" in r.url)
 
+        async with ResponseWatcher(page, _is_copy) as watcher:
+            await self._press_save_here(page)
+            response = await watcher.wait()
+        if response is None:
+            self.logger.warning("No copy response observed, checking save dialog")
+            closed = await wait_hidden(page, "button:has-text('保存到此处')")
+            return ("success", "transferred") if closed else ("fail", "未检测到转存结果")
+        try:
+            body = await response.json()
+        except Exception:
+            body = None
+        failed = copy_failures(body)
+        if failed is not None:
+            total = len(body["responses"])
+        elif response.status < 400:
+            return "success", "transferred"
+        else:
+            # A single /file/copy call
+            code = body.get("code") if isinstance(body, dict) else None
+            failed, total = [code or str(response.status)], 1
+        self.logger.info(f"Copy responded with {len(failed)}/{total} failure(s)")
+        return describe_failures(failed, total)
+
+    async def _press_save_here(self, page) -> None:
+        try:
+            btn2 = page.get_by_role("button", name="保存到此处", exact=False)
+            await btn2.wait_for(state="visible", timeout=30000)
+            self.logger.info("Clicking '保存到此处'")
+            await btn2.first.click()
+        except Exception:
             try:
-                await page.wait_for_load_state("networkidle", timeout=10000)
-            except Exception:
+                alt2 = page.get_by_text("保存到此处", exact=False)
+                alt2_cnt = await alt2.count()
+                self.logger.info(f"Clicking '保存到此处' alt: {alt2_cnt}")
+                if alt2_cnt:
+                    await alt2.first.wait_for(state="visible", timeout=30000)
+                    await alt2.first.click()
+                else:
+                    css2 = page.locator("button:has-text('保存到此处')")
+                    css2_cnt = await css2.count()
+                    self.logger.info(f"Clicking '保存到此处' css: {css2_cnt}")
+                    if css2_cnt:
+                        await css2.first.wait_for(state="visible", timeout=30000)
+                        await css2.first.click()
+            except Exception as e_alt2:
+                self.logger.warning(f"Error clicking '保存到此处': {e_alt2}")
                 pass
 
+    async def _transfer_http(self, link: str, account: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Tries the browser-free engine; returns None when the browser flow has to take over.
+        """
+        info = self._extract(link)
+        url = (info["url"] or "").strip().strip('`"')
+        m = self._share_parts(url) if url else None
+        try:
+            if not m:
+                raise HttpFallback("unrecognized_share_url")
+            token = await self.local_storage_item("alipan.com", "token", account) or await self.local_storage_item("aliyundrive.com", "token", account)
+            with StepTimer(self.logger, "http_transfer", self.name).step("save"):
+                status, message = await alipan_http.save(m.group(1), m.group(2), info.get("code"), token, ALIPAN_TARGET_FOLDER)
+        except HttpFallback as e:
+            if ALIPAN_TRANSFER_ENGINE == "http":
+                self.logger.error(f"HTTP transfer failed: {e}")
+                return self._fail(link, str(e), status="error")
+            self.logger.info(f"HTTP engine fell back to browser: {e}")
+            return None
+        self.logger.info(f"HTTP transfer finished: {status} {message}")
+        if status != "success":
+            return self._fail(link, message, status=status)
+        return {
+            "status": "success",
+            "provider": self.name,
+            "share_link": link,
+            "target_path": None,
+            "message": message,
+        }
+
+    async def transfer(self, link: str, account: Optional[str] = None, cookie_str: Optional[Any] = None) -> Dict[str, Any]:
+        self.logger.info(f"Starting transfer for link: {link[:50]}..." if len(link) > 50 else f"Starting transfer for link: {link}")
+        if ALIPAN_TRANSFER_ENGINE != "browser":
+            result = await self._transfer_http(link, account)
+            if result is not None:
+                return self._note_login(account, result)
+        ctx, page = await self.open_context_and_page(account, cookie_str=cookie_str)
+        try:
+            if not await self._logged_in(page, account):
+                return self._fail(link, NOT_LOGGED_IN)
+            return self._note_login(account, await self._save_share(page, link))
+        except Exception as e:
+            self.logger.error(f"Transfer failed: {e}")
+            # The saved session may be stale; make the next transfer check the home page
+            account_status.mark(self, account, "unknown")
+            return self._fail(link, str(e), status="error")
+        finally:
             try:
-                btn = page.get_by_text("保存到根目录", exact=False)
-                await btn.wait_for(state="visible", timeout=30000)
-                btn_root_cnt = await btn.count()
-                self.logger.info(f"Clicking '保存到根目录': {btn_root_cnt}")
-                if btn_root_cnt:
-                    sbtn = page.get_by_text("来自分享", exact=False)
-                    await sbtn.wait_for(state="visible", timeout=30000)
-                    self.logger.info("Clicking '来自分享'")
-                    await sbtn.first.click()
+                await self.release_context_and_page(page, account)
+                self.logger.info(f"Browser context released for account: {account}")
             except Exception:
-                pass
+                self.logger.warning("Failed to release browser context")
 
+    async def transfer_many(self, links: List[str], account: Optional[str] = None, cookie_str: Optional[Any] = None) -> List[Dict[str, Any]]:
+        self.logger.info(f"Starting batch transfer of {len(links)} link(s) for account: {account}")
+        results: List[Optional[Dict[str, Any]]] = [None] * len(links)
+        if ALIPAN_TRANSFER_ENGINE != "browser":
+            for idx, link in enumerate(links):
+                results[idx] = self._note_login(account, await self._transfer_http(link, account))
+        pending = [idx for idx, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        ctx, page = await self.open_context_and_page(account, cookie_str=cookie_str)
+        try:
             try:
-                btn2 = page.get_by_role("button", name="保存到此处", exact=False)
-                await btn2.wait_for(state="visible", timeout=30000)
-                self.logger.info("Clicking '保存到此处'")
-                await btn2.first.click()
-            except Exception:
+                logged_in = await self._logged_in(page, account)
+            except Exception as e:
+                self.logger.error(f"Login check failed: {e}")
+                for idx in pending:
+                    results[idx] = self._fail(links[idx], str(e), status="error")
+                return results
+            if not logged_in:
+                self.logger.warning("User not logged in, batch transfer cancelled")
+                for idx in pending:
+                    results[idx] = self._fail(links[idx], NOT_LOGGED_IN)
+                return results
+            for idx in pending:
                 try:
-                    alt2 = page.get_by_text("保存到此处", exact=False)
-                    alt2_cnt = await alt2.count()
-                    self.logger.info(f"Clicking '保存到此处' alt: {alt2_cnt}")
-                    if alt2_cnt:
-                        await alt2.first.wait_for(state="visible", timeout=30000)
-                        await alt2.first.click()
-                    else:
-                        css2 = page.locator("button:has-text('保存到此处')")
-                        css2_cnt = await css2.count()
-                        self.logger.info(f"Clicking '保存到此处' css: {css2_cnt}")
-                        if css2_cnt:
-                            await css2.first.wait_for(state="visible", timeout=30000)
-                            await css2.first.click()
-                except Exception as e_alt2:
-                    self.logger.warning(f"Error clicking '保存到此处': {e_alt2}")
-                    pass
-
-            except Exception as e_save:
-                self.logger.error(f"Click save actions failed: {e_save}")
-
-            await page.wait_for_timeout(1000)
-            self.logger.info("Transfer completed successfully")
-            return {
-                "status": "success",
-                "provider": self.name,
-                "share_link": link,
-                "target_path": None,
-                "message": "transferred",
-            }
-        except Exception as e:
-            self.logger.error(f"Transfer failed: {e}")
+                    results[idx] = self._note_login(account, await self._save_share(page, links[idx]))
+                except Exception as e:
+                    self.logger.error(f"Transfer failed: {e}")
+                    account_status.mark(self, account, "unknown")
+                    results[idx] = self._fail(links[idx], str(e), status="error")
+            return results
         finally:
             try:
-                await manager.close_context(self._resolve_user_data_dir(account))
-                self.logger.info(f"Browser context closed for account: {account}")
+                await self.release_context_and_page(page, account)
+                self.logger.info(f"Browser context released for account: {account}")
             except Exception:
-                self.logger.warning("Failed to close browser context")
+                self.logger.warning("Failed to release browser context")
@@ -0,0 +1,221 @@
+import json
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+import httpx
+from ..config import ALIPAN_API_BASE
+from ..utils.http import get_client, HttpFallback
+from ..logger import create_logger
+
+# API error code -> (status, message); unlisted codes are handed to the browser flow
+ALIPAN_ERRORS: Dict[str, Tuple[str, str]] = {
+    "InvalidResource.SharePwd": ("fail", "提取码错误"),
+    "ShareLink.Cancelled": ("fail", "分享链接已取消"),
+    "ShareLink.Expired": ("fail", "分享链接已过期"),
+    "ShareLink.Forbidden": ("fail", "分享链接已被封禁"),
+    "NotFound.ShareLink": ("fail", "分享链接不存在"),
+    "QuotaExhausted.Drive": ("fail", "网盘空间不足"),
+}
+
+_LIST_PAGE_SIZE = 100
+_BATCH_SIZE = 100
+
+def parse_expiry(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value) / 1000 if value > 1e12 else float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+def copy_failures(data: Any) -> Optional[List[str]]:
+    """
+    Returns the error codes of the failed copies in a /batch response body
+    (empty when all succeeded), or None when the body is not a batch response.
+    """
+    responses = data.get("responses") if isinstance(data, dict) else None
+    if not isinstance(responses, list):
+        return None
+    failed: List[str] = []
+    for resp in responses:
+        if int(resp.get("status") or 0) >= 400:
+            failed.append((resp.get("body") or {}).get("code") or str(resp.get("status")))
+    return failed
+
+def describe_failures(failed: List[str], total: int) -> Tuple[str, str]:
+    """Maps copy failures to (status, message); unknown codes get a generic message."""
+    if not failed:
+        return "success", "transferred"
+    if len(failed) < total:
+        return "fail", f"部分文件转存失败（{len(failed)}/{total}）"
+    return ALIPAN_ERRORS.get(failed[0], ("fail", f"转存失败（{failed[0]}）"))
+
+class AlipanHttpEngine:
+    """
+    Saves an Alipan share through the web API using the access token the web app
+    keeps in localStorage: one call for the share token, paged listing of the
+    shared folder, then batched /file/copy requests into the target folder.
+    Raises HttpFallback whenever the browser flow should take over.
+    """
+
+    def __init__(self, base_url: str = ALIPAN_API_BASE) -> None:
+        self.base_url = base_url
+        self._share_tokens: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._folders: Dict[Tuple[str, str], str] = {}
+        self.logger = create_logger("alipan-http")
+
+    async def _call(self, path: str, body: Dict[str, Any], access_token: Optional[str] = None, share_token: Optional[str] = None) -> Dict[str, Any]:
+        headers = {"Referer": "https://www.alipan.com/", "Origin": "https://www.alipan.com"}
+        if access_token:
+            headers["Authorization"] = f"Bearer {access_token}"
+        if share_token:
+            headers["x-share-token"] = share_token
+        try:
+            resp = await get_client().post(f"{self.base_url}{path}", json=body, headers=headers)
+        except httpx.HTTPError as e:
+            raise HttpFallback(f"request_failed:{path}:{e}")
+        try:
+            data = resp.json()
+        except ValueError:
+            raise HttpFallback(f"non_json_response:{path}:{resp.status_code}")
+        if resp.status_code >= 400:
+            code = data.get("code") if isinstance(data, dict) else None
+            if code in ALIPAN_ERRORS:
+                return {"code": code}
+            raise HttpFallback(f"api_error:{path}:{resp.status_code}:{code}")
+        if not isinstance(data, dict):
+            raise HttpFallback(f"unexpected_response:{path}")
+        return data
+
+    async def _share_token(self, share_id: str, code: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        key = (share_id, code or "")
+        cached = self._share_tokens.get(key)
+        if cached and cached[1] > time.time() + 60:
+            return cached[0], None
+        data = await self._call("/v2/share_link/get_share_token", {"share_id": share_id, "share_pwd": code or ""})
+        if "code" in data:
+            return None, data["code"]
+        token = data.get("share_token")
+        if not token:
+            raise HttpFallback("share_token_missing")
+        self._share_tokens[key] = (token, time.time() + float(data.get("expires_in") or 7200))
+        return token, None
+
+    async def _list(self, share_id: str, parent_id: str, access_token: str, share_token: str) -> List[str]:
+        file_ids: List[str] = []
+        marker = ""
+        while True:
+            body = {"share_id": share_id, "parent_file_id": parent_id, "limit": _LIST_PAGE_SIZE, "order_by": "name", "order_direction": "ASC"}
+            if marker:
+                body["marker"] = marker
+            data = await self._call("/adrive/v2/file/list_by_share", body, access_token, share_token)
+            file_ids.extend(item["file_id"] for item in data.get("items") or [] if item.get("file_id"))
+            marker = data.get("next_marker") or ""
+            if not marker:
+                return file_ids
+
+    async def _target_folder(self, drive_id: str, name: str, access_token: str) -> Optional[str]:
+        if not name:
+            return "root"
+        key = (drive_id, name)
+        if key in self._folders:
+            return self._folders[key]
+        query = f'parent_file_id = "root" and type = "folder" and name = {json.dumps(name, ensure_ascii=False)}'
+        data = await self._call("/adrive/v3/file/search", {"drive_id": drive_id, "query": query, "limit": 1}, access_token)
+        items = data.get("items") or []
+        if not items:
+            return None
+        self._folders[key] = items[0]["file_id"]
+        return self._folders[key]
+
+    async def check(self, share_id: str, code: Optional[str]) -> str:
+        """
+        Classifies a share anonymously: "valid", "expired", "not_found",
+        "password_required", "invalid_code" or "unknown".
+        """
+        try:
+            data = await self._call(f"/adrive/v3/share_link/get_share_by_anonymous?share_id={share_id}", {"share_id": share_id})
+            if data.get("code") in ("ShareLink.Cancelled", "ShareLink.Expired", "ShareLink.Forbidden"):
+                return "expired"
+            if data.get("code") == "NotFound.ShareLink":
+                return "not_found"
+            if not data.get("has_pwd"):
+                return "valid"
+            if not code:
+                return "password_required"
+            _, error = await self._share_token(share_id, code)
+        except HttpFallback as e:
+            self.logger.warning(f"Preflight failed for {share_id}: {e}")
+            return "unknown"
+        if error is None:
+            return "valid"
+        return {"InvalidResource.SharePwd": "invalid_code", "NotFound.ShareLink": "not_found"}.get(error, "expired")
+
+    async def save(self, share_id: str, folder_id: Optional[str], code: Optional[str], token_value: Optional[str], target_folder: str) -> Tuple[str, str]:
+        """
+        Copies the files of a share (or of one shared folder) into `target_folder`.
+
+        Args:
+            share_id: Share ID from "/s/<share_id>"
+            folder_id: Optional shared sub-folder from "/s/<share_id>/folder/<folder_id>"
+            code: Extraction code, if the share has one
+            token_value: Raw localStorage "token" JSON saved by the web app
+            target_folder: Folder name under the drive root; empty means the root itself
+
+        Returns:
+            (status, message) in the same vocabulary as the browser flow
+        """
+        try:
+            token = json.loads(token_value) if token_value else None
+        except ValueError:
+            token = None
+        if not isinstance(token, dict) or not token.get("access_token"):
+            raise HttpFallback("no_access_token")
+        if parse_expiry(token.get("expire_time")) <= time.time() + 60:
+            # Only the web app can refresh the token; the browser flow does that for us
+            raise HttpFallback("access_token_expired")
+        access_token = token["access_token"]
+        drive_id = token.get("resource_drive_id") or token.get("default_drive_id")
+        if not drive_id:
+            raise HttpFallback("drive_id_missing")
+        start = time.time()
+
+        share_token, error = await self._share_token(share_id, code)
+        if error:
+            if error == "InvalidResource.SharePwd" and not code:
+                return "fail", "缺少提取码"
+            return ALIPAN_ERRORS[error]
+        file_ids = await self._list(share_id, folder_id or "root", access_token, share_token)
+        if not file_ids:
+            return "fail", "分享中没有可转存的文件"
+        parent_id = await self._target_folder(drive_id, target_folder, access_token)
+        if parent_id is None:
+            return "fail", "转存目录不存在"
+
+        failed: List[str] = []
+        for i in range(0, len(file_ids), _BATCH_SIZE):
+            chunk = file_ids[i:i + _BATCH_SIZE]
+            body = {
+                "resource": "file",
+                "requests": [
+                    {
+                        "id": str(n),
+                        "method": "POST",
+                        "url": "/file/copy",
+                        "headers": {"Content-Type": "application/json"},
+                        "body": {"file_id": file_id, "share_id": share_id, "auto_rename": True, "to_drive_id": drive_id, "to_parent_file_id": parent_id},
+                    }
+                    for n, file_id in enumerate(chunk)
+                ],
+            }
+            data = await self._call("/adrive/v4/batch", body, access_token, share_token)
+            chunk_failed = copy_failures(data)
+            if chunk_failed is None:
+                raise HttpFallback("batch_response_missing")
+            failed.extend(chunk_failed)
+        self.logger.info(f"Copied {len(file_ids) - len(failed)}/{len(file_ids)} item(s) from share {share_id} in {time.time() - start:.2f}s")
+        if failed and len(failed) == len(file_ids) and failed[0] not in ALIPAN_ERRORS:
+            raise HttpFallback(f"copy_failed:{failed[0]}")
+        return describe_failures(failed, len(file_ids))
+
+alipan_http = AlipanHttpEngine()
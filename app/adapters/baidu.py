@@ -1,99 +1,47 @@
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any, Union, List, Tuple
 import re
 from urllib.parse import urlparse, parse_qs
-from ..config import BAIDU_NODE_PATH, BAIDU_TARGET_FOLDER, BAIDU_USER_DATA_DIR
-from ..browser import manager
-from ..base import ShareAdapter
+from ..config import BAIDU_NODE_PATH, BAIDU_TARGET_FOLDER, BAIDU_USER_DATA_DIR, BAIDU_TRANSFER_ENGINE
+from ..base import ShareAdapter, NOT_LOGGED_IN
+from ..accounts import account_status
 from ..logger import create_logger
+from ..utils.http import HttpFallback
+from ..utils.waits import wait_any, wait_visible, wait_hidden, StepTimer, ResponseWatcher, SHORT_TIMEOUT
+from .baidu_http import baidu_http, describe_errno
 
 
 class BaiduAdapter(ShareAdapter):
     def __init__(self):
         super().__init__()
-        self._sessions = {}
         self.user_data_dir = BAIDU_USER_DATA_DIR
         self.logger = create_logger("baidu")
+        self.login_selector = "text=去登录"
+        self.login_selector_state = "detached"
+        self.login_url = re.compile(r"pan\.baidu\.com/disk/")
+        self.login_cookies = ("BDUSS", "STOKEN")
+        self.cookie_domain = "baidu.com"
 
-    async def get_qr_code(self, account: Optional[str] = None):
-        import uuid, time, asyncio
+    async def _open_login(self, page) -> Tuple[bool, bytes]:
+        await page.goto("https://pan.baidu.com/", timeout=30000)
+        if await wait_any(page, ["text=我的文件", "text=去登录"]) == "text=我的文件":
+            return True, b""
         try:
-            for sid, s in list(self._sessions.items()):
-                try:
-                    ud = s.get("user_data_dir")
-                    if ud:
-                        await manager.close_context(ud)
-                    else:
-                        await s.get("ctx").close()
-                except Exception:
-                    pass
-                self._sessions.pop(sid, None)
-        except Exception:
+            btn = page.get_by_text("去登录", exact=False)
+            if await btn.count():
+                await btn.first.click()
+        except:
             pass
-        ud = self._resolve_user_data_dir(account)
-        ctx, page = await self.open_context_and_page(account)
         try:
-            islogin = False
-            await page.goto("https://pan.baidu.com/", timeout=30000)
-            await asyncio.sleep(3)
-            btn = await page.query_selector("text=我的文件")
-            islogin = btn is not None
-            png_bytes = b""
-            if not islogin:
-                try:
-                    btn = page.get_by_text("去登录", exact=False)
-                    if await btn.count():
-                        await btn.first.click()
-                except:
-                    pass
-                try:
-                    btn = page.get_by_text("扫码登录", exact=False)
-                    if await btn.count():
-                        await btn.first.click()
-                except:
-                    pass
-                locator = page.locator(
-                    "div[class*='pass-login-pop-form'], img[class*='tang-pass-qrcode-img'], canvas, img[alt*=二维码], img[src*='qr']"
-                ).first
-                await asyncio.sleep(2)
-                png_bytes = await locator.screenshot()
-            session_id = str(uuid.uuid4())
-            self._sessions[session_id] = {
-                "ctx": ctx,
-                "page": page,
-                "expires_at": time.time() + 180,
-                "logged_in": islogin,
-                "user_data_dir": ud,
-            }
-            self.logger.info(f"Generated QR code session: {session_id}, login status: {islogin}")
-            return session_id, png_bytes, islogin
-        except Exception as e:
-            self.logger.error(f"get_qr_code error: {e}")
-            return str(uuid.uuid4()), b"", False
-
-    async def poll_login_status(self, session_id):
-        import asyncio
-        session = self._sessions.get(session_id)
-        if not session:
-            self.logger.warning(f"Session {session_id} not found for login polling")
-            return
-        page = session["page"]
-        self.logger.info(f"Starting login polling for session: {session_id}")
-        for _ in range(60):
-            try:
-                btn = await page.query_selector("text=去登录")
-                if btn is None:
-                    session["logged_in"] = True
-                    self.logger.info(f"Login detected for session: {session_id}")
-                    try:
-                        await manager.close_context(session.get("user_data_dir"))
-                    except Exception:
-                        pass
-                    return
-            except Exception:
-                pass
-            await asyncio.sleep(3)
-        self.logger.warning(f"Login polling timed out for session: {session_id}")
-        self._sessions.pop(session_id, None)
+            btn = page.get_by_text("扫码登录", exact=False)
+            if await btn.count():
+                await btn.first.click()
+        except:
+            pass
+        locator = page.locator(
+            "div[class*='pass-login-pop-form'], img[class*='tang-pass-qrcode-img'], canvas, img[alt*=二维码], img[src*='qr']"
+        ).first
+        await wait_visible(locator)
+        return False, await locator.screenshot()
 
     @property
     def name(self) -> str:
@@ -116,50 +64,80 @@ class BaiduAdapter(ShareAdapter):
                 url = url.split(m2.group(1))[0]
         return {"url": url, "code": code}
 
-    async def transfer(self, link: str, account: Optional[str] = None, cookie_str: Optional[Any] = None) -> Dict[str, Any]:
-        self.logger.info(f"Starting transfer for link: {link[:50]}..." if len(link) > 50 else f"Starting transfer for link: {link}")
-        ctx, page = await self.open_context_and_page(account, cookie_str=cookie_str)
-        try:
-            info = self._extract(link)
-            url = (info["url"] or "").strip().strip('`"')
-            self.logger.info("Opening home page")
+    def _surl(self, url: str) -> Optional[str]:
+        parsed = urlparse(url)
+        m = re.match(r'^/s/1([\w-]+)', parsed.path)
+        return m.group(1) if m else (parse_qs(parsed.query).get("surl") or [None])[0]
+
+    def share_key(self, link: str) -> str:
+        info = self._extract(link)
+        url = (info["url"] or "").strip().strip('`"')
+        surl = self._surl(url)
+        if not surl:
+            return super().share_key(url)
+        return f"{self.name}:{surl}:{(info.get('code') or '').lower()}"
+
+    async def preflight(self, link: str) -> str:
+        info = self._extract(link)
+        url = (info["url"] or "").strip().strip('`"')
+        surl = self._surl(url) if url else None
+        if not surl:
+            return "unknown"
+        return await baidu_http.check(surl, info.get("code"))
+
+    def _share_url(self, link: str) -> str:
+        """Normalized share URL reported as `share_link` in every result."""
+        return (self._extract(link)["url"] or "").strip().strip('`"')
+
+    def _fail(self, url: str, message: str, status: str = "fail") -> Dict[str, Any]:
+        return {
+            "status": status,
+            "provider": self.name,
+            "share_link": url,
+            "target_path": None,
+            "message": message,
+        }
+
+    async def _check_login(self, page) -> bool:
+        timer = StepTimer(self.logger, "check_login", self.name)
+        self.logger.info("Opening home page")
+        with timer.step("goto_home"):
             await page.goto("https://pan.baidu.com/", wait_until="domcontentloaded", timeout=30000)
-            await page.wait_for_timeout(1000)
-            need_login = await page.query_selector("text=去登录") is not None
-            self.logger.info(f"Login required: {need_login}")
-            if need_login:
-                self.logger.warning("User not logged in, transfer cancelled")
-                return {
-                    "status": "fail",
-                    "provider": self.name,
-                    "share_link": url,
-                    "message": "未登录，请先扫码登录后再转存",
-                }
-            if not url:
-                self.logger.error("Invalid share URL")
-                return {
-                    "status": "fail",
-                    "provider": self.name,
-                    "share_link": url,
-                    "message": "分享链接无效",
-                }
-            self.logger.info(f"Opening share page: {url}")
+        with timer.step("login_marker"):
+            marker = await wait_any(page, ["text=去登录", "text=我的文件"])
+            need_login = marker == "text=去登录" if marker else await page.query_selector("text=去登录") is not None
+        timer.log()
+        self.logger.info(f"Login required: {need_login}")
+        return not need_login
+
+    async def _save_share(self, page, link: str) -> Dict[str, Any]:
+        timer = StepTimer(self.logger, "save_share", self.name)
+        try:
+            return await self._save_share_steps(page, link, timer)
+        finally:
+            timer.log()
+
+    async def _save_share_steps(self, page, link: str, timer: StepTimer) -> Dict[str, Any]:
+        info = self._extract(link)
+        url = (info["url"] or "").strip().strip('`"')
+        if not url:
+            self.logger.error("Invalid share URL")
+            return self._fail(url, "分享链接无效")
+        self.logger.info(f"Opening share page: {url}")
+        with timer.step("goto_share"):
             await page.goto(url, wait_until="domcontentloaded", timeout=40000)
-            await page.wait_for_timeout(1000)
-            try:
-                need_pwd = page.get_by_text("提取码", exact=False)
-                cnt = await need_pwd.count()
-                self.logger.info(f"Need password check: {cnt}")
-                if cnt:
-                    code = info.get("code")
-                    if not code:
-                        self.logger.error("Missing code for password-protected share")
-                        return {
-                            "status": "fail",
-                            "provider": self.name,
-                            "share_link": url,
-                            "message": "缺少提取码",
-                        }
+        with timer.step("share_ready"):
+            await wait_any(page, ["text=提取码", "text=保存到网盘"])
+        try:
+            need_pwd = page.get_by_text("提取码", exact=False)
+            cnt = await need_pwd.count()
+            self.logger.info(f"Need password check: {cnt}")
+            if cnt:
+                code = info.get("code")
+                if not code:
+                    self.logger.error("Missing code for password-protected share")
+                    return self._fail(url, "缺少提取码")
+                with timer.step("enter_code"):
                     inp = await page.query_selector("input[name*=pwd], input[aria-label*=提取码], input[type='text']")
                     if inp:
                         try:
@@ -176,10 +154,11 @@ class BaiduAdapter(ShareAdapter):
                         except Exception:
                             pass
                     await page.wait_for_load_state("domcontentloaded", timeout=30000)
-            except Exception as e:
-                self.logger.warning(f"Error during password handling: {e}")
-                pass
+        except Exception as e:
+            self.logger.warning(f"Error during password handling: {e}")
+            pass
 
+        with timer.step("save_button"):
             try:
                 self.logger.info("Waiting for '保存到网盘' button")
                 await page.wait_for_selector("text=保存到网盘", timeout=30000)
@@ -187,78 +166,186 @@ class BaiduAdapter(ShareAdapter):
                 self.logger.info("Falling back to network idle wait")
                 await page.wait_for_load_state("networkidle", timeout=30000)
 
-            if BAIDU_TARGET_FOLDER:
-                self.logger.info("Selecting save path panel")
-                btn_path = await page.query_selector('div[class*="bottom-save-path"]') or await page.query_selector('div[class*="save-path"]')
-                if btn_path:
-                    try:
-                        await btn_path.click()
-                        self.logger.info("Save path panel opened")
-                    except Exception:
-                        self.logger.warning("Failed to open save path panel")
-                try:
-                    await page.wait_for_selector("div[class*='file-tree-container'], div[class*='file-tree']", timeout=30000)
-                except Exception:
-                    pass
+        if BAIDU_TARGET_FOLDER:
+            with timer.step("select_folder"):
+                await self._select_folder(page)
+
+        with timer.step("save_click"):
+            status, message = await self._click_save(page)
 
-                self.logger.info(f"Locating folder: {BAIDU_NODE_PATH}")
-                folder = await page.query_selector(f'[node-path="{BAIDU_NODE_PATH}"]')
-                if folder is None:
-                    loc = page.get_by_text(BAIDU_TARGET_FOLDER, exact=False)
-                    if await loc.count():
-                        folder = loc.first
-                if folder is not None:
-                    try:
-                        await folder.click()
-                        self.logger.info("Folder selected")
-                    except Exception:
-                        self.logger.warning("Failed to select folder")
-                await page.wait_for_timeout(500)
-                confirm = await page.query_selector('[node-type="confirm"]')
-                if confirm is None:
-                    loc = page.get_by_text("确认", exact=False)
-                    if await loc.count():
-                        confirm = loc.first
-                if confirm is not None:
-                    try:
-                        await confirm.click()
-                        self.logger.info("Path confirmed")
-                    except Exception:
-                        self.logger.warning("Failed to confirm path")
-                await page.wait_for_timeout(800)
+        if status != "success":
+            self.logger.warning(f"Transfer failed: {message}")
+            return self._fail(url, message, status=status)
+        self.logger.info("Transfer completed successfully")
+        return {
+            "status": "success",
+            "provider": self.name,
+            "share_link": url,
+            "target_path": None,
+            "message": message,
+        }
 
-            save_btn = page.get_by_text("保存到网盘", exact=False)
-            save_cnt = await save_btn.count()
-            self.logger.info(f"Clicking '保存到网盘': {save_cnt}")
-            if save_cnt:
+    async def _select_folder(self, page) -> None:
+        self.logger.info("Selecting save path panel")
+        btn_path = await page.query_selector('div[class*="bottom-save-path"]') or await page.query_selector('div[class*="save-path"]')
+        if btn_path:
+            try:
+                await btn_path.click()
+                self.logger.info("Save path panel opened")
+            except Exception:
+                self.logger.warning("Failed to open save path panel")
+        try:
+            await page.wait_for_selector("div[class*='file-tree-container'], div[class*='file-tree']", timeout=30000)
+        except Exception:
+            pass
+
+        self.logger.info(f"Locating folder: {BAIDU_NODE_PATH}")
+        folder = await page.query_selector(f'[node-path="{BAIDU_NODE_PATH}"]')
+        if folder is None:
+            loc = page.get_by_text(BAIDU_TARGET_FOLDER, exact=False)
+            if await loc.count():
+                folder = loc.first
+        if folder is not None:
+            try:
+                await folder.click()
+                self.logger.info("Folder selected")
+            except Exception:
+                self.logger.warning("Failed to select folder")
+        await wait_any(page, ['[node-type="confirm"]', "text=确认"], timeout=SHORT_TIMEOUT)
+        confirm = await page.query_selector('[node-type="confirm"]')
+        if confirm is None:
+            loc = page.get_by_text("确认", exact=False)
+            if await loc.count():
+                confirm = loc.first
+        if confirm is not None:
+            try:
+                await confirm.click()
+                self.logger.info("Path confirmed")
+            except Exception:
+                self.logger.warning("Failed to confirm path")
+        await wait_hidden(page, "div[class*='file-tree-container'], div[class*='file-tree']")
+
+    async def _click_save(self, page) -> Tuple[str, str]:
+        async with ResponseWatcher(page, lambda r: "/share/transfer" in r.url and r.request.method == "POST") as watcher:
+            await self._press_save(page)
+            response = await watcher.wait()
+        if response is None:
+            self.logger.warning("No share/transfer response observed, checking page toast")
+            toast = await wait_any(page, ["text=成功保存", "text=保存成功"], timeout=SHORT_TIMEOUT)
+            return ("success", "transferred") if toast else ("fail", "未检测到转存结果")
+        try:
+            body = await response.json()
+            errno = int(body.get("errno"))
+        except Exception:
+            return "fail", f"转存接口返回异常（HTTP {response.status}）"
+        self.logger.info(f"share/transfer responded with errno {errno}")
+        return describe_errno(errno) or ("fail", f"转存失败（errno {errno}）")
+
+    async def _press_save(self, page) -> None:
+        save_btn = page.get_by_text("保存到网盘", exact=False)
+        save_cnt = await save_btn.count()
+        self.logger.info(f"Clicking '保存到网盘': {save_cnt}")
+        if save_cnt:
+            try:
+                await save_btn.first.click()
+            except Exception:
+                self.logger.warning("Failed to click '保存到网盘'")
+        else:
+            alt = page.locator("text=保存")
+            alt_cnt = await alt.count()
+            self.logger.info(f"Clicking '保存': {alt_cnt}")
+            if alt_cnt:
                 try:
-                    await save_btn.first.click()
+                    await alt.first.click()
                 except Exception:
-                    self.logger.warning("Failed to click '保存到网盘'")
-            else:
-                alt = page.locator("text=保存")
-                alt_cnt = await alt.count()
-                self.logger.info(f"Clicking '保存': {alt_cnt}")
-                if alt_cnt:
-                    try:
-                        await alt.first.click()
-                    except Exception:
-                        self.logger.warning("Failed to click '保存'")
-            await page.wait_for_timeout(1000)
+                    self.logger.warning("Failed to click '保存'")
 
-            self.logger.info("Transfer completed successfully")
-            return {
-                "status": "success",
-                "provider": self.name,
-                "share_link": url,
-                "target_path": None,
-                "message": "transferred",
-            }
+    async def _transfer_http(self, link: str, account: Optional[str] = None, cookie_str: Optional[Any] = None) -> Optional[Dict[str, Any]]:
+        """
+        Tries the browser-free engine; returns None when the browser flow has to take over.
+        """
+        info = self._extract(link)
+        url = (info["url"] or "").strip().strip('`"')
+        surl = self._surl(url) if url else None
+        try:
+            if not surl:
+                raise HttpFallback("unrecognized_share_url")
+            cookies = await self.http_cookies("baidu.com", account, cookie_str)
+            with StepTimer(self.logger, "http_transfer", self.name).step("save"):
+                status, message = await baidu_http.save(surl, info.get("code"), cookies, BAIDU_NODE_PATH if BAIDU_TARGET_FOLDER else "/")
+        except HttpFallback as e:
+            if BAIDU_TRANSFER_ENGINE == "http":
+                self.logger.error(f"HTTP transfer failed: {e}")
+                return self._fail(url, str(e), status="error")
+            self.logger.info(f"HTTP engine fell back to browser: {e}")
+            return None
+        self.logger.info(f"HTTP transfer finished: {status} {message}")
+        return {
+            "status": status,
+            "provider": self.name,
+            "share_link": url,
+            "target_path": (BAIDU_NODE_PATH if BAIDU_TARGET_FOLDER else None) if status == "success" else None,
+            "message": message,
+        }
+
+    async def transfer(self, link: str, account: Optional[str] = None, cookie_str: Optional[Any] = None) -> Dict[str, Any]:
+        self.logger.info(f"Starting transfer for link: {link[:50]}..." if len(link) > 50 else f"Starting transfer for link: {link}")
+        if BAIDU_TRANSFER_ENGINE != "browser":
+            result = await self._transfer_http(link, account, cookie_str)
+            if result is not None:
+                return self._note_login(account, result)
+        ctx, page = await self.open_context_and_page(account, cookie_str=cookie_str)
+        try:
+            if not await self._logged_in(page, account):
+                self.logger.warning("User not logged in, transfer cancelled")
+                return self._fail(self._share_url(link), NOT_LOGGED_IN)
+            return self._note_login(account, await self._save_share(page, link))
         except Exception as e:
             self.logger.error(f"Transfer failed: {e}")
+            # The saved session may be stale; make the next transfer check the home page
+            account_status.mark(self, account, "unknown")
+            return self._fail(self._share_url(link), str(e), status="error")
+        finally:
+            try:
+                await self.release_context_and_page(page, account)
+                self.logger.info(f"Browser context released for account: {account}")
+            except Exception:
+                self.logger.warning("Failed to release browser context")
+
+    async def transfer_many(self, links: List[str], account: Optional[str] = None, cookie_str: Optional[Any] = None) -> List[Dict[str, Any]]:
+        self.logger.info(f"Starting batch transfer of {len(links)} link(s) for account: {account}")
+        results: List[Optional[Dict[str, Any]]] = [None] * len(links)
+        if BAIDU_TRANSFER_ENGINE != "browser":
+            for idx, link in enumerate(links):
+                results[idx] = self._note_login(account, await self._transfer_http(link, account, cookie_str))
+        pending = [idx for idx, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        ctx, page = await self.open_context_and_page(account, cookie_str=cookie_str)
+        try:
+            try:
+                logged_in = await self._logged_in(page, account)
+            except Exception as e:
+                self.logger.error(f"Login check failed: {e}")
+                for idx in pending:
+                    results[idx] = self._fail(self._share_url(links[idx]), str(e), status="error")
+                return results
+            if not logged_in:
+                self.logger.warning("User not logged in, batch transfer cancelled")
+                for idx in pending:
+                    results[idx] = self._fail(self._share_url(links[idx]), NOT_LOGGED_IN)
+                return results
+            for idx in pending:
+                try:
+                    results[idx] = self._note_login(account, await self._save_share(page, links[idx]))
+                except Exception as e:
+                    self.logger.error(f"Transfer failed: {e}")
+                    account_status.mark(self, account, "unknown")
+                    results[idx] = self._fail(self._share_url(links[idx]), str(e), status="error")
+            return results
         finally:
             try:
-                await manager.close_context(self._resolve_user_data_dir(account))
-                self.logger.info(f"Browser context closed for account: {account}")
+                await self.release_context_and_page(page, account)
+                self.logger.info(f"Browser context released for account: {account}")
             except Exception:
-                self.logger.warning("Failed to close browser context")
+                self.logger.warning("Failed to release browser context")
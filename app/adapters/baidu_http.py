@@ -0,0 +1,230 @@
+import time
+import json
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import unquote
+import httpx
+from ..config import BAIDU_API_BASE
+from ..utils.http import get_client, cookie_header, HttpFallback
+from ..logger import create_logger
+
+# errno -> (status, message) for the share/verify, share/list and share/transfer endpoints.
+# Anything not listed here is treated as an unknown response and handed to the browser flow.
+BAIDU_ERRNO: Dict[int, Tuple[str, str]] = {
+    -4: ("fail", "未登录，请先扫码登录后再转存"),
+    -6: ("fail", "未登录，请先扫码登录后再转存"),
+    -7: ("fail", "分享文件已被删除或无权访问"),
+    -8: ("fail", "目录中已存在同名文件"),
+    -9: ("fail", "提取码错误或分享不存在"),
+    -10: ("fail", "网盘空间不足"),
+    -12: ("fail", "缺少提取码"),
+    2: ("fail", "转存目录不存在"),
+    4: ("fail", "目录中已存在同名文件"),
+    12: ("fail", "部分文件转存失败或已存在"),
+    105: ("fail", "分享链接已失效"),
+    111: ("fail", "有其他转存任务正在进行，请稍后重试"),
+    120: ("fail", "转存文件数超过限制"),
+    130: ("fail", "转存文件数超过会员上限"),
+}
+
+# errno values that only a real browser can get past
+BAIDU_CAPTCHA_ERRNO = {-62}
+
+_LIST_PAGE_SIZE = 100
+
+# Markers on the share page of a dead link
+_EXPIRED_MARKERS = ("你来晚了", "分享的文件已经被取消", "分享的文件已经被删除", "链接已过期", "已失效")
+_NOT_FOUND_MARKERS = ("链接错误没找到文件", "链接不存在", "页面不存在")
+
+def describe_errno(errno: int) -> Optional[Tuple[str, str]]:
+    """Maps a Baidu errno to a (status, message) pair, or None when it is unknown."""
+    if errno == 0:
+        return "success", "transferred"
+    return BAIDU_ERRNO.get(errno)
+
+class BaiduHttpEngine:
+    """
+    Saves a Baidu share without a browser: verifies the extraction code, lists the
+    share's top-level files and posts them to share/transfer using the account's
+    cookies. Raises HttpFallback on a captcha or any response it does not understand.
+    """
+
+    def __init__(self, base_url: str = BAIDU_API_BASE) -> None:
+        self.base_url = base_url
+        self._bdstokens: Dict[str, str] = {}
+        self.logger = create_logger("baidu-http")
+
+    async def _call(self, method: str, path: str, cookies: Dict[str, str], referer: str, params: Optional[Dict[str, Any]] = None, data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        headers = {"Cookie": cookie_header(cookies), "Referer": referer}
+        try:
+            resp = await get_client().request(method, f"{self.base_url}{path}", params=params, data=data, headers=headers)
+        except httpx.HTTPError as e:
+            raise HttpFallback(f"request_failed:{path}:{e}")
+        if resp.status_code != 200:
+            raise HttpFallback(f"http_status:{path}:{resp.status_code}")
+        try:
+            body = resp.json()
+        except ValueError:
+            raise HttpFallback(f"non_json_response:{path}")
+        if not isinstance(body, dict) or "errno" not in body:
+            raise HttpFallback(f"unexpected_response:{path}")
+        errno = body["errno"]
+        if errno in BAIDU_CAPTCHA_ERRNO:
+            raise HttpFallback("captcha_required")
+        if errno != 0 and describe_errno(errno) is None:
+            raise HttpFallback(f"unknown_errno:{path}:{errno}")
+        return body
+
+    async def _bdstoken(self, cookies: Dict[str, str], referer: str) -> Tuple[Optional[str], int]:
+        bduss = cookies.get("BDUSS", "")
+        if bduss in self._bdstokens:
+            return self._bdstokens[bduss], 0
+        body = await self._call(
+            "GET",
+            "/api/gettemplatevariable",
+            cookies,
+            referer,
+            params={"clienttype": 0, "app_id": 250528, "web": 1, "fields": json.dumps(["bdstoken", "token", "uk"])},
+        )
+        if body["errno"] != 0:
+            return None, body["errno"]
+        token = (body.get("result") or {}).get("bdstoken")
+        if not token:
+            raise HttpFallback("bdstoken_missing")
+        self._bdstokens[bduss] = token
+        return token, 0
+
+    async def _list(self, surl: str, cookies: Dict[str, str], referer: str) -> Tuple[int, Optional[Dict[str, Any]], List[int]]:
+        fs_ids: List[int] = []
+        meta: Optional[Dict[str, Any]] = None
+        page = 1
+        while True:
+            body = await self._call(
+                "GET",
+                "/share/list",
+                cookies,
+                referer,
+                params={"shorturl": surl, "root": 1, "page": page, "num": _LIST_PAGE_SIZE, "web": 1, "channel": "chunlei", "clienttype": 0, "app_id": 250528},
+            )
+            if body["errno"] != 0:
+                return body["errno"], None, []
+            if meta is None:
+                meta = {"share_id": body.get("share_id"), "uk": body.get("uk")}
+            items = body.get("list") or []
+            fs_ids.extend(int(item["fs_id"]) for item in items if "fs_id" in item)
+            if len(items) < _LIST_PAGE_SIZE:
+                return 0, meta, fs_ids
+            page += 1
+
+    async def check(self, surl: str, code: Optional[str]) -> str:
+        """
+        Classifies a share without logging in: "valid", "expired", "not_found",
+        "password_required", "invalid_code" or "unknown".
+        """
+        try:
+            resp = await get_client().get(f"{self.base_url}/s/1{surl}")
+        except httpx.HTTPError as e:
+            self.logger.warning(f"Preflight request failed for {surl}: {e}")
+            return "unknown"
+        if resp.status_code == 404:
+            return "not_found"
+        if resp.status_code != 200:
+            return "unknown"
+        text = resp.text
+        if any(marker in text for marker in _EXPIRED_MARKERS):
+            return "expired"
+        if any(marker in text for marker in _NOT_FOUND_MARKERS):
+            return "not_found"
+        if "/share/init" not in str(resp.url):
+            return "valid"
+        if not code:
+            return "password_required"
+        try:
+            body = await self._call(
+                "POST",
+                "/share/verify",
+                {},
+                f"{self.base_url}/share/init?surl={surl}",
+                params={"surl": surl, "t": int(time.time() * 1000), "channel": "chunlei", "web": 1, "clienttype": 0},
+                data={"pwd": code, "vcode": "", "vcode_str": ""},
+            )
+        except HttpFallback:
+            return "unknown"
+        return {0: "valid", -9: "invalid_code", -12: "password_required", 105: "expired"}.get(body["errno"], "unknown")
+
+    async def save(self, surl: str, code: Optional[str], cookies: Dict[str, str], target_path: str) -> Tuple[str, str]:
+        """
+        Saves every top-level file of a share into `target_path`.
+
+        Args:
+            surl: Short share ID, i.e. the part after "/s/1" or the `surl` query value
+            code: Extraction code, if the share has one
+            cookies: Account cookies for baidu.com (BDUSS and STOKEN are required)
+            target_path: Absolute folder path in the account's drive
+
+        Returns:
+            (status, message) in the same vocabulary as the browser flow
+        """
+        if not cookies.get("BDUSS"):
+            raise HttpFallback("no_session_cookies")
+        cookies = dict(cookies)
+        referer = f"{self.base_url}/share/init?surl={surl}"
+        start = time.time()
+        randsk = None
+        if code:
+            body = await self._call(
+                "POST",
+                "/share/verify",
+                cookies,
+                referer,
+                params={"surl": surl, "t": int(time.time() * 1000), "channel": "chunlei", "web": 1, "clienttype": 0},
+                data={"pwd": code, "vcode": "", "vcode_str": ""},
+            )
+            if body["errno"] != 0:
+                return describe_errno(body["errno"])
+            randsk = body.get("randsk")
+            if not randsk:
+                raise HttpFallback("randsk_missing")
+            cookies["BDCLND"] = randsk
+            self.logger.info(f"Extraction code verified for {surl}")
+
+        errno, meta, fs_ids = await self._list(surl, cookies, referer)
+        if errno != 0:
+            if errno == -9 and not code:
+                return "fail", "缺少提取码"
+            return describe_errno(errno)
+        if not meta or not meta.get("share_id") or not meta.get("uk"):
+            raise HttpFallback("share_meta_missing")
+        if not fs_ids:
+            return "fail", "分享中没有可转存的文件"
+
+        bdstoken, errno = await self._bdstoken(cookies, referer)
+        if bdstoken is None:
+            return describe_errno(errno)
+        params = {
+            "shareid": meta["share_id"],
+            "from": meta["uk"],
+            "ondup": "newcopy",
+            "async": 1,
+            "channel": "chunlei",
+            "web": 1,
+            "app_id": 250528,
+            "clienttype": 0,
+            "bdstoken": bdstoken,
+        }
+        if randsk:
+            params["sekey"] = unquote(randsk)
+        body = await self._call(
+            "POST",
+            "/share/transfer",
+            cookies,
+            referer,
+            params=params,
+            data={"fsidlist": json.dumps(fs_ids), "path": target_path},
+        )
+        if body["errno"] in (-4, -6):
+            # The cached bdstoken may belong to an expired session
+            self._bdstokens.pop(cookies.get("BDUSS", ""), None)
+        self.logger.info(f"share/transfer for {surl} returned errno {body['errno']} ({len(fs_ids)} item(s), {time.time() - start:.2f}s)")
+        return describe_errno(body["errno"])
+
+baidu_http = BaiduHttpEngine()
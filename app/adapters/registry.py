@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, List
 import re
 from urllib.parse import urlparse
 from ..base import ShareAdapter
@@ -49,4 +49,8 @@ def resolve_adapter_from_provider(provider: str) -> Optional[ShareAdapter]:
         logger.warning(f"No adapter found for provider: {provider}")
     else:
         logger.info(f"Adapter found for provider: {provider}")
-    return adapter
\ No newline at end of file
+    return adapter
+
+def all_adapters() -> List[ShareAdapter]:
+    """Returns each registered adapter once, skipping provider aliases."""
+    return list({adapter.name: adapter for adapter in _REGISTRY.values()}.values())
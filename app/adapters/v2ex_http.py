@@ -0,0 +1,99 @@
+import re
+from typing import Optional, Dict, Any, Tuple
+from urllib.parse import urlparse
+import httpx
+from ..config import V2EX_BASE_URL
+from ..utils.http import get_client, cookie_header, HttpFallback
+from ..logger import create_logger
+
+# The redeem button is `<input type="button" value="领取 X 铜币" onclick="location.href = '/mission/daily/redeem?once=12345';">`
+_ONCE_RE = re.compile(r"/mission/daily/redeem\?once=(\d+)")
+
+_LOGIN_MARKERS = ("需要先登录",)
+_REDEEMED_MARKERS = ("已成功领取每日登录奖励",)
+_ALREADY_MARKERS = ("每日登录奖励已领取",)
+
+class V2exHttpEngine:
+    """
+    Redeems the V2EX daily mission without a browser: loads /mission/daily with the
+    account's cookies, takes the `once` token from the redeem button and requests
+    the redeem URL. Raises HttpFallback on any page it does not understand.
+    """
+
+    def __init__(self, base_url: str = V2EX_BASE_URL) -> None:
+        self.base_url = base_url
+        self.logger = create_logger("v2ex-http")
+
+    async def _get(self, path: str, cookies: Dict[str, str], params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        # Redirects are not followed: httpx drops the explicit Cookie header on the
+        # next hop, and the shared client keeps no cookie jar to fill it back in
+        headers = {"Cookie": cookie_header(cookies), "Referer": f"{self.base_url}/mission/daily"}
+        try:
+            resp = await get_client().get(f"{self.base_url}{path}", params=params, headers=headers, follow_redirects=False)
+        except httpx.HTTPError as e:
+            raise HttpFallback(f"request_failed:{path}:{e}")
+        if resp.status_code != 200 and not resp.is_redirect:
+            raise HttpFallback(f"http_status:{path}:{resp.status_code}")
+        return resp
+
+    @staticmethod
+    def _redirect_path(resp: httpx.Response) -> Optional[str]:
+        if not resp.is_redirect:
+            return None
+        return urlparse(resp.headers.get("Location") or "").path
+
+    def _login_required(self, resp: httpx.Response) -> bool:
+        if resp.is_redirect:
+            return (self._redirect_path(resp) or "").startswith("/signin")
+        return any(marker in resp.text for marker in _LOGIN_MARKERS)
+
+    @staticmethod
+    def _outcome(resp: httpx.Response) -> Optional[Tuple[str, str]]:
+        if any(marker in resp.text for marker in _REDEEMED_MARKERS):
+            return "success", "已成功领取每日登录奖励"
+        if any(marker in resp.text for marker in _ALREADY_MARKERS):
+            return "success", "每日登录奖励已领取"
+        return None
+
+    async def redeem(self, cookies: Dict[str, str]) -> Tuple[str, str]:
+        """
+        Redeems today's login reward.
+
+        Args:
+            cookies: The account's v2ex.com cookies; the "A2" session cookie is required
+
+        Returns:
+            (status, message) in the same vocabulary as the browser flow
+        """
+        if not cookies.get("A2"):
+            raise HttpFallback("no_session_cookie")
+        resp = await self._get("/mission/daily", cookies)
+        if self._login_required(resp):
+            return "error", "需要登陆"
+        if resp.is_redirect:
+            raise HttpFallback(f"unexpected_redirect:{self._redirect_path(resp)}")
+        # The page may still carry the flash of a redeem made earlier today
+        outcome = self._outcome(resp)
+        if outcome is not None:
+            return outcome
+        m = _ONCE_RE.search(resp.text)
+        if not m:
+            raise HttpFallback("once_token_missing")
+
+        resp = await self._get("/mission/daily/redeem", cookies, params={"once": m.group(1)})
+        if self._login_required(resp):
+            return "error", "需要登陆"
+        if resp.is_redirect:
+            # The site answers the redeem with a redirect back to the mission page,
+            # which shows the result as a flash message
+            if self._redirect_path(resp) != "/mission/daily":
+                raise HttpFallback(f"unexpected_redirect:{self._redirect_path(resp)}")
+            resp = await self._get("/mission/daily", cookies)
+            if self._login_required(resp):
+                return "error", "需要登陆"
+        outcome = self._outcome(resp)
+        if outcome is None:
+            raise HttpFallback("unexpected_redeem_response")
+        return outcome
+
+v2ex_http = V2exHttpEngine()
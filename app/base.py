@@ -1,11 +1,35 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any, List, Union
+from typing import Optional, Dict, Any, List, Union, Callable, Awaitable, Tuple, Pattern
 import os
+import time
+import uuid
+import asyncio
+from urllib.parse import urlparse
 from .browser import manager
+from .login import login_sessions, LoginSessionLimit
+from .accounts import account_status
+from .utils.cookies import profile_cookies
+from .utils.waits import LoginWatcher
+from .metrics import STEP_SECONDS
+from .config import TASK_ACCOUNT_CONCURRENCY
+
+# Message of every transfer result that failed because the account is not logged in
+NOT_LOGGED_IN = "未登录，请先扫码登录后再转存"
+
+def _in_domain(host: str, domain: str) -> bool:
+    host = (host or "").lstrip(".")
+    return not host or host == domain or host.endswith(f".{domain}")
 
 class ShareAdapter(ABC):
     def __init__(self) -> None:
         self.user_data_dir: Optional[str] = None
+        # Login signals watched while a QR login session waits for the scan
+        self.login_selector: Optional[str] = None
+        self.login_selector_state = "visible"
+        self.login_url: Optional[Union[str, Pattern]] = None
+        self.login_cookies: Tuple[str, ...] = ()
+        # Registrable domain of `login_cookies`, used to judge the saved session without a browser
+        self.cookie_domain: Optional[str] = None
 
     @property
     @abstractmethod
@@ -15,6 +39,19 @@ class ShareAdapter(ABC):
     async def transfer(self, link: str, account: Optional[str] = None, cookie_str: Optional[Any] = None) -> Dict[str, Any]:
         raise NotImplementedError("Transfer functionality not implemented for this adapter")
 
+    async def transfer_many(self, links: List[str], account: Optional[str] = None, cookie_str: Optional[Any] = None) -> List[Dict[str, Any]]:
+        """Transfers several links for one account; adapters override this to share one browser session."""
+        return [await self.transfer(link, account=account, cookie_str=cookie_str) for link in links]
+
+    async def preflight(self, link: str) -> str:
+        """Classifies a share link over HTTP; adapters without a cheap check report "unknown"."""
+        return "unknown"
+
+    def share_key(self, link: str) -> str:
+        """Canonical identity of a share link (provider + share ID + extraction code)."""
+        url = (link or "").strip().strip('`"')
+        return f"{self.name}:{url}"
+
     def _sanitize(self, s: str) -> str:
         return ''.join(c if c.isalnum() or c in ('_', '-') else '_' for c in s)[:64]
 
@@ -29,17 +66,174 @@ class ShareAdapter(ABC):
         os.makedirs(base, exist_ok=True)
         return base
 
+    async def http_cookies(self, domain: str, account: Optional[str] = None, cookie_str: Optional[Any] = None) -> Dict[str, str]:
+        """
+        Collects the account's cookies for `domain` as a name -> value map for HTTP engines.
+
+        Args:
+            domain: Registrable domain the cookies must belong to, e.g. "baidu.com"
+            account: Optional account name selecting the profile
+            cookie_str: Optional cookie input; it takes precedence over the saved profile state
+        """
+        cookies: Dict[str, str] = {}
+        state = await manager.storage_state(self._resolve_user_data_dir(account))
+        sources = [(state or {}).get("cookies") or []]
+        if cookie_str:
+            sources.append(manager.parse_cookies(cookie_str))
+        for source in sources:
+            for c in source:
+                if not isinstance(c, dict) or not c.get("name"):
+                    continue
+                if not _in_domain(c.get("domain"), domain):
+                    continue
+                expires = c.get("expires")
+                if isinstance(expires, (int, float)) and 0 < expires < time.time():
+                    continue
+                cookies[c["name"]] = str(c.get("value", ""))
+        return cookies
+
+    async def login_state(self, account: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Judges the account's login from its saved auth cookies, without a browser.
+
+        The cookies come from the warm context or storage_state file, else from the
+        persistent profile's cookie database.
+
+        Returns:
+            {"state", "expires_at"}: "valid" when every cookie in `login_cookies` is saved
+            and unexpired, "expired", "missing", or "unknown" when the adapter names none;
+            "expires_at" is the earliest expiry (None for session cookies)
+        """
+        if not self.login_cookies or not self.cookie_domain:
+            return {"state": "unknown", "expires_at": None}
+        ud = self._resolve_user_data_dir(account)
+        state = await manager.storage_state(ud)
+        cookies = state.get("cookies") if state is not None else profile_cookies(ud)
+        expiry: Dict[str, float] = {}
+        for c in cookies or []:
+            if not isinstance(c, dict) or c.get("name") not in self.login_cookies or not _in_domain(c.get("domain"), self.cookie_domain):
+                continue
+            expires = c.get("expires")
+            expires = float(expires) if isinstance(expires, (int, float)) and expires > 0 else float("inf")
+            # The same cookie may be saved for several hosts; the freshest copy wins
+            expiry[c["name"]] = max(expiry.get(c["name"], 0.0), expires)
+        if any(name not in expiry for name in self.login_cookies):
+            return {"state": "missing", "expires_at": None}
+        earliest = min(expiry.values())
+        return {
+            "state": "valid" if earliest > time.time() else "expired",
+            "expires_at": earliest if earliest != float("inf") else None,
+        }
+
+    async def local_storage_item(self, domain: str, key: str, account: Optional[str] = None) -> Optional[str]:
+        """
+        Reads one localStorage value saved in the account's profile state for an origin under `domain`.
+
+        Args:
+            domain: Registrable domain of the origin, e.g. "alipan.com"
+            key: localStorage key
+            account: Optional account name selecting the profile
+        """
+        state = await manager.storage_state(self._resolve_user_data_dir(account))
+        for origin in (state or {}).get("origins") or []:
+            host = urlparse(origin.get("origin") or "").hostname or ""
+            if host != domain and not host.endswith(f".{domain}"):
+                continue
+            for item in origin.get("localStorage") or []:
+                if item.get("name") == key:
+                    return item.get("value")
+        return None
+
+    async def get_qr_code(self, account: Optional[str] = None) -> Tuple[str, bytes, bool]:
+        """
+        Returns (session_id, QR code PNG, already logged in) for the account's login.
+
+        The account's live login session is reused if there is one; otherwise the
+        login page is opened and watched in the background until the login succeeds
+        or the session expires (see LoginSessionManager).
+
+        Raises:
+            LoginSessionLimit: When LOGIN_MAX_SESSIONS sessions are already active
+        """
+        try:
+            return await login_sessions.get_or_create(self, account)
+        except LoginSessionLimit:
+            raise
+        except Exception as e:
+            self.logger.error(f"get_qr_code error: {e}")
+            return str(uuid.uuid4()), b"", False
+
+    async def _open_login(self, page) -> Tuple[bool, bytes]:
+        """Opens the login page; returns (already logged in, screenshot of the QR code or login form)."""
+        raise NotImplementedError("QR login not implemented for this adapter")
+
+    async def _check_login(self, page) -> bool:
+        """Loads the provider home page and reports whether the account is logged in."""
+        raise NotImplementedError("Login check not implemented for this adapter")
+
+    async def _logged_in(self, page, account: Optional[str] = None) -> bool:
+        """
+        Skips the home page check when the cached account status says the saved
+        session is valid; otherwise runs `_check_login` and records its answer.
+        """
+        if await account_status.is_valid(self, account):
+            self.logger.info("Saved session is valid, skipping home page check")
+            return True
+        logged_in = await self._check_login(page)
+        account_status.mark(self, account, "valid" if logged_in else "logged_out")
+        return logged_in
+
+    def _note_login(self, account: Optional[str], result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Marks the account logged out when a transfer result says its session is gone,
+        e.g. Baidu errno -4/-6 from the HTTP engine or the save dialog. Returns `result`.
+        """
+        if result is not None and result.get("message") == NOT_LOGGED_IN:
+            account_status.mark(self, account, "logged_out", source="transfer")
+        return result
+
+    async def _wait_for_login(self, page, timeout: int) -> Optional[str]:
+        """
+        Waits for the login page opened by `_open_login` to log in, driven by page
+        events: `login_selector` reaching `login_selector_state`, a navigation to
+        `login_url`, or a response setting one of `login_cookies`.
+
+        Args:
+            page: Page returned to `_open_login`
+            timeout: Deadline in milliseconds
+
+        Returns:
+            The signal that detected the login, or None when the deadline passed
+        """
+        watcher = LoginWatcher(
+            page,
+            selector=self.login_selector,
+            state=self.login_selector_state,
+            url=self.login_url,
+            cookies=self.login_cookies,
+        )
+        return await watcher.wait(timeout)
+
     async def open_context_and_page(self, account: Optional[str] = None, cookie_str: Optional[Any] = None):
         ud = self._resolve_user_data_dir(account)
-        ctx = await manager.new_persistent_context(ud, cookie_str)
+        start = time.perf_counter()
+        ctx = await manager.acquire_context(ud, cookie_str)
         try:
             page = await ctx.new_page()
         except Exception:
             await manager.close_context(ud)
-            ctx = await manager.new_persistent_context(ud, cookie_str)
+            ctx = await manager.acquire_context(ud, cookie_str)
             page = await ctx.new_page()
+        STEP_SECONDS.observe(time.perf_counter() - start, provider=self.name, flow="context", step="open")
         return ctx, page
 
+    async def release_context_and_page(self, page, account: Optional[str] = None) -> None:
+        try:
+            await page.close()
+        except Exception:
+            pass
+        await manager.release_context(self._resolve_user_data_dir(account))
+
 class TaskAdapter(ABC):
     @property
     @abstractmethod
@@ -49,3 +243,56 @@ class TaskAdapter(ABC):
     @abstractmethod
     async def run(self, provider: Optional[str] = None, accounts: Optional[List[str]] = None, cookies: Optional[Any] = None) -> Dict[str, Any]:
         ...
+
+    def account_cookies(self, cookies: Optional[Any], account: Optional[str], accounts: List[Optional[str]]) -> Optional[Any]:
+        """
+        Picks the cookie input for one account: a dict keyed by the task's account names
+        holds per-account cookies, anything else is shared by every account.
+        """
+        if isinstance(cookies, dict) and cookies and set(cookies) <= {a for a in accounts if a}:
+            return cookies.get(account)
+        return cookies
+
+    async def run_for_accounts(
+        self,
+        accounts: Optional[List[str]],
+        run_one: Callable[[Optional[str]], Awaitable[Dict[str, Any]]],
+        concurrency: int = TASK_ACCOUNT_CONCURRENCY,
+    ) -> Dict[str, Any]:
+        """
+        Runs `run_one` for every listed account, at most `concurrency` at a time.
+
+        A failing account does not affect the others. The per-account results are
+        returned under "accounts" (keyed "default" when no account was listed);
+        "status" is "success" when every account succeeded, "error" when none did
+        and "partial" otherwise. Each account result carries its `started_at` and
+        `duration_ms`.
+
+        Args:
+            accounts: Account names from the task config; empty runs the default profile once
+            run_one: Coroutine function running the task for one account
+            concurrency: Maximum number of accounts running at the same time
+        """
+        names: List[Optional[str]] = list(dict.fromkeys(accounts)) if accounts else [None]
+        sem = asyncio.Semaphore(max(1, concurrency))
+
+        async def _guarded(account: Optional[str]) -> Dict[str, Any]:
+            async with sem:
+                started_at = time.time()
+                start = time.perf_counter()
+                try:
+                    result = dict(await run_one(account))
+                except Exception as e:
+                    result = {"status": "error", "message": str(e)}
+                result.update(started_at=started_at, duration_ms=round((time.perf_counter() - start) * 1000, 1))
+                return result
+
+        results = await asyncio.gather(*(_guarded(account) for account in names))
+        per_account = {account or "default": result for account, result in zip(names, results)}
+        ok = sum(1 for r in results if r.get("status") == "success")
+        if len(results) == 1:
+            status, message = results[0].get("status", "error"), results[0].get("message")
+        else:
+            status = "success" if ok == len(results) else ("error" if ok == 0 else "partial")
+            message = f"{ok}/{len(results)} accounts succeeded"
+        return {"status": status, "message": message, "accounts": per_account}
@@ -1,14 +1,43 @@
 import os
-from typing import Union, Dict, List
+import json
+import time
+import hashlib
+import asyncio
+from collections import OrderedDict
+from typing import Union, Dict, List, Optional, Any, Tuple
 from playwright.async_api import async_playwright
-from .config import HEADLESS
+from .config import HEADLESS, BROWSER_MODE, STORAGE_STATE_FILENAME, BROWSER_POOL_MAX_CONTEXTS, BROWSER_POOL_IDLE_TTL, BROWSER_POOL_ACQUIRE_TIMEOUT
 from .logger import create_logger
 from .utils.cookies import parse_cookie_string
+from .metrics import metrics
+
+_LAUNCH_ARGS = ["--no-default-browser-check", "--no-first-run"]
+_PARSED_COOKIES_MAX = 256
+
+def _cookie_digest(cookie_str: Union[str, Dict, List]) -> str:
+    raw = cookie_str if isinstance(cookie_str, str) else json.dumps(cookie_str, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def _cookie_identity(cookie: Dict[str, Any]) -> Tuple[str, str, str]:
+    return cookie.get("name") or "", cookie.get("domain") or cookie.get("url") or "", cookie.get("path") or "/"
 
 class BrowserManager:
     def __init__(self) -> None:
         self._playwright = None
-        self._contexts = {}
+        self._browser = None
+        # Live contexts in LRU order (least recently used first)
+        self._contexts: "OrderedDict[str, Any]" = OrderedDict()
+        self._leases: Dict[str, int] = {}
+        self._last_used: Dict[str, float] = {}
+        self._opening: set = set()
+        self._open_locks: Dict[str, asyncio.Lock] = {}
+        self._pool_cond: Optional[asyncio.Condition] = None
+        self._sweeper = None
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "waits": 0, "timeouts": 0}
+        # Parsed cookie sets by content digest, and what each live context already has applied
+        self._parsed_cookies: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._applied_cookies: Dict[str, Tuple[Any, str, Dict[Tuple[str, str, str], Any]]] = {}
+        self._cookie_stats = {"parsed": 0, "applied": 0, "skipped": 0}
         self.logger = create_logger("browser")
 
     def _cleanup_profile_locks(self, base_dir: str):
@@ -26,99 +55,457 @@ class BrowserManager:
         except Exception:
             pass
 
+    def storage_state_path(self, user_data_dir: str) -> str:
+        """Returns the per-account storage_state file kept next to the profile data."""
+        return os.path.join(os.path.abspath(user_data_dir), STORAGE_STATE_FILENAME)
+
     async def start(self) -> None:
         if self._playwright is None:
             self.logger.info("Starting playwright")
             self._playwright = await async_playwright().start()
             self.logger.info("Playwright started successfully")
+        if self._sweeper is None and BROWSER_POOL_IDLE_TTL > 0:
+            self._sweeper = asyncio.create_task(self._idle_sweeper())
+
+    async def _ensure_browser(self):
+        await self.start()
+        if self._browser is None or not self._browser.is_connected():
+            self.logger.info("Launching shared browser")
+            self._browser = await self._playwright.chromium.launch(headless=HEADLESS, args=_LAUNCH_ARGS)
+            self._browser.on("disconnected", lambda _: self._on_browser_disconnected())
+            self.logger.info("Shared browser launched")
+        return self._browser
+
+    def _on_browser_disconnected(self) -> None:
+        self.logger.warning("Shared browser disconnected, dropping its contexts")
+        self._browser = None
+        if BROWSER_MODE == "shared":
+            for bdir in list(self._contexts):
+                self._forget(bdir)
+            self._notify_pool()
 
     async def stop(self) -> None:
         self.logger.info("Stopping browser manager")
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
         if self._playwright is not None:
             try:
                 for bdir, ctx in list(self._contexts.items()):
+                    await self._save_storage_state(bdir, ctx)
                     try:
                         await ctx.close()
                         self.logger.info(f"Closed browser context: {bdir}")
                     except Exception as e:
                         self.logger.error(f"Failed to close context {bdir}: {e}")
-                    self._contexts.pop(bdir, None)
+                    self._forget(bdir)
             except Exception as e:
                 self.logger.error(f"Error during context cleanup: {e}")
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                    self.logger.info("Shared browser closed")
+                except Exception as e:
+                    self.logger.error(f"Failed to close shared browser: {e}")
+                self._browser = None
             await self._playwright.stop()
             self._playwright = None
             self.logger.info("Playwright stopped")
         self.logger.info("Browser manager stopped")
 
+    async def new_context(self, user_data_dir: str, cookie_str: Union[str, Dict, List] = None):
+        """
+        Creates (or returns) the browser context for an account according to BROWSER_MODE.
+
+        Args:
+            user_data_dir: Path to the account's user data directory
+            cookie_str: Optional cookie data to set in the context (string, dict, or list)
+        """
+        if BROWSER_MODE == "shared":
+            return await self.new_shared_context(user_data_dir, cookie_str)
+        return await self.new_persistent_context(user_data_dir, cookie_str)
+
     async def new_persistent_context(self, user_data_dir: str, cookie_str: Union[str, Dict, List] = None):
         """
         Creates a new persistent browser context, optionally with cookies from a string, dict, or list.
-        
+
         Args:
             user_data_dir: Path to the user data directory
             cookie_str: Optional cookie data to set in the context (string, dict, or list)
         """
         base_dir = os.path.abspath(user_data_dir)
-        self.logger.debug(f"Creating new persistent context for: {base_dir}")
         if base_dir and not os.path.exists(base_dir):
             os.makedirs(base_dir, exist_ok=True)
             self.logger.debug(f"Created directory: {base_dir}")
         ctx = self._contexts.get(base_dir)
         if ctx is not None:
-            self.logger.debug(f"Returning existing context: {base_dir}")
             # If a cookie string is provided for an existing context, set the cookies
             if cookie_str:
-                await self._set_cookies_from_string(ctx, cookie_str)
+                await self._set_cookies_from_string(ctx, cookie_str, base_dir)
             return ctx
+        self.logger.debug(f"Creating new persistent context for: {base_dir}")
         self._cleanup_profile_locks(base_dir)
         self.logger.debug(f"Cleaned up profile locks for: {base_dir}")
 
         await self.start()
-        ctx = await self._playwright.chromium.launch_persistent_context(user_data_dir=base_dir, headless=HEADLESS, args=["--no-default-browser-check", "--no-first-run"])
-        self._contexts[base_dir] = ctx
+        ctx = await self._playwright.chromium.launch_persistent_context(user_data_dir=base_dir, headless=HEADLESS, args=_LAUNCH_ARGS)
+        self._track_context(base_dir, ctx)
         self.logger.info(f"Created new persistent context: {base_dir}")
-        
+
         # Set cookies if provided
         if cookie_str:
-            await self._set_cookies_from_string(ctx, cookie_str)
-        
+            await self._set_cookies_from_string(ctx, cookie_str, base_dir)
+
         return ctx
 
-    async def _set_cookies_from_string(self, context, cookie_str: str):
+    async def new_shared_context(self, user_data_dir: str, cookie_str: Union[str, Dict, List] = None):
+        """
+        Creates a lightweight context inside the shared browser, restored from the
+        account's storage_state file.
+
+        Args:
+            user_data_dir: Path to the account's user data directory
+            cookie_str: Optional cookie data to set in the context (string, dict, or list)
+        """
+        base_dir = os.path.abspath(user_data_dir)
+        os.makedirs(base_dir, exist_ok=True)
+        ctx = self._contexts.get(base_dir)
+        if ctx is not None:
+            if cookie_str:
+                await self._set_cookies_from_string(ctx, cookie_str, base_dir)
+            return ctx
+
+        self.logger.debug(f"Creating new shared context for: {base_dir}")
+        state_path = self.storage_state_path(base_dir)
+        if not os.path.exists(state_path) and os.path.isdir(os.path.join(base_dir, "Default")):
+            await self._export_profile_state(base_dir)
+
+        browser = await self._ensure_browser()
+        ctx = await browser.new_context(storage_state=state_path if os.path.exists(state_path) else None)
+        self._track_context(base_dir, ctx)
+        self.logger.info(f"Created new shared context: {base_dir}")
+
+        if cookie_str:
+            await self._set_cookies_from_string(ctx, cookie_str, base_dir)
+
+        return ctx
+
+    def _track_context(self, base_dir: str, ctx) -> None:
+        self._contexts[base_dir] = ctx
+        self._last_used[base_dir] = time.monotonic()
+
+        def _on_close(_):
+            # Contexts closed directly (not through close_context) must not linger in the pool
+            if self._contexts.get(base_dir) is ctx:
+                self._forget(base_dir)
+                self._notify_pool()
+
+        ctx.on("close", _on_close)
+
+    def _forget(self, base_dir: str) -> None:
+        self._contexts.pop(base_dir, None)
+        self._leases.pop(base_dir, None)
+        self._last_used.pop(base_dir, None)
+        self._applied_cookies.pop(base_dir, None)
+
+    def _get_pool_cond(self) -> asyncio.Condition:
+        if self._pool_cond is None:
+            self._pool_cond = asyncio.Condition()
+        return self._pool_cond
+
+    def _notify_pool(self) -> None:
+        cond = self._get_pool_cond()
+
+        async def _notify():
+            async with cond:
+                cond.notify_all()
+
+        try:
+            asyncio.get_running_loop().create_task(_notify())
+        except RuntimeError:
+            pass
+
+    def _lru_idle(self) -> Optional[str]:
+        for bdir in self._contexts:
+            if not self._leases.get(bdir):
+                return bdir
+        return None
+
+    async def acquire_context(self, user_data_dir: str, cookie_str: Union[str, Dict, List] = None):
+        """
+        Leases a warm context for an account from the pool, opening one if needed.
+
+        When BROWSER_POOL_MAX_CONTEXTS contexts are live, the least recently used idle
+        context is evicted; if every context is leased, the caller waits up to
+        BROWSER_POOL_ACQUIRE_TIMEOUT seconds. Every acquire must be paired with
+        release_context (or close_context).
+
+        Args:
+            user_data_dir: Path to the account's user data directory
+            cookie_str: Optional cookie data to set in the context (string, dict, or list)
+        """
+        base_dir = os.path.abspath(user_data_dir)
+        cond = self._get_pool_cond()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + BROWSER_POOL_ACQUIRE_TIMEOUT
+        async with cond:
+            while True:
+                if base_dir in self._contexts or base_dir in self._opening:
+                    break
+                if len(self._contexts) + len(self._opening) < BROWSER_POOL_MAX_CONTEXTS:
+                    self._opening.add(base_dir)
+                    break
+                victim = self._lru_idle()
+                if victim is not None:
+                    self.logger.info(f"Evicting least recently used context: {victim}")
+                    self._stats["evictions"] += 1
+                    await self._close(victim)
+                    continue
+                self._stats["waits"] += 1
+                remaining = deadline - loop.time()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    await asyncio.wait_for(cond.wait(), remaining)
+                except asyncio.TimeoutError:
+                    self._stats["timeouts"] += 1
+                    self.logger.error(f"Timed out waiting for a free browser context: {base_dir}")
+                    raise TimeoutError("browser_pool_exhausted")
+            self._leases[base_dir] = self._leases.get(base_dir, 0) + 1
+
+        lock = self._open_locks.setdefault(base_dir, asyncio.Lock())
+        try:
+            async with lock:
+                if base_dir in self._contexts:
+                    self._stats["hits"] += 1
+                    self._contexts.move_to_end(base_dir)
+                else:
+                    self._stats["misses"] += 1
+                ctx = await self.new_context(base_dir, cookie_str)
+                # A context opened for a lease may have been forgotten by a concurrent close
+                self._leases[base_dir] = max(self._leases.get(base_dir, 0), 1)
+                self._last_used[base_dir] = time.monotonic()
+                return ctx
+        except Exception:
+            self._release_lease(base_dir)
+            raise
+        finally:
+            if base_dir in self._opening:
+                self._opening.discard(base_dir)
+                self._notify_pool()
+
+    def _release_lease(self, base_dir: str) -> None:
+        leases = self._leases.get(base_dir, 0) - 1
+        if leases > 0:
+            self._leases[base_dir] = leases
+        else:
+            self._leases.pop(base_dir, None)
+
+    async def release_context(self, user_data_dir: str) -> None:
+        """Returns a leased context to the pool, keeping it warm for the next request."""
+        base_dir = os.path.abspath(user_data_dir)
+        self._release_lease(base_dir)
+        if base_dir in self._contexts:
+            self._last_used[base_dir] = time.monotonic()
+            self._contexts.move_to_end(base_dir)
+            self.logger.debug(f"Context released to pool: {base_dir}")
+        cond = self._get_pool_cond()
+        async with cond:
+            cond.notify_all()
+
+    async def _idle_sweeper(self) -> None:
+        interval = max(1, min(30, BROWSER_POOL_IDLE_TTL // 2))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                now = time.monotonic()
+                expired = [
+                    bdir for bdir in list(self._contexts)
+                    if not self._leases.get(bdir) and now - self._last_used.get(bdir, now) > BROWSER_POOL_IDLE_TTL
+                ]
+                if not expired:
+                    continue
+                cond = self._get_pool_cond()
+                async with cond:
+                    for bdir in expired:
+                        if bdir in self._contexts and not self._leases.get(bdir):
+                            self.logger.info(f"Closing idle context: {bdir}")
+                            self._stats["expired"] += 1
+                            await self._close(bdir)
+                    cond.notify_all()
+            except Exception as e:
+                self.logger.error(f"Idle context sweep failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        in_use = sum(1 for bdir in self._contexts if self._leases.get(bdir))
+        return {
+            "mode": BROWSER_MODE,
+            "max_contexts": BROWSER_POOL_MAX_CONTEXTS,
+            "idle_ttl": BROWSER_POOL_IDLE_TTL,
+            "live": len(self._contexts),
+            "in_use": in_use,
+            "idle": len(self._contexts) - in_use,
+            "opening": len(self._opening),
+            **self._stats,
+            "cookie_cache": {"size": len(self._parsed_cookies), **self._cookie_stats},
+        }
+
+    async def _export_profile_state(self, base_dir: str) -> None:
+        """
+        One-off migration for shared mode: opens an existing persistent profile once
+        and writes its cookies and local storage to the storage_state file.
+        """
+        self.logger.info(f"Exporting storage state from persistent profile: {base_dir}")
+        self._cleanup_profile_locks(base_dir)
+        await self.start()
+        try:
+            ctx = await self._playwright.chromium.launch_persistent_context(user_data_dir=base_dir, headless=True, args=_LAUNCH_ARGS)
+        except Exception as e:
+            self.logger.error(f"Failed to open persistent profile {base_dir}: {e}")
+            return
+        try:
+            await self._save_storage_state(base_dir, ctx)
+        finally:
+            try:
+                await ctx.close()
+            except Exception:
+                pass
+            self._cleanup_profile_locks(base_dir)
+
+    async def _save_storage_state(self, base_dir: str, ctx) -> None:
+        path = self.storage_state_path(base_dir)
+        try:
+            state = await ctx.storage_state()
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self.logger.debug(f"Saved storage state: {path}")
+        except Exception as e:
+            self.logger.warning(f"Failed to save storage state for {base_dir}: {e}")
+
+    async def save_storage_state(self, user_data_dir: str) -> None:
+        base_dir = os.path.abspath(user_data_dir)
+        ctx = self._contexts.get(base_dir)
+        if ctx is not None:
+            await self._save_storage_state(base_dir, ctx)
+
+    async def storage_state(self, user_data_dir: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the account's cookies and local storage without opening a browser:
+        taken from its warm context when one is live, else from the storage_state file.
+        """
+        base_dir = os.path.abspath(user_data_dir)
+        ctx = self._contexts.get(base_dir)
+        if ctx is not None:
+            try:
+                return await ctx.storage_state()
+            except Exception as e:
+                self.logger.warning(f"Failed to read storage state from live context {base_dir}: {e}")
+        path = self.storage_state_path(base_dir)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Failed to read storage state file {path}: {e}")
+            return None
+
+    def parse_cookies(self, cookie_str: Union[str, Dict, List]) -> List[Dict[str, Any]]:
+        """
+        Parses cookie input (string, dict, or list) into Playwright cookie dicts,
+        memoized by content digest. The returned list is shared; do not modify it.
+        """
+        return self._parse_cookies(_cookie_digest(cookie_str), cookie_str)
+
+    def _parse_cookies(self, digest: str, cookie_str: Union[str, Dict, List]) -> List[Dict[str, Any]]:
+        cookies = self._parsed_cookies.get(digest)
+        if cookies is not None:
+            self._parsed_cookies.move_to_end(digest)
+            return cookies
+        cookies = parse_cookie_string(cookie_str)
+        self._cookie_stats["parsed"] += 1
+        self._parsed_cookies[digest] = cookies
+        while len(self._parsed_cookies) > _PARSED_COOKIES_MAX:
+            self._parsed_cookies.popitem(last=False)
+        return cookies
+
+    async def _set_cookies_from_string(self, context, cookie_str: Union[str, Dict, List], base_dir: str):
         """
         Sets cookies in the browser context from a cookie string.
-        
+
+        The parsed cookies are memoized by content digest, and only cookies the
+        context has not been given yet (or with a different value) are added, so
+        repeated requests with the same cookie input are a digest lookup.
+
         Args:
             context: The browser context to set cookies for
             cookie_str: Cookie string in format "key1=value1; key2=value2" or JSON format
+            base_dir: Account directory the context belongs to
         """
         try:
-            cookies = parse_cookie_string(cookie_str)
-            
-            # Add cookies to context if any were parsed
-            if cookies:
-                await context.add_cookies(cookies)
-                self.logger.info(f"Set {len(cookies)} cookies from string in context")
-            else:
+            digest = _cookie_digest(cookie_str)
+            applied = self._applied_cookies.get(base_dir)
+            if applied is not None and applied[0] is not context:
+                applied = None
+            if applied is not None and applied[1] == digest:
+                self._cookie_stats["skipped"] += 1
+                return
+            cookies = self._parse_cookies(digest, cookie_str)
+            if not cookies:
                 self.logger.warning("No cookies could be parsed from the provided cookie string")
-                
+                return
+
+            known = dict(applied[2]) if applied is not None else {}
+            changed = [c for c in cookies if known.get(_cookie_identity(c)) != c.get("value")]
+            if changed:
+                await context.add_cookies(changed)
+                self._cookie_stats["applied"] += 1
+                self.logger.info(f"Set {len(changed)}/{len(cookies)} cookies from string in context: {base_dir}")
+            else:
+                self._cookie_stats["skipped"] += 1
+            known.update((_cookie_identity(c), c.get("value")) for c in cookies)
+            self._applied_cookies[base_dir] = (context, digest, known)
+
         except Exception as e:
             self.logger.error(f"Failed to set cookies from string: {e}")
 
-    async def close_context(self, user_data_dir: str):
-        base_dir = os.path.abspath(user_data_dir)
-        self.logger.debug(f"Closing context: {base_dir}")
+    async def _close(self, base_dir: str) -> None:
         ctx = self._contexts.get(base_dir)
         if ctx is not None:
+            await self._save_storage_state(base_dir, ctx)
             try:
                 await ctx.close()
                 self.logger.info(f"Context closed: {base_dir}")
             except Exception as e:
                 self.logger.error(f"Failed to close context {base_dir}: {e}")
-            self._contexts.pop(base_dir, None)
+            self._forget(base_dir)
         else:
             self.logger.warning(f"Context not found for: {base_dir}")
-        self._cleanup_profile_locks(base_dir)
-        self.logger.debug(f"Cleaned up profile locks for: {base_dir}")
+        if BROWSER_MODE != "shared":
+            self._cleanup_profile_locks(base_dir)
+            self.logger.debug(f"Cleaned up profile locks for: {base_dir}")
+
+    async def close_context(self, user_data_dir: str):
+        """Closes an account's context immediately, regardless of outstanding leases."""
+        base_dir = os.path.abspath(user_data_dir)
+        self.logger.debug(f"Closing context: {base_dir}")
+        await self._close(base_dir)
+        cond = self._get_pool_cond()
+        async with cond:
+            cond.notify_all()
+
+manager = BrowserManager()
 
-manager = BrowserManager()
\ No newline at end of file
+metrics.gauge(
+    "pss_browser_contexts",
+    "Browser contexts in the pool by state",
+    lambda: [({"state": state}, manager.stats()[state]) for state in ("live", "in_use", "idle", "opening")],
+)
+metrics.gauge(
+    "pss_browser_pool_events_total",
+    "Browser pool acquire outcomes and evictions",
+    lambda: [({"event": event}, value) for event, value in manager._stats.items()],
+    metric_type="counter",
+)
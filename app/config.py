@@ -12,3 +12,45 @@ JUEJIN_USER_DATA_DIR = os.path.join(STORAGE_DIR, "juejin_userdata")
 V2EX_USER_DATA_DIR = os.path.join(STORAGE_DIR, "v2ex_userdata")
 PTFANS_USER_DATA_DIR = os.path.join(STORAGE_DIR, "ptfans_userdata")
 TASKS_CONFIG_PATH = os.path.join(STORAGE_DIR, "config")
+BROWSER_MODE = os.getenv("BROWSER_MODE", "persistent").lower()
+STORAGE_STATE_FILENAME = "storage_state.json"
+BROWSER_POOL_MAX_CONTEXTS = int(os.getenv("BROWSER_POOL_MAX_CONTEXTS", "8"))
+BROWSER_POOL_IDLE_TTL = int(os.getenv("BROWSER_POOL_IDLE_TTL", "300"))
+BROWSER_POOL_ACQUIRE_TIMEOUT = int(os.getenv("BROWSER_POOL_ACQUIRE_TIMEOUT", "120"))
+TRANSFER_WORKERS = int(os.getenv("TRANSFER_WORKERS", "4"))
+TRANSFER_PROVIDER_CONCURRENCY = int(os.getenv("TRANSFER_PROVIDER_CONCURRENCY", "2"))
+TRANSFER_PROVIDER_LIMITS = os.getenv("TRANSFER_PROVIDER_LIMITS", "")
+TRANSFER_ACCOUNT_CONCURRENCY = int(os.getenv("TRANSFER_ACCOUNT_CONCURRENCY", "1"))
+TRANSFER_DB_PATH = os.getenv("TRANSFER_DB_PATH", os.path.join(STORAGE_DIR, "transfers.db"))
+TRANSFER_VISIBILITY_TIMEOUT = int(os.getenv("TRANSFER_VISIBILITY_TIMEOUT", "900"))
+TRANSFER_MAX_ATTEMPTS = int(os.getenv("TRANSFER_MAX_ATTEMPTS", "3"))
+TRANSFER_JOB_RETENTION_DAYS = int(os.getenv("TRANSFER_JOB_RETENTION_DAYS", "30"))
+TRANSFER_QUEUE_POLL_INTERVAL = float(os.getenv("TRANSFER_QUEUE_POLL_INTERVAL", "5"))
+TRANSFER_DEDUPE_MAX_ENTRIES = int(os.getenv("TRANSFER_DEDUPE_MAX_ENTRIES", "10000"))
+TRANSFER_DEDUPE_INFLIGHT_TTL = int(os.getenv("TRANSFER_DEDUPE_INFLIGHT_TTL", "3600"))
+TRANSFER_DEDUPE_SUCCESS_TTL = int(os.getenv("TRANSFER_DEDUPE_SUCCESS_TTL", "86400"))
+TRANSFER_DEDUPE_FAILURE_TTL = int(os.getenv("TRANSFER_DEDUPE_FAILURE_TTL", "60"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "20"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+BAIDU_TRANSFER_ENGINE = os.getenv("BAIDU_TRANSFER_ENGINE", "auto").lower()
+BAIDU_API_BASE = os.getenv("BAIDU_API_BASE", "https://pan.baidu.com").rstrip("/")
+ALIPAN_TRANSFER_ENGINE = os.getenv("ALIPAN_TRANSFER_ENGINE", "auto").lower()
+ALIPAN_API_BASE = os.getenv("ALIPAN_API_BASE", "https://api.aliyundrive.com").rstrip("/")
+PAGE_STEP_TIMEOUT = int(os.getenv("PAGE_STEP_TIMEOUT", "15000"))
+PREFLIGHT_ENABLED = os.getenv("PREFLIGHT_ENABLED", "true").lower() in {"1", "true", "yes"}
+PREFLIGHT_TIMEOUT = float(os.getenv("PREFLIGHT_TIMEOUT", "5"))
+PREFLIGHT_CONCURRENCY = int(os.getenv("PREFLIGHT_CONCURRENCY", "16"))
+TASK_ACCOUNT_CONCURRENCY = int(os.getenv("TASK_ACCOUNT_CONCURRENCY", "4"))
+TASKS_RELOAD_DEBOUNCE = float(os.getenv("TASKS_RELOAD_DEBOUNCE", "1"))
+TASKS_DB_PATH = os.getenv("TASKS_DB_PATH", os.path.join(STORAGE_DIR, "tasks.db"))
+TASK_MISFIRE_GRACE_TIME = int(os.getenv("TASK_MISFIRE_GRACE_TIME", "3600"))
+TASK_HISTORY_RETENTION_DAYS = int(os.getenv("TASK_HISTORY_RETENTION_DAYS", "30"))
+TASK_MAX_CONCURRENT_RUNS = int(os.getenv("TASK_MAX_CONCURRENT_RUNS", "2"))
+TASK_STAGGER_WINDOW = float(os.getenv("TASK_STAGGER_WINDOW", "60"))
+TASK_STAGGER_STEP = float(os.getenv("TASK_STAGGER_STEP", "10"))
+TASK_ADMISSION_TIMEOUT = float(os.getenv("TASK_ADMISSION_TIMEOUT", "1800"))
+LOGIN_MAX_SESSIONS = int(os.getenv("LOGIN_MAX_SESSIONS", "4"))
+LOGIN_SESSION_TTL = int(os.getenv("LOGIN_SESSION_TTL", "180"))
+ACCOUNT_STATUS_TTL = int(os.getenv("ACCOUNT_STATUS_TTL", "300"))
+V2EX_SIGNIN_ENGINE = os.getenv("V2EX_SIGNIN_ENGINE", "auto").lower()
+V2EX_BASE_URL = os.getenv("V2EX_BASE_URL", "https://www.v2ex.com").rstrip("/")
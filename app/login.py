@@ -0,0 +1,199 @@
+import time
+import uuid
+import asyncio
+from typing import Optional, Dict, Any, List, Tuple
+from .browser import manager
+from .accounts import account_status
+from .config import LOGIN_MAX_SESSIONS, LOGIN_SESSION_TTL
+from .logger import create_logger
+from .metrics import metrics, LOGIN_SESSIONS_TOTAL, LOGIN_SECONDS
+
+class LoginSessionLimit(Exception):
+    """Raised when LOGIN_MAX_SESSIONS QR login sessions are already waiting for a scan."""
+
+class LoginSessionManager:
+    """
+    Keeps the QR login sessions of every provider, keyed by (provider, account).
+
+    Each session holds a leased browser page showing the QR code, its PNG and a
+    task waiting for the adapter's login signals under the session deadline.
+    Sessions for different accounts run side by side up to `max_sessions`;
+    asking again for an account whose session is still live returns the cached
+    PNG. A background sweeper releases the contexts of sessions that expired
+    without a scan.
+    """
+
+    def __init__(self, max_sessions: int = LOGIN_MAX_SESSIONS, ttl: int = LOGIN_SESSION_TTL) -> None:
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._by_key: Dict[Tuple[str, str], str] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._opening = 0
+        self._sweeper: Optional[asyncio.Task] = None
+        self._stats = {"created": 0, "reused": 0, "logged_in": 0, "expired": 0, "rejected": 0}
+        self.logger = create_logger("login")
+
+    def _key(self, provider: str, account: Optional[str]) -> Tuple[str, str]:
+        return provider, account or "default"
+
+    def _live(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        session = self._sessions.get(self._by_key.get(key, ""))
+        if session is None or session["logged_in"] or session["expires_at"] <= time.time():
+            return None
+        return session
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self._sessions.get(session_id)
+
+    async def get_or_create(self, adapter, account: Optional[str] = None) -> Tuple[str, bytes, bool]:
+        """
+        Returns (session_id, QR code PNG, already logged in) for an account, reusing
+        its live session or opening the adapter's login page in a new one.
+
+        Args:
+            adapter: Share adapter implementing `_open_login` and `_wait_for_login`
+            account: Optional account name selecting the profile
+
+        Raises:
+            LoginSessionLimit: When a new session is needed and the cap is reached
+        """
+        key = self._key(adapter.name, account)
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            session = self._live(key)
+            if session is not None:
+                self._stats["reused"] += 1
+                self.logger.info(f"Reusing QR code session {session['id']} for {adapter.name}/{key[1]}")
+                return session["id"], session["png"], False
+            stale = self._sessions.get(self._by_key.get(key, ""))
+            if stale is not None:
+                await self._discard(stale, "replaced")
+            if len(self._sessions) + self._opening >= self.max_sessions:
+                self._stats["rejected"] += 1
+                raise LoginSessionLimit(f"{len(self._sessions) + self._opening} login sessions already active")
+
+            ud = adapter._resolve_user_data_dir(account)
+            self._opening += 1
+            try:
+                ctx, page = await adapter.open_context_and_page(account)
+                try:
+                    islogin, png = await adapter._open_login(page)
+                except Exception:
+                    await adapter.release_context_and_page(page, account)
+                    raise
+            finally:
+                self._opening -= 1
+            session_id = str(uuid.uuid4())
+            if islogin:
+                # Nothing left to poll; hand the warm context back to the pool
+                await adapter.release_context_and_page(page, account)
+                account_status.mark(adapter, account, "valid")
+                self.logger.info(f"{adapter.name}/{key[1]} is already logged in")
+                return session_id, png, True
+            session = {
+                "id": session_id,
+                "provider": adapter.name,
+                "account": account,
+                "adapter": adapter,
+                "page": page,
+                "png": png,
+                "user_data_dir": ud,
+                "created_at": time.time(),
+                "expires_at": time.time() + self.ttl,
+                "logged_in": False,
+            }
+            self._sessions[session_id] = session
+            self._by_key[key] = session_id
+            self._stats["created"] += 1
+            session["watcher"] = asyncio.create_task(self._watch(session))
+            self._ensure_sweeper()
+            self.logger.info(f"Generated QR code session: {session_id} for {adapter.name}/{key[1]} ({len(self._sessions)} active)")
+            return session_id, png, False
+
+    async def _watch(self, session: Dict[str, Any]) -> None:
+        adapter, provider = session["adapter"], session["provider"]
+        self.logger.info(f"Waiting for login on session: {session['id']}")
+        try:
+            signal = await adapter._wait_for_login(session["page"], int(max(0.0, session["expires_at"] - time.time()) * 1000))
+        except Exception as e:
+            self.logger.warning(f"Login watch failed for session {session['id']}: {e}")
+            signal = None
+        if signal:
+            waited = time.time() - session["created_at"]
+            session["logged_in"] = True
+            self._stats["logged_in"] += 1
+            LOGIN_SESSIONS_TOTAL.inc(provider=provider, outcome="logged_in")
+            LOGIN_SECONDS.observe(waited, provider=provider, signal=signal)
+            self.logger.info(f"Login detected for session {session['id']} by {signal} after {waited:.1f}s")
+            await manager.save_storage_state(session["user_data_dir"])
+            # Re-read the fresh cookies on the next status lookup
+            account_status.invalidate(adapter, session["account"])
+            await self._discard(session, "logged in")
+            return
+        self.logger.warning(f"Login not detected before session expired: {session['id']}")
+        self._stats["expired"] += 1
+        LOGIN_SESSIONS_TOTAL.inc(provider=provider, outcome="expired")
+        await self._discard(session, "expired")
+
+    async def _discard(self, session: Dict[str, Any], reason: str) -> None:
+        """Forgets a session and gives its page and context lease back; safe to call twice."""
+        if self._sessions.pop(session["id"], None) is None:
+            return
+        key = self._key(session["provider"], session["account"])
+        if self._by_key.get(key) == session["id"]:
+            self._by_key.pop(key, None)
+        watcher = session.get("watcher")
+        if watcher is not None and watcher is not asyncio.current_task() and not watcher.done():
+            watcher.cancel()
+        try:
+            await session["adapter"].release_context_and_page(session["page"], session["account"])
+        except Exception as e:
+            self.logger.warning(f"Failed to release context of session {session['id']}: {e}")
+        self.logger.info(f"Closed QR code session {session['id']} ({reason})")
+
+    def _ensure_sweeper(self) -> None:
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def _sweep(self) -> None:
+        interval = max(1, min(10, self.ttl // 6))
+        while self._sessions:
+            await asyncio.sleep(interval)
+            now = time.time()
+            for session in [s for s in self._sessions.values() if s["expires_at"] <= now or s["watcher"].done()]:
+                if session["id"] not in self._sessions:
+                    continue
+                try:
+                    if session["expires_at"] <= now:
+                        self._stats["expired"] += 1
+                        LOGIN_SESSIONS_TOTAL.inc(provider=session["provider"], outcome="expired")
+                    await self._discard(session, "expired")
+                except Exception as e:
+                    self.logger.error(f"Login session sweep failed for {session['id']}: {e}")
+
+    def sessions(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        return [
+            {
+                "session_id": s["id"],
+                "provider": s["provider"],
+                "account": s["account"],
+                "created_at": s["created_at"],
+                "expires_in": max(0, int(s["expires_at"] - now)),
+            }
+            for s in self._sessions.values()
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"active": len(self._sessions), "max_sessions": self.max_sessions, "ttl": self.ttl, **self._stats}
+
+    async def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        for session in list(self._sessions.values()):
+            await self._discard(session, "shutdown")
+
+login_sessions = LoginSessionManager()
+
+metrics.gauge("pss_login_sessions", "QR login sessions waiting for a scan", lambda: [({}, len(login_sessions._sessions))])
@@ -1,17 +1,29 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import StreamingResponse, JSONResponse, RedirectResponse
-from .schemas import TransferLink, TransferResult, ScheduleAtReq, ScheduleBetweenReq, ScheduleWindowReq, ScheduleResult, RunTaskReq, RunTaskResult
-from .tasks.scheduler import task_scheduler
-from .config import TASKS_CONFIG_PATH, BAIDU_USER_DATA_DIR, ALIPAN_USER_DATA_DIR, JUEJIN_USER_DATA_DIR, V2EX_USER_DATA_DIR
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
+from fastapi.responses import StreamingResponse, JSONResponse, RedirectResponse, PlainTextResponse
+from .schemas import TransferLink, TransferResult, TransferBatchReq, TransferBatchResult, TransferValidateReq, TransferValidateResult, TransferJob, TransferJobList, ScheduleAtReq, ScheduleBetweenReq, ScheduleWindowReq, ScheduleResult, RunTaskReq, RunTaskResult, TaskHistory, AccountStatusList
+from .tasks.scheduler import task_scheduler, PERSISTENT_JOBSTORE
+from .tasks.history import task_history
+from .config import PREFLIGHT_ENABLED, TASKS_CONFIG_PATH, TASKS_RELOAD_DEBOUNCE, BAIDU_USER_DATA_DIR, ALIPAN_USER_DATA_DIR, JUEJIN_USER_DATA_DIR, V2EX_USER_DATA_DIR
 from .browser import manager
+from .login import login_sessions, LoginSessionLimit
+from .accounts import account_status
 from .tasks.registry import resolve_task_adapter
-from .adapters.registry import resolve_adapter_from_link, resolve_adapter_from_provider
+from .adapters.registry import resolve_adapter_from_link, resolve_adapter_from_provider, all_adapters
+from .transfers.worker import transfer_pool
+from .transfers.dedupe import IN_FLIGHT
+from .metrics import metrics
+from .transfers.preflight import check_link, check_links, rejection
+from .utils.http import close_client
 from .logger import create_logger
 
 import asyncio
 import os
+import json
 import base64
 import io
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
 from watchfiles import awatch
 
 # Windows Playwright 修复
@@ -25,42 +37,20 @@ main_logger = create_logger("main")
 #       STORAGE SESSIONS
 # ==============================
 
-_LOGIN_SESSIONS = {}  # 保存二维码 session
-
-_TRANSFER_QUEUE = asyncio.Queue()
-_TRANSFER_PENDING = set()
-
-async def _transfer_worker():
-    while True:
-        item = await _TRANSFER_QUEUE.get()
-        if len(item) == 3:  # adapter, url, cookies
-            adapter, url, cookies = item
-        else:  # backward compatibility: adapter, url
-            adapter, url = item
-            cookies = None
-        try:
-            try:
-                main_logger.info(f"Processing transfer request for {adapter.name}: {url}")
-                # Execute the transfer with cookies
-                await adapter.transfer(url, cookie_str=cookies)
-            except NotImplementedError:
-                main_logger.warning(f"Transfer method not implemented for {adapter.name}")
-                # Update the result in the queue to indicate the error
-                # Note: For this to work properly, we need to pass result back in a different way
-                # For now, just return the error but this won't be reflected in the final result
-                # The proper fix would involve changing how results are handled in the queue
-                return  # This will end the loop iteration, but the task_done is still called
-            except Exception as e:
-                main_logger.error(f"Transfer failed for {adapter.name}: {e}")
-                raise
-        finally:
-            _TRANSFER_QUEUE.task_done()
-            # _TRANSFER_PENDING.discard(url)
+async def _reload_tasks_config(path: str):
+    # Editors emit several events per save; only the last one in the window triggers a reload
+    await asyncio.sleep(TASKS_RELOAD_DEBOUNCE)
+    try:
+        result = task_scheduler.reload_from_config(path)
+        main_logger.info(f"Tasks config reload finished: {result.get('status')}")
+    except Exception as e:
+        main_logger.error(f"Failed to reload tasks config: {e}")
 
 async def _tasks_config_watcher():
     watch_dir = TASKS_CONFIG_PATH or "."
     if os.path.isdir(watch_dir):
         main_logger.info(f"Starting tasks config watcher for directory: {watch_dir}")
+        pending: Optional[asyncio.Task] = None
         async for changes in awatch(watch_dir):
             try:
                 # Check if the changed file is tasks.json
@@ -68,11 +58,9 @@ async def _tasks_config_watcher():
                     filename = os.path.basename(changed)
                     if filename == "tasks.json":
                         main_logger.info(f"Detected change in tasks.json: {change_type} - {changed}")
-                        try:
-                            task_scheduler.reload_from_config(changed)
-                            main_logger.info("Tasks config reloaded successfully")
-                        except Exception as e:
-                            main_logger.error(f"Failed to reload tasks config: {e}")
+                        if pending is not None and not pending.done():
+                            pending.cancel()
+                        pending = asyncio.create_task(_reload_tasks_config(changed))
                         break
             except Exception as e:
                 main_logger.error(f"Error in tasks config watcher: {e}")
@@ -80,7 +68,7 @@ async def _tasks_config_watcher():
 @app.on_event("startup")
 async def _on_startup():
     main_logger.info("Application starting up")
-    asyncio.create_task(_transfer_worker())
+    await transfer_pool.start()
     try:
         os.makedirs(TASKS_CONFIG_PATH or ".", exist_ok=True)
         main_logger.info(f"Ensured config directory exists: {TASKS_CONFIG_PATH}")
@@ -106,6 +94,18 @@ async def _on_startup():
 @app.on_event("shutdown")
 async def _on_shutdown():
     main_logger.info("Application shutting down")
+    try:
+        await transfer_pool.stop()
+    except Exception as e:
+        main_logger.error(f"Error stopping transfer workers: {e}")
+    try:
+        await close_client()
+    except Exception as e:
+        main_logger.error(f"Error closing HTTP client: {e}")
+    try:
+        await login_sessions.stop()
+    except Exception as e:
+        main_logger.error(f"Error closing login sessions: {e}")
     try:
         await manager.stop()
         main_logger.info("Browser manager stopped")
@@ -122,30 +122,57 @@ async def login_qr(provider: str = "baidu", as_image: bool = False, account: str
         raise HTTPException(status_code=400, detail="unsupported provider")
     try:
         session_id, png, islogin = await adapter.get_qr_code(account or None)
+    except LoginSessionLimit as e:
+        return JSONResponse(status_code=429, content={"error": "too_many_login_sessions", "message": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
-    if not islogin:
-        asyncio.create_task(adapter.poll_login_status(session_id))
-        if as_image:
-            return StreamingResponse(io.BytesIO(png), media_type="image/png")
+    if not islogin and as_image:
+        return StreamingResponse(io.BytesIO(png), media_type="image/png")
+    session = login_sessions.get(session_id)
     return {
         "session_id": session_id,
         "image_base64": base64.b64encode(png).decode(),
-        "expires_in": 180,
+        "expires_in": max(0, int(session["expires_at"] - time.time())) if session else login_sessions.ttl,
         "islogin": islogin,
     }
 
+@app.get("/login/sessions")
+async def login_sessions_status():
+    return {**login_sessions.stats(), "sessions": login_sessions.sessions()}
+
+@app.get("/accounts/status", response_model=AccountStatusList)
+async def accounts_status(provider: Optional[str] = None, refresh: bool = False):
+    if provider:
+        adapter = resolve_adapter_from_provider(provider)
+        if adapter is None:
+            raise HTTPException(status_code=400, detail="unsupported provider")
+        adapters = [adapter]
+    else:
+        adapters = all_adapters()
+    statuses = await account_status.list(adapters, refresh=refresh)
+    return {
+        "accounts": [
+            {
+                **s,
+                "checked_at": datetime.fromtimestamp(s["checked_at"]).astimezone(),
+                "expires_at": datetime.fromtimestamp(s["expires_at"]).astimezone() if s["expires_at"] else None,
+            }
+            for s in statuses
+        ],
+        "ttl": account_status.ttl,
+    }
+
 @app.get("/login/vnc")
 async def login_vnc(provider: str = "baidu",  account: str = ""):
     adapter = resolve_adapter_from_provider(provider)
     if not hasattr(adapter, "get_qr_code"):
         raise HTTPException(status_code=400, detail="unsupported provider")
     try:
-        session_id, _, islogin = await adapter.get_qr_code(account or None)
+        await adapter.get_qr_code(account or None)
+    except LoginSessionLimit as e:
+        return JSONResponse(status_code=429, content={"error": "too_many_login_sessions", "message": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
-    if not islogin:
-        asyncio.create_task(adapter.poll_login_status(session_id))
     return RedirectResponse(url="http://localhost:6080/vnc.html?autoconnect=true&resize=scale&view_clip=true")
 
 @app.post("/transfer", response_model=TransferResult)
@@ -156,31 +183,145 @@ async def transfer(req: TransferLink):
         main_logger.warning(f"Unsupported provider for URL: {req.url}")
         raise HTTPException(status_code=400, detail="unsupported provider")
     url = (req.url or "").strip().strip('`"')
-    if url in _TRANSFER_PENDING:
-        main_logger.info(f"Duplicate transfer request ignored: {url}")
+    key = adapter.share_key(url)
+    seen = transfer_pool.dedupe.check(key)
+    if seen is not None:
+        main_logger.info(f"Duplicate transfer request ignored ({seen['state']}): {url}")
         return {
             "status": "ignored",
             "provider": getattr(adapter, "name", "unknown"),
             "share_link": url,
             "target_path": None,
-            "message": "duplicate",
+            "message": f"duplicate:{seen['state']}",
+            "job_id": seen.get("job_id"),
         }
-    _TRANSFER_PENDING.add(url)
-    main_logger.info(f"Queuing transfer for {adapter.name}: {url}")
-    await _TRANSFER_QUEUE.put((adapter, url, req.cookies))
+    # Claim the share before awaiting preflight so a concurrent request for it is ignored;
+    # reject() and submit() replace the claim with the job's own entry
+    transfer_pool.dedupe.mark(key, IN_FLIGHT)
+    try:
+        if PREFLIGHT_ENABLED:
+            check = await check_link(adapter, url)
+            rejected = rejection(check)
+            if rejected is not None:
+                main_logger.info(f"Preflight rejected transfer ({check['state']}): {url}")
+                job_id = await transfer_pool.reject(adapter.name, url, req.account, rejected, {"preflight": check["elapsed_ms"] / 1000})
+                return {**rejected, "job_id": job_id}
+        main_logger.info(f"Queuing transfer for {adapter.name}: {url}")
+        job_id = await transfer_pool.submit(adapter.name, url, account=req.account, cookies=req.cookies)
+    except BaseException:
+        transfer_pool.dedupe.discard(key)
+        raise
     return {
         "status": "accepted",
         "provider": getattr(adapter, "name", "unknown"),
         "share_link": url,
         "target_path": None,
         "message": "queued",
+        "job_id": job_id,
     }
 
+@app.post("/transfer/batch", response_model=TransferBatchResult)
+async def transfer_batch(req: TransferBatchReq):
+    main_logger.info(f"Batch transfer request received: {len(req.links)} link(s)")
+    results: List[Optional[Dict[str, Any]]] = [None] * len(req.links)
+    groups: Dict[Tuple[str, Optional[str], Optional[str]], Dict[str, Any]] = {}
+    candidates: List[Tuple[int, Any, str, TransferLink, str]] = []
+    for idx, link in enumerate(req.links):
+        url = (link.url or "").strip().strip('`"')
+        adapter = resolve_adapter_from_link(url) if url else None
+        if adapter is None:
+            results[idx] = {"status": "error", "provider": "unknown", "share_link": url, "target_path": None, "message": "unsupported provider"}
+            continue
+        key = adapter.share_key(url)
+        seen = transfer_pool.dedupe.check(key)
+        if seen is not None:
+            results[idx] = {
+                "status": "ignored",
+                "provider": adapter.name,
+                "share_link": url,
+                "target_path": None,
+                "message": f"duplicate:{seen['state']}",
+                "job_id": seen.get("job_id"),
+            }
+            continue
+        # Claimed before preflight, like /transfer; this also catches repeats within the batch
+        transfer_pool.dedupe.mark(key, IN_FLIGHT)
+        candidates.append((idx, adapter, url, link, key))
+    try:
+        if PREFLIGHT_ENABLED and candidates:
+            checks = await check_links([url for _, _, url, _, _ in candidates])
+        else:
+            checks = [None] * len(candidates)
+        for (idx, adapter, url, link, _), check in zip(candidates, checks):
+            rejected = rejection(check) if check is not None else None
+            if rejected is not None:
+                job_id = await transfer_pool.reject(adapter.name, url, link.account, rejected, {"preflight": check["elapsed_ms"] / 1000})
+                results[idx] = {**rejected, "job_id": job_id}
+                continue
+            # Links only share a browser session when they also share the same cookies
+            cookies_key = json.dumps(link.cookies, sort_keys=True, ensure_ascii=False, default=str) if link.cookies else None
+            group = groups.setdefault((adapter.name, link.account or None, cookies_key), {"indexes": [], "urls": [], "cookies": link.cookies})
+            group["indexes"].append(idx)
+            group["urls"].append(url)
+        main_logger.info(f"Batch grouped into {len(groups)} provider/account group(s)")
+        for (provider, account, _), group in groups.items():
+            job_ids = await transfer_pool.submit_batch(provider, group["urls"], account=account, cookies=group["cookies"])
+            for idx, url, job_id in zip(group["indexes"], group["urls"], job_ids):
+                results[idx] = {"status": "accepted", "provider": provider, "share_link": url, "target_path": None, "message": "queued", "job_id": job_id}
+    except BaseException:
+        # Release the claims of links that never reached the job store
+        for idx, _, _, _, key in candidates:
+            if results[idx] is None:
+                transfer_pool.dedupe.discard(key)
+        raise
+    return {"results": results}
+
+@app.post("/transfer/validate", response_model=TransferValidateResult)
+async def transfer_validate(req: TransferValidateReq):
+    main_logger.info(f"Validate request received: {len(req.links)} link(s)")
+    return {"results": await check_links(req.links)}
+
+@app.get("/transfer/queue")
+async def transfer_queue():
+    return await transfer_pool.stats()
+
+def _job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    for key in ("created_at", "started_at", "finished_at"):
+        if job.get(key) is not None:
+            job[key] = datetime.fromtimestamp(job[key]).astimezone()
+    return job
+
+@app.get("/transfer/{job_id}", response_model=TransferJob)
+async def transfer_status(job_id: str):
+    job = await transfer_pool.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job_not_found")
+    return _job_response(job)
+
+@app.get("/transfers", response_model=TransferJobList)
+async def transfer_list(
+    provider: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    items, total = await transfer_pool.jobs.query(
+        provider=provider.lower() if provider else None,
+        status=status,
+        since=since.timestamp() if since else None,
+        until=until.timestamp() if until else None,
+        limit=limit,
+        offset=offset,
+    )
+    return {"items": [_job_response(j) for j in items], "total": total, "limit": limit, "offset": offset}
+
 @app.post("/tasks/schedule_at", response_model=ScheduleResult)
 async def schedule_at(req: ScheduleAtReq):
     if resolve_task_adapter(req.adapter) is None:
         raise HTTPException(status_code=400, detail="adapter_not_found")
-    result = task_scheduler.schedule_at(req.adapter, req.run_at, provider=req.provider, accounts=req.accounts, cookies=None)
+    result = task_scheduler.schedule_at(req.adapter, req.run_at, provider=req.provider, accounts=req.accounts, cookies=None, persistent=True)
     return {
         "job_id": result["job_id"],
         "adapter": result["adapter"],
@@ -193,7 +334,7 @@ async def schedule_between(req: ScheduleBetweenReq):
     if resolve_task_adapter(req.adapter) is None:
         raise HTTPException(status_code=400, detail="adapter_not_found")
     try:
-        result = task_scheduler.schedule_between(req.adapter, req.start_at, req.end_at, provider=req.provider, accounts=req.accounts, cookies=None)
+        result = task_scheduler.schedule_between(req.adapter, req.start_at, req.end_at, provider=req.provider, accounts=req.accounts, cookies=None, persistent=True)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     return {
@@ -208,7 +349,7 @@ async def schedule_window(req: ScheduleWindowReq):
     if resolve_task_adapter(req.adapter) is None:
         raise HTTPException(status_code=400, detail="adapter_not_found")
     try:
-        result = task_scheduler.schedule_window(req.adapter, req.base_at, req.window_minutes, provider=req.provider, accounts=req.accounts, cookies=None)
+        result = task_scheduler.schedule_window(req.adapter, req.base_at, req.window_minutes, provider=req.provider, accounts=req.accounts, cookies=None, persistent=True)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     return {
@@ -220,13 +361,51 @@ async def schedule_window(req: ScheduleWindowReq):
 
 @app.post("/tasks/run_now", response_model=RunTaskResult)
 async def run_now(req: RunTaskReq):
+    """
+    Starts the task in the background and answers "accepted" at once. Per-account
+    results are recorded in the run history: GET /tasks/history?adapter=<adapter>&since=<triggered_at>.
+    """
     if resolve_task_adapter(req.adapter) is None:
         raise HTTPException(status_code=400, detail="adapter_not_found")
-    result = await task_scheduler.run_now(req.adapter, provider=req.provider, accounts=req.accounts, cookies=None)
+    result = task_scheduler.run_now(req.adapter, provider=req.provider, accounts=req.accounts, cookies=None)
     return {
-        "status": result.get("status"),
+        "status": result["status"],
         "adapter": req.adapter,
         "message": result.get("message"),
+        "triggered_at": datetime.fromtimestamp(result["triggered_at"]).astimezone(),
+    }
+
+def _run_response(run: Dict[str, Any]) -> Dict[str, Any]:
+    for key in ("started_at", "finished_at", "last_run_at"):
+        if run.get(key) is not None:
+            run[key] = datetime.fromtimestamp(run[key]).astimezone()
+    return run
+
+@app.get("/tasks/history", response_model=TaskHistory)
+async def tasks_history(
+    adapter: Optional[str] = None,
+    account: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    items, total, aggregates = await task_history.query(
+        adapter=adapter.lower() if adapter else None,
+        account=account,
+        status=status,
+        since=since.timestamp() if since else None,
+        until=until.timestamp() if until else None,
+        limit=limit,
+        offset=offset,
+    )
+    return {
+        "items": [_run_response(r) for r in items],
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "aggregates": [_run_response(a) for a in aggregates],
     }
 
 @app.get("/adapters/enabled")
@@ -236,24 +415,34 @@ async def adapters_enabled():
     adapters = sorted({getattr(a, "name", k) for k, a in adapters_registry._REGISTRY.items()})
     return {"providers": providers, "adapters": adapters}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(await metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/browser/pool")
+async def browser_pool():
+    return manager.stats()
+
 @app.get("/tasks/enabled")
 async def tasks_enabled():
     from .tasks import registry as tasks_registry
     names = sorted(list(tasks_registry._TASK_REGISTRY.keys()))
     jobs = []
     try:
-        for job in task_scheduler._scheduler.get_jobs():
-            adapter_name = None
-            try:
-                if job.args and len(job.args) >= 1:
-                    adapter_name = job.args[0]
-            except Exception:
-                pass
-            jobs.append({
-                "job_id": job.id,
-                "adapter": adapter_name,
-                "next_run_time": job.next_run_time.isoformat() if job.next_run_time else None,
-            })
+        for jobstore in ("default", PERSISTENT_JOBSTORE):
+            for job in task_scheduler._scheduler.get_jobs(jobstore=jobstore):
+                adapter_name = None
+                try:
+                    if job.args and len(job.args) >= 1:
+                        adapter_name = job.args[0]
+                except Exception:
+                    pass
+                jobs.append({
+                    "job_id": job.id,
+                    "adapter": adapter_name,
+                    "next_run_time": job.next_run_time.isoformat() if job.next_run_time else None,
+                    "persistent": jobstore == PERSISTENT_JOBSTORE,
+                })
     except Exception:
         pass
     return {"tasks": names, "scheduled_jobs": jobs}
@@ -0,0 +1,171 @@
+"""
+Minimal Prometheus text-format metrics.
+
+Counters and histograms are updated in-process; gauges are collected at scrape
+time by callbacks so they always reflect the live queue, worker and browser
+pool state. Everything is rendered by `metrics.render()` for `/metrics`.
+"""
+import inspect
+from typing import Dict, Any, List, Tuple, Callable, Iterable, Optional
+from .logger import create_logger
+
+logger = create_logger("metrics")
+
+_DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = _DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[LabelValues, Dict[str, Any]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["counts"][i] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series["counts"]):
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, ('le', _number(bound)))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(round(series['sum'], 6))}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {series['count']}")
+        return lines
+
+class Gauge:
+    """
+    Metric whose samples are produced by a (sync or async) callback at scrape time.
+    `metric_type` may be "counter" for monotonic values kept elsewhere.
+    """
+
+    def __init__(self, name: str, help_text: str, collect: Callable[[], Any], metric_type: str = "gauge") -> None:
+        self.name = name
+        self.help = help_text
+        self.collect = collect
+        self.metric_type = metric_type
+
+    async def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.metric_type}"]
+        try:
+            samples = self.collect()
+            if inspect.isawaitable(samples):
+                samples = await samples
+        except Exception as e:
+            logger.warning(f"Failed to collect {self.name}: {e}")
+            return lines
+        for labels, value in samples:
+            lines.append(f"{self.name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: List[Any] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = _DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str, collect: Callable[[], Any], metric_type: str = "gauge") -> Gauge:
+        metric = Gauge(name, help_text, collect, metric_type)
+        self._metrics.append(metric)
+        return metric
+
+    async def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            if isinstance(metric, Gauge):
+                lines.extend(await metric.render())
+            else:
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+STEP_SECONDS = metrics.histogram(
+    "pss_step_duration_seconds",
+    "Duration of individual browser/adapter steps",
+    ("provider", "flow", "step"),
+)
+TRANSFERS_TOTAL = metrics.counter(
+    "pss_transfers_total",
+    "Finished transfers by provider and result status",
+    ("provider", "status"),
+)
+TRANSFER_SECONDS = metrics.histogram(
+    "pss_transfer_duration_seconds",
+    "Transfer time from enqueue to result, by provider",
+    ("provider",),
+)
+TASK_RUNS_TOTAL = metrics.counter(
+    "pss_task_runs_total",
+    "Scheduled or manual task runs by task and result status",
+    ("task", "status"),
+)
+TASK_RUN_SECONDS = metrics.histogram(
+    "pss_task_run_duration_seconds",
+    "Task run duration by task",
+    ("task",),
+)
+TASK_ADMISSION_WAIT_SECONDS = metrics.histogram(
+    "pss_task_admission_wait_seconds",
+    "Time a task run waited for its launch slot and run slot before starting",
+    ("task",),
+)
+LOGIN_SESSIONS_TOTAL = metrics.counter(
+    "pss_login_sessions_total",
+    "Finished QR login sessions by provider and outcome",
+    ("provider", "outcome"),
+)
+LOGIN_SECONDS = metrics.histogram(
+    "pss_login_duration_seconds",
+    "Time from serving the QR code to detecting the login, by provider and the signal that detected it",
+    ("provider", "signal"),
+)
@@ -14,6 +14,46 @@ class TransferResult(BaseModel):
     share_link: str
     message: Optional[str] = None
     target_path: Optional[str] = None
+    job_id: Optional[str] = None
+
+class TransferBatchReq(BaseModel):
+    links: List[TransferLink]
+
+class TransferBatchResult(BaseModel):
+    results: List[TransferResult]
+
+class TransferValidateReq(BaseModel):
+    links: List[str]
+
+class ShareCheck(BaseModel):
+    provider: str
+    share_link: str
+    state: str
+    message: Optional[str] = None
+    elapsed_ms: float
+
+class TransferValidateResult(BaseModel):
+    results: List[ShareCheck]
+
+class TransferJob(BaseModel):
+    job_id: str
+    status: str
+    provider: str
+    account: Optional[str] = None
+    share_link: str
+    message: Optional[str] = None
+    target_path: Optional[str] = None
+    result: Optional[TransferResult] = None
+    timings: Optional[Dict[str, float]] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class TransferJobList(BaseModel):
+    items: List[TransferJob]
+    total: int
+    limit: int
+    offset: int
 
 class ScheduleAtReq(BaseModel):
     adapter: str
@@ -59,3 +99,51 @@ class RunTaskResult(BaseModel):
     status: str
     adapter: str
     message: Optional[str] = None
+    # The run's history rows (trigger "manual") start at or after this time
+    triggered_at: datetime
+
+class TaskRun(BaseModel):
+    id: int
+    adapter: str
+    provider: Optional[str] = None
+    account: Optional[str] = None
+    trigger: str
+    status: str
+    message: Optional[str] = None
+    started_at: datetime
+    finished_at: datetime
+    duration_ms: float
+    delay_ms: float = 0.0
+
+class TaskRunAggregate(BaseModel):
+    adapter: str
+    runs: int
+    successes: int
+    failures: int
+    dropped: int = 0
+    success_rate: float
+    avg_ms: Optional[float] = None
+    p95_ms: Optional[float] = None
+    max_ms: Optional[float] = None
+    avg_delay_ms: float = 0.0
+    max_delay_ms: float = 0.0
+    last_run_at: datetime
+
+class TaskHistory(BaseModel):
+    items: List[TaskRun]
+    total: int
+    limit: int
+    offset: int
+    aggregates: List[TaskRunAggregate]
+
+class AccountStatus(BaseModel):
+    provider: str
+    account: str
+    state: str
+    expires_at: Optional[datetime] = None
+    checked_at: datetime
+    source: str
+
+class AccountStatusList(BaseModel):
+    accounts: List[AccountStatus]
+    ttl: int
@@ -0,0 +1,101 @@
+import time
+import asyncio
+from typing import Optional, Dict, Any
+from ..config import TASK_MAX_CONCURRENT_RUNS, TASK_STAGGER_WINDOW, TASK_STAGGER_STEP, TASK_ADMISSION_TIMEOUT
+from ..logger import create_logger
+from ..metrics import metrics
+
+class TaskAdmission:
+    """
+    Decides when a task run may start, so that cron entries firing in the same
+    minute do not all launch a browser at once.
+
+    Scheduled runs first take the next free launch slot: a run that fires while
+    the previous launch is less than `stagger_step` seconds ago is pushed back
+    by one step. Offsets past `stagger_window` seconds wrap around to the start
+    of the window, so a long burst keeps spreading over it instead of piling up
+    at its end. Every run,
+    scheduled or manual, then waits for one of `max_concurrent` run slots; a run
+    still waiting after `max_wait` seconds is dropped.
+    """
+
+    def __init__(self, max_concurrent: int = TASK_MAX_CONCURRENT_RUNS, stagger_window: float = TASK_STAGGER_WINDOW, stagger_step: float = TASK_STAGGER_STEP, max_wait: float = TASK_ADMISSION_TIMEOUT) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self.stagger_window = max(0.0, stagger_window)
+        self.stagger_step = max(0.0, stagger_step)
+        self.max_wait = max_wait
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._next_launch = 0.0
+        self.running = 0
+        self.waiting = 0
+        self.delayed = 0
+        self.dropped = 0
+        self.logger = create_logger("task-admission")
+
+    def _get_sem(self) -> asyncio.Semaphore:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_concurrent)
+        return self._sem
+
+    def _stagger_delay(self) -> float:
+        if self.stagger_window <= 0 or self.stagger_step <= 0:
+            return 0.0
+        now = time.monotonic()
+        # The launch cursor keeps stepping through a burst; only the delay wraps
+        offset = max(0.0, self._next_launch - now)
+        self._next_launch = now + offset + self.stagger_step
+        return offset if offset <= self.stagger_window else offset % self.stagger_window
+
+    async def acquire(self, name: str, stagger: bool = True) -> Optional[float]:
+        """
+        Waits until the run may start.
+
+        Args:
+            name: Task adapter name, for logging
+            stagger: Whether to apply the launch stagger (scheduled runs only)
+
+        Returns:
+            Seconds spent waiting, or None when the run was dropped. A returned
+            value means a run slot is held and `release` must be called.
+        """
+        start = time.monotonic()
+        delay = self._stagger_delay() if stagger else 0.0
+        if delay > 0:
+            self.logger.info(f"Staggering task {name} by {delay:.1f}s")
+            await asyncio.sleep(delay)
+        self.waiting += 1
+        try:
+            timeout = self.max_wait if self.max_wait > 0 else None
+            await asyncio.wait_for(self._get_sem().acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            self.logger.warning(f"Dropping task {name}: no run slot free after {self.max_wait}s ({self.running} running)")
+            return None
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        waited = time.monotonic() - start
+        if waited >= 1:
+            self.delayed += 1
+            self.logger.info(f"Task {name} admitted after {waited:.1f}s")
+        return waited
+
+    def release(self) -> None:
+        self.running -= 1
+        self._get_sem().release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": self.running,
+            "waiting": self.waiting,
+            "delayed": self.delayed,
+            "dropped": self.dropped,
+            "stagger_window": self.stagger_window,
+            "stagger_step": self.stagger_step,
+        }
+
+task_admission = TaskAdmission()
+
+metrics.gauge("pss_task_runs_running", "Task runs currently holding a run slot", lambda: [({}, task_admission.running)])
+metrics.gauge("pss_task_runs_waiting", "Task runs waiting for a free run slot", lambda: [({}, task_admission.waiting)])
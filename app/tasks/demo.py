@@ -23,7 +23,13 @@ class DemoAdapter(TaskAdapter):
         if not adapter:
             logger.error(f"Unknown provider: {provider}")
             return {"status": "error", "message": "unknown_provider", "provider": provider}
-        logger.info(f"Opening context and page for provider: {p}")
-        ctx, page = await adapter.open_context_and_page(cookie_str=cookies)
+
+        async def _open(account: Optional[str]) -> Dict[str, Any]:
+            logger.info(f"Opening context and page for provider: {p}, account: {account}")
+            ctx, page = await adapter.open_context_and_page(account, cookie_str=self.account_cookies(cookies, account, accounts or []))
+            await adapter.release_context_and_page(page, account)
+            return {"status": "success"}
+
+        result = await self.run_for_accounts(accounts, _open)
         logger.info("Demo task completed successfully")
-        return {"status": "success"}
\ No newline at end of file
+        return result
\ No newline at end of file
@@ -0,0 +1,152 @@
+import time
+import sqlite3
+from typing import Optional, Dict, Any, List, Tuple
+from ..config import TASKS_DB_PATH, TASK_HISTORY_RETENTION_DAYS
+from ..utils.sqlite import SqliteStore
+from ..logger import create_logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    adapter TEXT NOT NULL,
+    provider TEXT,
+    account TEXT,
+    trigger TEXT NOT NULL,
+    status TEXT NOT NULL,
+    message TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    duration_ms REAL NOT NULL,
+    delay_ms REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_task_runs_started ON task_runs(started_at);
+CREATE INDEX IF NOT EXISTS idx_task_runs_adapter ON task_runs(adapter, started_at);
+CREATE INDEX IF NOT EXISTS idx_task_runs_status ON task_runs(status, started_at);
+"""
+
+# Old rows are pruned once every this many inserts
+_PRUNE_EVERY = 200
+
+class TaskRunStore(SqliteStore):
+    """
+    Append-only log of task runs, one row per account with its outcome,
+    duration and admission delay, plus the per-adapter aggregates served by
+    /tasks/history. Runs that never started are logged with status "dropped".
+    """
+
+    def __init__(self, path: str = TASKS_DB_PATH, retention_days: int = TASK_HISTORY_RETENTION_DAYS) -> None:
+        super().__init__(path, _SCHEMA)
+        self.retention_days = retention_days
+        self._inserts = 0
+        self.logger = create_logger("task-history")
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        if "delay_ms" not in self._columns(conn, "task_runs"):
+            conn.execute("ALTER TABLE task_runs ADD COLUMN delay_ms REAL NOT NULL DEFAULT 0")
+
+    async def record(self, adapter: str, provider: Optional[str], trigger: str, result: Dict[str, Any], started_at: float, finished_at: float, delay_ms: float = 0.0) -> None:
+        """
+        Records one task run: a row per account when the result has a per-account
+        map (see TaskAdapter.run_for_accounts), otherwise a single row.
+
+        Args:
+            adapter: Task adapter name
+            provider: Provider the task ran against
+            trigger: "scheduled" or "manual"
+            result: Result dict returned by the task
+            started_at: Epoch seconds when the run started
+            finished_at: Epoch seconds when the run finished
+            delay_ms: Time the run waited for admission before it started
+        """
+        per_account = result.get("accounts") if isinstance(result.get("accounts"), dict) else None
+        rows: List[Tuple[Any, ...]] = []
+        if per_account:
+            for account, res in per_account.items():
+                res = res if isinstance(res, dict) else {}
+                start = float(res.get("started_at") or started_at)
+                duration = float(res.get("duration_ms") if res.get("duration_ms") is not None else (finished_at - start) * 1000)
+                rows.append((adapter, provider, None if account == "default" else account, trigger, res.get("status") or "unknown", res.get("message"), start, start + duration / 1000, duration, delay_ms))
+        else:
+            rows.append((adapter, provider, None, trigger, result.get("status") or "unknown", result.get("message"), started_at, finished_at, (finished_at - started_at) * 1000, delay_ms))
+        self._inserts += 1
+        prune = self.retention_days > 0 and self._inserts % _PRUNE_EVERY == 1
+
+        def _record(conn: sqlite3.Connection) -> None:
+            conn.executemany(
+                "INSERT INTO task_runs (adapter, provider, account, trigger, status, message, started_at, finished_at, duration_ms, delay_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            if prune:
+                deleted = conn.execute("DELETE FROM task_runs WHERE started_at < ?", (time.time() - self.retention_days * 86400,)).rowcount
+                if deleted:
+                    self.logger.info(f"Pruned {deleted} task run(s) older than {self.retention_days} day(s)")
+        await self.run(_record)
+
+    @staticmethod
+    def _where(adapter: Optional[str], account: Optional[str], status: Optional[str], since: Optional[float], until: Optional[float]) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if adapter:
+            clauses.append("adapter = ?")
+            params.append(adapter)
+        if account:
+            clauses.append("account = ?")
+            params.append(account)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if since is not None:
+            clauses.append("started_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("started_at < ?")
+            params.append(until)
+        return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    async def query(self, adapter: Optional[str] = None, account: Optional[str] = None, status: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None, limit: int = 50, offset: int = 0) -> Tuple[List[Dict[str, Any]], int, List[Dict[str, Any]]]:
+        """
+        Returns (runs newest first, total matching runs, per-adapter aggregates).
+        The aggregates cover every matching run, not only the returned page;
+        duration figures leave out dropped runs, which never started.
+        """
+        where, params = self._where(adapter, account, status, since, until)
+
+        def _query(conn: sqlite3.Connection) -> Tuple[List[Dict[str, Any]], int, List[Dict[str, Any]]]:
+            total = conn.execute(f"SELECT COUNT(*) FROM task_runs{where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM task_runs{where} ORDER BY started_at DESC LIMIT ? OFFSET ?",
+                [*params, limit, offset],
+            ).fetchall()
+            aggregates: List[Dict[str, Any]] = []
+            for agg in conn.execute(
+                f"SELECT adapter, COUNT(*) AS runs, SUM(status = 'success') AS successes, SUM(status = 'dropped') AS dropped, "
+                f"AVG(CASE WHEN status != 'dropped' THEN duration_ms END) AS avg_ms, MAX(CASE WHEN status != 'dropped' THEN duration_ms END) AS max_ms, "
+                f"AVG(delay_ms) AS avg_delay_ms, MAX(delay_ms) AS max_delay_ms, MAX(started_at) AS last_run_at "
+                f"FROM task_runs{where} GROUP BY adapter ORDER BY adapter",
+                params,
+            ).fetchall():
+                adapter_where = f"{where} AND adapter = ? AND status != 'dropped'" if where else " WHERE adapter = ? AND status != 'dropped'"
+                # Nearest-rank p95 without loading every duration
+                rank = max(0, int((agg["runs"] - agg["dropped"]) * 0.95 + 0.5) - 1)
+                p95 = conn.execute(
+                    f"SELECT duration_ms FROM task_runs{adapter_where} ORDER BY duration_ms LIMIT 1 OFFSET ?",
+                    [*params, agg["adapter"], rank],
+                ).fetchone()
+                aggregates.append({
+                    "adapter": agg["adapter"],
+                    "runs": agg["runs"],
+                    "successes": agg["successes"],
+                    "failures": agg["runs"] - agg["successes"],
+                    "success_rate": round(agg["successes"] / agg["runs"], 4) if agg["runs"] else 0.0,
+                    "dropped": agg["dropped"],
+                    "avg_ms": round(agg["avg_ms"], 1) if agg["avg_ms"] is not None else None,
+                    "p95_ms": round(p95[0], 1) if p95 else None,
+                    "max_ms": round(agg["max_ms"], 1) if agg["max_ms"] is not None else None,
+                    "avg_delay_ms": round(agg["avg_delay_ms"], 1),
+                    "max_delay_ms": round(agg["max_delay_ms"], 1),
+                    "last_run_at": agg["last_run_at"],
+                })
+            return [dict(r) for r in rows], total, aggregates
+        return await self.run(_query)
+
+task_history = TaskRunStore()
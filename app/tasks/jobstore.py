@@ -0,0 +1,120 @@
+import pickle
+import sqlite3
+from typing import Optional, List
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, JobLookupError, ConflictingIdError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+from ..utils.sqlite import SqliteStore
+from ..logger import create_logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scheduled_jobs (
+    id TEXT PRIMARY KEY,
+    next_run_time REAL,
+    job_state BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scheduled_jobs_next_run ON scheduled_jobs(next_run_time);
+"""
+
+class SqliteJobStore(BaseJobStore):
+    """
+    APScheduler job store kept in a SQLite file, so jobs survive restarts.
+
+    Same storage layout as APScheduler's SQLAlchemyJobStore (pickled job state
+    indexed by next run time) on top of the stdlib sqlite3 module. Jobs stored
+    here must reference a module-level function.
+    """
+
+    def __init__(self, path: str, pickle_protocol: int = pickle.HIGHEST_PROTOCOL) -> None:
+        super().__init__()
+        self.pickle_protocol = pickle_protocol
+        self.db = SqliteStore(path, _SCHEMA)
+        self.logger = create_logger("jobstore")
+
+    def start(self, scheduler, alias) -> None:
+        super().start(scheduler, alias)
+        count = self.db.run_sync(lambda conn: conn.execute("SELECT COUNT(*) FROM scheduled_jobs").fetchone()[0])
+        self.logger.info(f"Job store '{alias}' opened at {self.db.path} with {count} job(s)")
+
+    def lookup_job(self, job_id: str) -> Optional[Job]:
+        row = self.db.run_sync(lambda conn: conn.execute("SELECT job_state FROM scheduled_jobs WHERE id = ?", (job_id,)).fetchone())
+        return self._reconstitute_job(row["job_state"]) if row else None
+
+    def get_due_jobs(self, now) -> List[Job]:
+        return self._get_jobs("WHERE next_run_time <= ?", (datetime_to_utc_timestamp(now),))
+
+    def get_next_run_time(self):
+        row = self.db.run_sync(
+            lambda conn: conn.execute(
+                "SELECT next_run_time FROM scheduled_jobs WHERE next_run_time IS NOT NULL ORDER BY next_run_time LIMIT 1"
+            ).fetchone()
+        )
+        return utc_timestamp_to_datetime(row["next_run_time"]) if row else None
+
+    def get_all_jobs(self) -> List[Job]:
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job: Job) -> None:
+        state = pickle.dumps(job.__getstate__(), self.pickle_protocol)
+
+        def _add(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "INSERT INTO scheduled_jobs (id, next_run_time, job_state) VALUES (?, ?, ?)",
+                (job.id, datetime_to_utc_timestamp(job.next_run_time), state),
+            )
+        try:
+            self.db.run_sync(_add)
+        except sqlite3.IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job: Job) -> None:
+        state = pickle.dumps(job.__getstate__(), self.pickle_protocol)
+        updated = self.db.run_sync(
+            lambda conn: conn.execute(
+                "UPDATE scheduled_jobs SET next_run_time = ?, job_state = ? WHERE id = ?",
+                (datetime_to_utc_timestamp(job.next_run_time), state, job.id),
+            ).rowcount
+        )
+        if updated == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id: str) -> None:
+        deleted = self.db.run_sync(lambda conn: conn.execute("DELETE FROM scheduled_jobs WHERE id = ?", (job_id,)).rowcount)
+        if deleted == 0:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self) -> None:
+        self.db.run_sync(lambda conn: conn.execute("DELETE FROM scheduled_jobs"))
+
+    def shutdown(self) -> None:
+        self.db.close()
+
+    def _reconstitute_job(self, job_state: bytes) -> Job:
+        state = pickle.loads(job_state)
+        state["jobstore"] = self
+        job = Job.__new__(Job)
+        job.__setstate__(state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, where: str = "", params: tuple = ()) -> List[Job]:
+        rows = self.db.run_sync(
+            lambda conn: conn.execute(f"SELECT id, job_state FROM scheduled_jobs {where} ORDER BY next_run_time", params).fetchall()
+        )
+        jobs: List[Job] = []
+        failed: List[str] = []
+        for row in rows:
+            try:
+                jobs.append(self._reconstitute_job(row["job_state"]))
+            except BaseException as e:
+                self.logger.error(f"Unable to restore job '{row['id']}', removing it: {e}")
+                failed.append(row["id"])
+        if failed:
+            self.db.run_sync(lambda conn: conn.executemany("DELETE FROM scheduled_jobs WHERE id = ?", [(jid,) for jid in failed]))
+        return jobs
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} (path={self.db.path})>"
@@ -2,6 +2,7 @@ from typing import Optional, Dict, Any, List
 from ..base import TaskAdapter
 from ..adapters.registry import resolve_adapter_from_provider
 from ..logger import create_logger
+from ..utils.waits import wait_any, wait_network_idle, StepTimer
 
 class JuejinSigninAdapter(TaskAdapter):
     @property
@@ -24,39 +25,51 @@ class JuejinSigninAdapter(TaskAdapter):
             logger.error(f"Unknown provider: {provider}")
             return {"status": "error", "message": "unknown_provider", "provider": provider}
 
-        import asyncio
-        ctx, page = await adapter.open_context_and_page(accounts[0] if accounts else None, cookie_str=cookies)
-        logger.info("Navigating to Juejin signin page")
-        await page.goto("https://juejin.cn/user/center/signin?from=main_page", wait_until="domcontentloaded", timeout=40000)
-        await asyncio.sleep(3)
-
-        ant = page.get_by_text("连续签到天数")
-        if await ant.count() == 0:
-            logger.warning("Login required for Juejin signin")
-            return {"status": "error", "message": "需要登陆"}
-
-        await page.wait_for_selector("text=每日签到", state="visible")
-        signin = page.locator("button[class*='signin']", has_text="立即签到")
-        if await signin.count() > 0:
-            await signin.click()
-            await page.get_by_text("签到成功").wait_for(state="visible")
-            logger.info('Juejin签到成功')
-        else:
-            logger.info('Juejin已签到')
-
-        logger.info("Navigating to Juejin lottery page")
-        await page.goto("https://juejin.cn/user/center/lottery?from=sign_in_success", wait_until="domcontentloaded", timeout=40000)
-        await asyncio.sleep(3)
-        await page.wait_for_selector("div[class*='text-free']", state="visible")
-        lottery = page.locator("div[class*='text-free']")
-        if await lottery.count() > 0:
-            await lottery.first.click()
-            logger.info('Juejin抽奖成功')
-        else:
-            logger.info('Juejin已抽奖')
-        await asyncio.sleep(5)
-
-        await ctx.close()
-        logger.info("Juejin signin task completed")
+        return await self.run_for_accounts(
+            accounts,
+            lambda account: self._signin(adapter, p, account, self.account_cookies(cookies, account, accounts or []), logger),
+        )
+
+    async def _signin(self, adapter, p: str, account: Optional[str], cookies: Optional[Any], logger) -> Dict[str, Any]:
+        logger.info(f"Running Juejin signin for account: {account}")
+        timer = StepTimer(logger, "juejin_signin", p)
+        ctx, page = await adapter.open_context_and_page(account, cookie_str=cookies)
+        try:
+            logger.info("Navigating to Juejin signin page")
+            with timer.step("goto_signin"):
+                await page.goto("https://juejin.cn/user/center/signin?from=main_page", wait_until="domcontentloaded", timeout=40000)
+            with timer.step("signin_ready"):
+                await wait_any(page, ["text=连续签到天数", "text=点击登录"])
+
+            ant = page.get_by_text("连续签到天数")
+            if await ant.count() == 0:
+                logger.warning("Login required for Juejin signin")
+                return {"status": "error", "message": "需要登陆"}
+
+            await page.wait_for_selector("text=每日签到", state="visible")
+            signin = page.locator("button[class*='signin']", has_text="立即签到")
+            if await signin.count() > 0:
+                await signin.click()
+                await page.get_by_text("签到成功").wait_for(state="visible")
+                logger.info('Juejin签到成功')
+            else:
+                logger.info('Juejin已签到')
+
+            logger.info("Navigating to Juejin lottery page")
+            with timer.step("goto_lottery"):
+                await page.goto("https://juejin.cn/user/center/lottery?from=sign_in_success", wait_until="domcontentloaded", timeout=40000)
+                await page.wait_for_selector("div[class*='text-free']", state="visible")
+            lottery = page.locator("div[class*='text-free']")
+            if await lottery.count() > 0:
+                await lottery.first.click()
+                logger.info('Juejin抽奖成功')
+            else:
+                logger.info('Juejin已抽奖')
+            with timer.step("lottery_settle"):
+                await wait_network_idle(page)
+        finally:
+            timer.log()
+            await adapter.release_context_and_page(page, account)
+        logger.info(f"Juejin signin completed for account: {account}")
 
         return {"status": "success"}
\ No newline at end of file
@@ -2,6 +2,7 @@ from typing import Optional, Dict, Any, List
 from ..base import TaskAdapter
 from ..adapters.registry import resolve_adapter_from_provider
 from ..logger import create_logger
+from ..utils.waits import wait_any, StepTimer
 
 class PtfansSigninAdapter(TaskAdapter):
     @property
@@ -24,21 +25,31 @@ class PtfansSigninAdapter(TaskAdapter):
             logger.error(f"Unknown provider: {provider}")
             return {"status": "error", "message": "unknown_provider", "provider": provider}
 
-        import asyncio
-        ctx, page = await adapter.open_context_and_page(accounts[0] if accounts else None, cookie_str=cookies)
-        logger.info("Navigating to Ptfans attendance page")
-        await page.goto("https://ptfans.cc/attendance.php", wait_until="domcontentloaded", timeout=40000)
-        await asyncio.sleep(3)
-
-        ant = page.get_by_text("该页面必须在登录后才能访问", exact=False)
-        if await ant.count() > 0:
-            logger.warning("Login required for Ptfans signin")
-            return {"status": "error", "message": "需要登陆"}
-
-        logger.info('Ptfans已签到')
-
-        await asyncio.sleep(3)
-        await ctx.close()
-        logger.info("Ptfans signin task completed")
+        return await self.run_for_accounts(
+            accounts,
+            lambda account: self._signin(adapter, p, account, self.account_cookies(cookies, account, accounts or []), logger),
+        )
+
+    async def _signin(self, adapter, p: str, account: Optional[str], cookies: Optional[Any], logger) -> Dict[str, Any]:
+        logger.info(f"Running Ptfans signin for account: {account}")
+        timer = StepTimer(logger, "ptfans_signin", p)
+        ctx, page = await adapter.open_context_and_page(account, cookie_str=cookies)
+        try:
+            logger.info("Navigating to Ptfans attendance page")
+            with timer.step("goto_attendance"):
+                await page.goto("https://ptfans.cc/attendance.php", wait_until="domcontentloaded", timeout=40000)
+            with timer.step("attendance_ready"):
+                await wait_any(page, ["text=该页面必须在登录后才能访问", "text=欢迎回来"])
+
+            ant = page.get_by_text("该页面必须在登录后才能访问", exact=False)
+            if await ant.count() > 0:
+                logger.warning("Login required for Ptfans signin")
+                return {"status": "error", "message": "需要登陆"}
+
+            logger.info('Ptfans已签到')
+        finally:
+            timer.log()
+            await adapter.release_context_and_page(page, account)
+        logger.info(f"Ptfans signin completed for account: {account}")
 
         return {"status": "success"}
\ No newline at end of file
@@ -2,19 +2,51 @@ from datetime import datetime, timedelta
 import random
 import os
 import json
-from typing import Optional, Dict, Any, List, Union
+import time
+import asyncio
+import hashlib
+from typing import Optional, Dict, Any, List, Union, Tuple
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
 from zoneinfo import ZoneInfo
 from .registry import resolve_task_adapter
-from ..config import STORAGE_DIR
+from .jobstore import SqliteJobStore
+from .history import task_history
+from .admission import task_admission
+from ..config import STORAGE_DIR, TASKS_DB_PATH, TASK_MISFIRE_GRACE_TIME
 from ..logger import create_logger
+from ..metrics import TASK_RUNS_TOTAL, TASK_RUN_SECONDS, TASK_ADMISSION_WAIT_SECONDS
+
+# Config-driven jobs live in the in-memory "default" store and are rebuilt from
+# tasks.json on every start; jobs created through the API go to this store.
+PERSISTENT_JOBSTORE = "persistent"
+
+_CRON_KEYS = ("second", "minute", "hour", "day", "month", "day_of_week")
+
+def _fingerprint(spec: Dict[str, Any]) -> str:
+    body = {k: v for k, v in spec.items() if k != "job_id"}
+    return hashlib.sha256(json.dumps(body, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
 
 class TaskScheduler:
     def __init__(self) -> None:
         tzname = os.getenv("TZ", "Asia/Shanghai")
-        self._scheduler = AsyncIOScheduler(timezone=ZoneInfo(tzname))
+        self._scheduler = AsyncIOScheduler(
+            timezone=ZoneInfo(tzname),
+            jobstores={"default": MemoryJobStore(), PERSISTENT_JOBSTORE: SqliteJobStore(TASKS_DB_PATH)},
+        )
         self._started = False
         self._loaded_jobs: List[str] = []
+        # Job specs loaded from tasks.json by job ID, and the digest of the file they came from
+        self._specs: Dict[str, Dict[str, Any]] = {}
+        self._config_digest: Optional[str] = None
+        # Task arguments by job ID, so that a run APScheduler drops can be attributed
+        # even when the job has already left its store (a missed date job)
+        self._job_args: Dict[str, List[Any]] = {}
+        self._pending: set = set()
+        self._scheduler.add_listener(self._on_job_event, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
         self.logger = create_logger("scheduler")
 
     def start(self) -> None:
@@ -22,7 +54,10 @@ class TaskScheduler:
             self.logger.info("Starting task scheduler")
             self._scheduler.start()
             self._started = True
-            self.logger.info("Task scheduler started successfully")
+            restored = self._scheduler.get_jobs(jobstore=PERSISTENT_JOBSTORE)
+            for job in restored:
+                self._job_args[job.id] = list(job.args)
+            self.logger.info(f"Task scheduler started successfully, {len(restored)} persisted job(s) restored")
         else:
             self.logger.info("Task scheduler already started")
 
@@ -33,42 +68,123 @@ class TaskScheduler:
         try:
             for jid in list(self._loaded_jobs):
                 try:
-                    self._scheduler.remove_job(jid)
+                    self._scheduler.remove_job(jid, jobstore="default")
+                    self._job_args.pop(jid, None)
                     self.logger.info(f"Removed job: {jid}")
                 except Exception as e:
                     self.logger.error(f"Failed to remove job {jid}: {e}")
         finally:
             self._loaded_jobs.clear()
+            self._specs.clear()
+            self._config_digest = None
             self.logger.info("All loaded jobs cleared")
 
-    async def _run_task(self, adapter_name: str, provider: Optional[str] = None, accounts: Optional[List[str]] = None, cookies: Optional[Any] = None) -> Dict[str, Any]:
+    async def _run_task(self, adapter_name: str, provider: Optional[str] = None, accounts: Optional[List[str]] = None, cookies: Optional[Any] = None, trigger: str = "scheduled") -> Dict[str, Any]:
         self.logger.info(f"Running task: {adapter_name}, provider: {provider}, accounts: {len(accounts) if accounts else 0}")
         adapter = resolve_task_adapter(adapter_name)
         if adapter is None:
             self.logger.error(f"Adapter not found: {adapter_name}")
             return {"status": "error", "message": "adapter_not_found", "adapter": adapter_name}
+        triggered_at = time.time()
+        # Manual runs skip the launch stagger but still need a free run slot
+        waited = await task_admission.acquire(adapter_name, stagger=trigger == "scheduled")
+        if waited is None:
+            return await self._drop(adapter_name, provider, trigger, "admission_timeout", triggered_at)
+        TASK_ADMISSION_WAIT_SECONDS.observe(waited, task=adapter_name)
+        started_at = time.time()
+        start = time.perf_counter()
         try:
             result = await adapter.run(provider, accounts, cookies)
             self.logger.info(f"Task completed: {adapter_name}, result: {result.get('status', 'unknown')}")
-            return result
         except Exception as e:
             self.logger.error(f"Task failed: {adapter_name}, error: {e}")
-            return {"status": "error", "message": str(e), "adapter": adapter_name}
+            result = {"status": "error", "message": str(e), "adapter": adapter_name}
+        finally:
+            task_admission.release()
+        elapsed = time.perf_counter() - start
+        TASK_RUNS_TOTAL.inc(task=adapter_name, status=result.get("status", "unknown"))
+        TASK_RUN_SECONDS.observe(elapsed, task=adapter_name)
+        self.logger.info(f"Task {adapter_name} took {elapsed:.2f}s")
+        await self._record(adapter_name, provider, trigger, result, started_at, started_at + elapsed, waited * 1000)
+        return result
+
+    async def _record(self, adapter_name: str, provider: Optional[str], trigger: str, result: Dict[str, Any], started_at: float, finished_at: float, delay_ms: float) -> None:
+        try:
+            await task_history.record(adapter_name, provider, trigger, result, started_at, finished_at, delay_ms)
+        except Exception as e:
+            self.logger.warning(f"Failed to record task run history for {adapter_name}: {e}")
 
-    async def run_now(self, adapter_name: str, provider: Optional[str] = None, accounts: Optional[List[str]] = None, cookies: Optional[Any] = None) -> Dict[str, Any]:
+    async def _drop(self, adapter_name: str, provider: Optional[str], trigger: str, reason: str, due_at: float) -> Dict[str, Any]:
+        """Records a run that never started; `due_at` is when it should have."""
+        now = time.time()
+        result = {"status": "dropped", "message": reason, "adapter": adapter_name}
+        TASK_RUNS_TOTAL.inc(task=adapter_name, status="dropped")
+        await self._record(adapter_name, provider, trigger, result, now, now, max(0.0, now - due_at) * 1000)
+        return result
+
+    def _on_job_event(self, event) -> None:
+        args = self._job_args.get(event.job_id)
+        if event.code != EVENT_JOB_MAX_INSTANCES and self._scheduler.get_job(event.job_id) is None:
+            self._job_args.pop(event.job_id, None)
+        if event.code in (EVENT_JOB_EXECUTED, EVENT_JOB_ERROR):
+            return
+        if not args:
+            self.logger.warning(f"Run of job {event.job_id} was dropped but its task is unknown")
+            return
+        if event.code == EVENT_JOB_MAX_INSTANCES:
+            # The previous run of this job is still staggered, queued or running
+            reason, due_times = "previous_run_active", event.scheduled_run_times
+        else:
+            reason, due_times = "missed", [event.scheduled_run_time]
+        for due in due_times:
+            self.logger.warning(f"Dropped run of job {event.job_id} due at {due}: {reason}")
+            task = asyncio.get_running_loop().create_task(self._drop(args[0], args[1] if len(args) > 1 else None, "scheduled", reason, due.timestamp()))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    def run_now(self, adapter_name: str, provider: Optional[str] = None, accounts: Optional[List[str]] = None, cookies: Optional[Any] = None) -> Dict[str, Any]:
+        """
+        Starts a manual run in the background and returns at once. The run waits
+        for a free run slot on its own; its outcome lands in the run history, in
+        rows started no earlier than the returned `triggered_at`.
+        """
         self.logger.info(f"Running task immediately: {adapter_name}")
-        return await self._run_task(adapter_name, provider, accounts, cookies)
+        triggered_at = time.time()
+        task = asyncio.get_running_loop().create_task(self._run_task(adapter_name, provider, accounts, cookies, trigger="manual"))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return {"status": "accepted", "message": "queued", "adapter": adapter_name, "triggered_at": triggered_at}
 
-    def schedule_at(self, adapter_name: str, run_at: datetime, job_id: Optional[str] = None, provider: Optional[str] = None, accounts: Optional[List[str]] = None, cookies: Optional[Any] = None) -> Dict[str, Any]:
+    def _add_date_job(self, job_id: str, run_at: datetime, args: List[Any], persistent: bool):
+        if persistent:
+            # Survives restarts; a run missed while the service was down still fires within
+            # TASK_MISFIRE_GRACE_TIME seconds, and several missed runs collapse into one
+            job = self._scheduler.add_job(
+                run_scheduled_task,
+                "date",
+                run_date=run_at,
+                args=args,
+                id=job_id,
+                jobstore=PERSISTENT_JOBSTORE,
+                misfire_grace_time=TASK_MISFIRE_GRACE_TIME,
+                coalesce=True,
+                replace_existing=True,
+            )
+        else:
+            job = self._scheduler.add_job(self._run_task, "date", run_date=run_at, args=args, id=job_id)
+            self._loaded_jobs.append(job_id)
+        self._job_args[job_id] = args
+        return job
+
+    def schedule_at(self, adapter_name: str, run_at: datetime, job_id: Optional[str] = None, provider: Optional[str] = None, accounts: Optional[List[str]] = None, cookies: Optional[Any] = None, persistent: bool = False) -> Dict[str, Any]:
         if not self._started:
             self.start()
         job_id = job_id or f"task:{adapter_name}:{run_at.timestamp()}"
         self.logger.info(f"Scheduling task '{adapter_name}' at {run_at} with job_id: {job_id}")
-        job = self._scheduler.add_job(self._run_task, "date", run_date=run_at, args=[adapter_name, provider, accounts, cookies], id=job_id)
-        self._loaded_jobs.append(job_id)
+        job = self._add_date_job(job_id, run_at, [adapter_name, provider, accounts, cookies], persistent)
         return {"job_id": job_id, "adapter": adapter_name, "scheduled_at": run_at.isoformat(), "status": "scheduled"}
 
-    def schedule_between(self, adapter_name: str, start_at: datetime, end_at: datetime, job_id: Optional[str] = None, provider: Optional[str] = None, accounts: Optional[List[str]] = None, cookies: Optional[Any] = None) -> Dict[str, Any]:
+    def schedule_between(self, adapter_name: str, start_at: datetime, end_at: datetime, job_id: Optional[str] = None, provider: Optional[str] = None, accounts: Optional[List[str]] = None, cookies: Optional[Any] = None, persistent: bool = False) -> Dict[str, Any]:
         if not self._started:
             self.start()
         if end_at <= start_at:
@@ -79,11 +195,10 @@ class TaskScheduler:
         run_at = start_at + timedelta(seconds=offset)
         job_id = job_id or f"task:{adapter_name}:{run_at.timestamp()}"
         self.logger.info(f"Scheduling task '{adapter_name}' between {start_at} and {end_at}, will run at {run_at} with job_id: {job_id}")
-        job = self._scheduler.add_job(self._run_task, "date", run_date=run_at, args=[adapter_name, provider, accounts, cookies], id=job_id)
-        self._loaded_jobs.append(job_id)
+        job = self._add_date_job(job_id, run_at, [adapter_name, provider, accounts, cookies], persistent)
         return {"job_id": job.id, "adapter": adapter_name, "scheduled_at": run_at.isoformat(), "status": "scheduled"}
 
-    def schedule_window(self, adapter_name: str, base_at: datetime, window_minutes: int, job_id: Optional[str] = None, provider: Optional[str] = None, accounts: Optional[List[str]] = None, cookies: Optional[Any] = None) -> Dict[str, Any]:
+    def schedule_window(self, adapter_name: str, base_at: datetime, window_minutes: int, job_id: Optional[str] = None, provider: Optional[str] = None, accounts: Optional[List[str]] = None, cookies: Optional[Any] = None, persistent: bool = False) -> Dict[str, Any]:
         if not self._started:
             self.start()
         if window_minutes < 0:
@@ -93,8 +208,7 @@ class TaskScheduler:
         run_at = base_at + timedelta(minutes=offset_min)
         job_id = job_id or f"task:{adapter_name}:{run_at.timestamp()}"
         self.logger.info(f"Scheduling task '{adapter_name}' with window {window_minutes} min around {base_at}, will run at {run_at} with job_id: {job_id}")
-        job = self._scheduler.add_job(self._run_task, "date", run_date=run_at, args=[adapter_name, provider, accounts, cookies], id=job_id)
-        self._loaded_jobs.append(job_id)
+        job = self._add_date_job(job_id, run_at, [adapter_name, provider, accounts, cookies], persistent)
         return {"job_id": job.id, "adapter": adapter_name, "scheduled_at": run_at.isoformat(), "status": "scheduled"}
 
     def schedule_cron(self, adapter_name: str, cron_fields: Dict[str, Any], job_id: Optional[str] = None, provider: Optional[str] = None, accounts: Optional[List[str]] = None, cookies: Optional[Any] = None) -> Dict[str, Any]:
@@ -104,13 +218,10 @@ class TaskScheduler:
         self.logger.info(f"Scheduling task '{adapter_name}' with cron {cron_fields} and job_id: {job_id}")
         job = self._scheduler.add_job(self._run_task, "cron", id=job_id, args=[adapter_name, provider, accounts, cookies], **cron_fields)
         self._loaded_jobs.append(job_id)
+        self._job_args[job_id] = [adapter_name, provider, accounts, cookies]
         return {"job_id": job.id, "adapter": adapter_name, "scheduled_at": "cron", "status": "scheduled"}
 
-    def load_from_config(self, config_file_path: Optional[str] = None) -> Dict[str, Any]:
-        if not self._started:
-            self.start()
-        self.logger.info(f"Loading tasks from config, config_file_path: {config_file_path}")
-        result: Dict[str, Any] = {"status": "ok", "loaded": []}
+    def _config_path(self, config_file_path: Optional[str] = None) -> Tuple[Optional[str], List[str]]:
         path_candidates: List[str] = []
         if config_file_path:
             path_candidates.append(config_file_path)
@@ -118,122 +229,253 @@ class TaskScheduler:
         path_candidates.append(os.path.join(os.path.dirname(__file__), "..", "config", "tasks.json"))
         # optional storage override
         path_candidates.append(os.path.join(STORAGE_DIR, "config", "tasks.json"))
-        cfg_path = next((p for p in path_candidates if os.path.exists(p)), None)
+        return next((p for p in path_candidates if os.path.exists(p)), None), path_candidates
+
+    def _parse_task(self, item: Any) -> Dict[str, Any]:
+        """
+        Validates one tasks.json entry and normalizes it into a job spec.
+
+        Raises:
+            ValueError: When the entry cannot be scheduled
+        """
+        if not isinstance(item, dict):
+            raise ValueError(f"task entry must be an object, got {type(item).__name__}")
+        name = (item.get("name") or item.get("id") or '').strip() or None
+        entry = (item.get("entry") or item.get("adapter") or '').strip()
+        provider = (item.get("provider") or item.get("provider_name") or '').strip() or None
+        accounts = item.get("accounts") if isinstance(item.get("accounts"), list) else None
+        # Support both string and object formats for cookies
+        cookies = item.get("cookies") or None
+        sched_raw = item.get("schedule")
+        # Handle both string (crontab) and dict (object) formats for schedule
+        if isinstance(sched_raw, str):
+            sched = {"crontab": sched_raw}
+        elif isinstance(sched_raw, dict):
+            sched = sched_raw
+        else:
+            sched = {}
+        if not entry:
+            raise ValueError("task entry is empty")
+        stype = (sched.get("type") or sched.get("kind") or "cron").lower()
+        if stype == "date":
+            run_at_str = sched.get("run_at") or sched.get("at")
+            if not run_at_str:
+                raise ValueError(f"missing run_at for date task: {entry}")
+            schedule = {"run_at": datetime.fromisoformat(run_at_str).isoformat()}
+        elif stype == "cron":
+            fields: Dict[str, Any] = {}
+            crontab = sched.get("crontab")
+            if crontab and isinstance(crontab, str):
+                parts = crontab.split()
+                if len(parts) != 5:
+                    raise ValueError(f"invalid crontab format for task {entry}, expected 5 parts, got {len(parts)}")
+                fields = dict(zip(("minute", "hour", "day", "month", "day_of_week"), parts))
+            else:
+                cron_obj = sched.get("fields") or {}
+                for key in _CRON_KEYS:
+                    if key in sched:
+                        fields[key] = sched[key]
+                    if key in cron_obj:
+                        fields[key] = cron_obj[key]
+            if not fields:
+                raise ValueError(f"no valid cron fields found for task: {entry}")
+            # Let APScheduler reject out-of-range or malformed fields before anything is applied
+            CronTrigger(timezone=self._scheduler.timezone, **fields)
+            schedule = {"fields": fields}
+        elif stype == "window":
+            base_str = sched.get("base_at") or sched.get("at")
+            minutes = int(sched.get("window_minutes") or sched.get("window") or 0)
+            if not base_str:
+                raise ValueError(f"missing base_at for window task: {entry}")
+            if minutes < 0:
+                raise ValueError(f"window_minutes must be non-negative for task: {entry}")
+            schedule = {"base_at": datetime.fromisoformat(base_str).isoformat(), "window_minutes": minutes}
+        elif stype == "between":
+            start_str = sched.get("start_at") or sched.get("start")
+            end_str = sched.get("end_at") or sched.get("end")
+            if not start_str or not end_str:
+                raise ValueError(f"missing start_at or end_at for between task: {entry}")
+            start_at = datetime.fromisoformat(start_str)
+            end_at = datetime.fromisoformat(end_str)
+            if end_at <= start_at:
+                raise ValueError(f"end_at must be after start_at for task: {entry}")
+            schedule = {"start_at": start_at.isoformat(), "end_at": end_at.isoformat()}
+        else:
+            raise ValueError(f"unknown schedule type '{stype}' for task: {entry}")
+        spec = {"entry": entry, "type": stype, "schedule": schedule, "provider": provider, "accounts": accounts, "cookies": cookies}
+        # Unnamed tasks get an ID derived from their content so it stays stable across reloads
+        spec["job_id"] = name or f"task:{entry}:{_fingerprint(spec)[:8]}"
+        return spec
+
+    def _parse_tasks(self, data: Any) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        tasks = data if isinstance(data, list) else (data.get("tasks", []) if isinstance(data, dict) else None)
+        if not isinstance(tasks, list):
+            return {}, ["config must be a list of tasks or an object with a 'tasks' list"]
+        specs: Dict[str, Dict[str, Any]] = {}
+        errors: List[str] = []
+        for idx, item in enumerate(tasks):
+            try:
+                spec = self._parse_task(item)
+            except (ValueError, TypeError) as e:
+                errors.append(f"tasks[{idx}]: {e}")
+                continue
+            if spec["job_id"] in specs:
+                errors.append(f"tasks[{idx}]: duplicate job id '{spec['job_id']}'")
+                continue
+            specs[spec["job_id"]] = spec
+        return specs, errors
+
+    def _expired(self, spec: Dict[str, Any]) -> bool:
+        """True for a date task whose run time has already passed; scheduling it would only record a missed run."""
+        if spec["type"] != "date":
+            return False
+        run_at = datetime.fromisoformat(spec["schedule"]["run_at"])
+        if run_at.tzinfo is None:
+            run_at = run_at.replace(tzinfo=self._scheduler.timezone)
+        return run_at <= datetime.now(self._scheduler.timezone)
+
+    def _schedule_spec(self, spec: Dict[str, Any]) -> None:
+        entry, schedule, job_id = spec["entry"], spec["schedule"], spec["job_id"]
+        kwargs = {"job_id": job_id, "provider": spec["provider"], "accounts": spec["accounts"], "cookies": spec["cookies"]}
+        if spec["type"] == "date":
+            self.schedule_at(entry, datetime.fromisoformat(schedule["run_at"]), **kwargs)
+        elif spec["type"] == "cron":
+            self.schedule_cron(entry, dict(schedule["fields"]), **kwargs)
+        elif spec["type"] == "window":
+            self.schedule_window(entry, datetime.fromisoformat(schedule["base_at"]), schedule["window_minutes"], **kwargs)
+        else:
+            self.schedule_between(entry, datetime.fromisoformat(schedule["start_at"]), datetime.fromisoformat(schedule["end_at"]), **kwargs)
+
+    def _unschedule(self, job_id: str) -> None:
+        try:
+            self._scheduler.remove_job(job_id, jobstore="default")
+            self.logger.info(f"Removed job: {job_id}")
+        except JobLookupError:
+            self.logger.info(f"Job already finished: {job_id}")
+        if job_id in self._loaded_jobs:
+            self._loaded_jobs.remove(job_id)
+        self._job_args.pop(job_id, None)
+
+    def _read_config(self, cfg_path: str) -> Tuple[Any, str]:
+        with open(cfg_path, "rb") as f:
+            raw = f.read()
+        return json.loads(raw.decode("utf-8")), hashlib.sha256(raw).hexdigest()
+
+    def load_from_config(self, config_file_path: Optional[str] = None) -> Dict[str, Any]:
+        if not self._started:
+            self.start()
+        self.logger.info(f"Loading tasks from config, config_file_path: {config_file_path}")
+        result: Dict[str, Any] = {"status": "ok", "loaded": [], "skipped": []}
+        cfg_path, path_candidates = self._config_path(config_file_path)
         if not cfg_path:
             self.logger.warning(f"No tasks.json found, searched: {path_candidates}")
             return {"status": "not_found", "message": "no tasks.json found", "searched": path_candidates}
         try:
-            with open(cfg_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data, digest = self._read_config(cfg_path)
         except Exception as e:
             self.logger.error(f"Failed to load config from {cfg_path}: {e}")
             return {"status": "error", "message": f"load_failed: {e}"}
-        
+
         self.logger.info(f"Loading tasks from config file: {cfg_path}")
-        tasks = data if isinstance(data, list) else data.get("tasks", [])
-        self.logger.info(f"Found {len(tasks)} task(s) in config")
-        
-        for item in tasks:
-            name = (item.get("name") or item.get("id") or '').strip() or None
-            entry = (item.get("entry") or item.get("adapter") or '').strip()
-            provider = (item.get("provider") or item.get("provider_name") or '').strip() or None
-            accounts = item.get("accounts") if isinstance(item.get("accounts"), list) else None
-            # Support both string and object formats for cookies
-            cookies = item.get("cookies") or None
-            sched_raw = item.get("schedule")
-            # Handle both string (crontab) and dict (object) formats for schedule
-            if isinstance(sched_raw, str):
-                # If schedule is a string, treat it as a crontab
-                sched = {"crontab": sched_raw}
-            elif isinstance(sched_raw, dict):
-                # If schedule is a dict, use it as-is
-                sched = sched_raw
-            else:
-                # Default to empty dict if schedule is None or other type
-                sched = {}
-            if not entry:
-                self.logger.warning("Task entry is empty, skipping")
+        specs, errors = self._parse_tasks(data)
+        for error in errors:
+            self.logger.warning(f"Skipping invalid task, {error}")
+        self.logger.info(f"Found {len(specs)} valid task(s) in config")
+        for job_id, spec in specs.items():
+            if self._expired(spec):
+                # Kept in the loaded specs so an unchanged entry stays quiet on reload
+                self.logger.info(f"Skipping date task {job_id}, its run time {spec['schedule']['run_at']} has passed")
+                self._specs[job_id] = spec
+                result["skipped"].append(job_id)
                 continue
-            job_id = name or f"task:{entry}:{len(self._loaded_jobs)+1}"
-            stype = (sched.get("type") or sched.get("kind") or "cron").lower()
             try:
-                if stype == "date":
-                    run_at_str = sched.get("run_at") or sched.get("at")
-                    if not run_at_str:
-                        self.logger.warning(f"Missing run_at for date task: {entry}")
-                        continue
-                    run_at = datetime.fromisoformat(run_at_str)
-                    self.logger.info(f"Scheduling date task '{entry}' at {run_at}")
-                    self.schedule_at(entry, run_at, job_id=job_id, provider=provider, accounts=accounts, cookies=cookies)
-                elif stype == "cron":
-                    fields: Dict[str, Any] = {}
-                    crontab = sched.get("crontab")
-                    if crontab and isinstance(crontab, str):
-                        parts = crontab.split()
-                        if len(parts) == 5:
-                            fields = {
-                                "minute": parts[0],
-                                "hour": parts[1],
-                                "day": parts[2],
-                                "month": parts[3],
-                                "day_of_week": parts[4],
-                            }
-                        else:
-                            self.logger.warning(f"Invalid crontab format for task {entry}, expected 5 parts, got {len(parts)}")
-                            continue
-                    else:
-                        for key in ("second", "minute", "hour", "day", "month", "day_of_week"):
-                            if key in sched:
-                                fields[key] = sched[key]
-                        cron_obj = sched.get("fields") or {}
-                        for key in ("second", "minute", "hour", "day", "month", "day_of_week"):
-                            if key in cron_obj:
-                                fields[key] = cron_obj[key]
-                    if not fields:
-                        self.logger.warning(f"No valid cron fields found for task: {entry}")
-                        continue
-                    self.logger.info(f"Scheduling cron task '{entry}' with fields: {fields}")
-                    self.schedule_cron(entry, fields, job_id=job_id, provider=provider, accounts=accounts, cookies=cookies)
-                elif stype == "window":
-                    base_str = sched.get("base_at") or sched.get("at")
-                    minutes = int(sched.get("window_minutes") or sched.get("window") or 0)
-                    if not base_str:
-                        self.logger.warning(f"Missing base_at for window task: {entry}")
-                        continue
-                    base_at = datetime.fromisoformat(base_str)
-                    self.logger.info(f"Scheduling window task '{entry}' at {base_at} with window {minutes} minutes")
-                    self.schedule_window(entry, base_at, minutes, job_id=job_id, provider=provider, accounts=accounts, cookies=cookies)
-                elif stype == "between":
-                    start_str = sched.get("start_at") or sched.get("start")
-                    end_str = sched.get("end_at") or sched.get("end")
-                    if not start_at or not end_str:
-                        self.logger.warning(f"Missing start_at or end_at for between task: {entry}")
-                        continue
-                    start_at = datetime.fromisoformat(start_str)
-                    end_at = datetime.fromisoformat(end_str)
-                    self.logger.info(f"Scheduling between task '{entry}' from {start_at} to {end_at}")
-                    self.schedule_between(entry, start_at, end_at, job_id=job_id, provider=provider, accounts=accounts, cookies=cookies)
-                else:
-                    self.logger.warning(f"Unknown schedule type '{stype}' for task: {entry}")
-                    continue
-                result["loaded"].append({"job_id": job_id, "entry": entry, "type": stype, "provider": provider, "accounts": accounts, "cookies": cookies})
+                self._schedule_spec(spec)
             except Exception as e:
-                self.logger.error(f"Failed to schedule task {entry}: {e}")
+                self.logger.error(f"Failed to schedule task {spec['entry']}: {e}")
                 continue
-        self.logger.info(f"Config loaded successfully, {len(result['loaded'])} tasks scheduled")
+            self._specs[job_id] = spec
+            result["loaded"].append({"job_id": job_id, "entry": spec["entry"], "type": spec["type"], "provider": spec["provider"], "accounts": spec["accounts"], "cookies": spec["cookies"]})
+        self._config_digest = digest
+        if errors:
+            result["errors"] = errors
+        self.logger.info(f"Config loaded successfully, {len(result['loaded'])} tasks scheduled, {len(result['skipped'])} past date task(s) skipped")
         return result
 
     def reload_from_config(self, config_file_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Applies tasks.json changes incrementally: jobs are diffed against the loaded
+        specs by job ID and only added, removed or modified ones are touched, so
+        unchanged window/between jobs keep their randomized run time. A config that
+        cannot be read or fails validation leaves the current schedule as it is.
+        """
+        if not self._started:
+            self.start()
         self.logger.info(f"Reloading tasks from config: {config_file_path}")
-        self.clear_loaded_jobs()
-        # if config not found, simply return empty loaded list
+        cfg_path, path_candidates = self._config_path(config_file_path)
+        if not cfg_path:
+            self.logger.warning(f"No tasks.json found, keeping current schedule, searched: {path_candidates}")
+            return {"status": "not_found", "message": "no tasks.json found", "searched": path_candidates}
         try:
-            result = self.load_from_config(config_file_path)
-            self.logger.info(f"Config reloaded successfully, status: {result.get('status')}")
-            return result
+            data, digest = self._read_config(cfg_path)
         except Exception as e:
-            self.logger.error(f"Failed to reload config: {e}")
-            return {"status": "error", "message": "reload_failed"}
+            self.logger.error(f"Failed to read config from {cfg_path}, keeping current schedule: {e}")
+            return {"status": "error", "message": f"load_failed: {e}"}
+        if digest == self._config_digest:
+            self.logger.info("Config content unchanged, nothing to reload")
+            return {"status": "unchanged"}
+        specs, errors = self._parse_tasks(data)
+        if errors:
+            for error in errors:
+                self.logger.error(f"Invalid task config, {error}")
+            self.logger.error(f"Config rejected with {len(errors)} error(s), keeping current schedule")
+            return {"status": "invalid", "errors": errors}
+
+        result: Dict[str, Any] = {"status": "ok", "added": [], "removed": [], "updated": [], "skipped": [], "unchanged": 0}
+        for job_id in [j for j in self._specs if j not in specs]:
+            self._unschedule(job_id)
+            self._specs.pop(job_id, None)
+            result["removed"].append(job_id)
+        for job_id, spec in specs.items():
+            old = self._specs.get(job_id)
+            if old is not None and _fingerprint(old) == _fingerprint(spec):
+                result["unchanged"] += 1
+                continue
+            if self._expired(spec):
+                if old is not None:
+                    self._unschedule(job_id)
+                self.logger.info(f"Skipping date task {job_id}, its run time {spec['schedule']['run_at']} has passed")
+                self._specs[job_id] = spec
+                result["skipped"].append(job_id)
+                continue
+            try:
+                if old is not None and (old["type"], old["schedule"]) == (spec["type"], spec["schedule"]):
+                    # Same trigger: only the arguments changed, keep the next run time
+                    try:
+                        args = [spec["entry"], spec["provider"], spec["accounts"], spec["cookies"]]
+                        self._scheduler.modify_job(job_id, jobstore="default", args=args)
+                        self._job_args[job_id] = args
+                        self.logger.info(f"Updated arguments of job: {job_id}")
+                    except JobLookupError:
+                        self.logger.info(f"Job already finished, not rescheduled: {job_id}")
+                else:
+                    if old is not None:
+                        self._unschedule(job_id)
+                    self._schedule_spec(spec)
+            except Exception as e:
+                self.logger.error(f"Failed to apply task {job_id}: {e}")
+                continue
+            self._specs[job_id] = spec
+            result["updated" if old is not None else "added"].append(job_id)
+        self._config_digest = digest
+        self.logger.info(
+            f"Config reloaded: {len(result['added'])} added, {len(result['removed'])} removed, "
+            f"{len(result['updated'])} updated, {len(result['skipped'])} skipped, {result['unchanged']} unchanged"
+        )
+        return result
 
 task_scheduler = TaskScheduler()
 
+async def run_scheduled_task(adapter_name: str, provider: Optional[str] = None, accounts: Optional[List[str]] = None, cookies: Optional[Any] = None) -> Dict[str, Any]:
+    """Module-level entry point for persisted jobs, which cannot reference a bound method."""
+    return await task_scheduler._run_task(adapter_name, provider, accounts, cookies)
+
@@ -1,7 +1,11 @@
 from typing import Optional, Dict, Any, List, Union
 from ..base import TaskAdapter
 from ..adapters.registry import resolve_adapter_from_provider
+from ..adapters.v2ex_http import v2ex_http
+from ..config import V2EX_SIGNIN_ENGINE
+from ..utils.http import HttpFallback
 from ..logger import create_logger
+from ..utils.waits import wait_any, StepTimer
 
 class V2exSigninAdapter(TaskAdapter):
     @property
@@ -24,27 +28,63 @@ class V2exSigninAdapter(TaskAdapter):
             logger.error(f"Unknown provider: {provider}")
             return {"status": "error", "message": "unknown_provider", "provider": provider}
 
-        import asyncio
-        ctx, page = await adapter.open_context_and_page(accounts[0] if accounts else None, cookie_str=cookies)
-        logger.info("Navigating to V2EX daily mission page")
-        await page.goto("https://www.v2ex.com/mission/daily", wait_until="domcontentloaded", timeout=40000)
-        await asyncio.sleep(3)
-
-        ant = page.get_by_text("需要先登录", exact=False)
-        if await ant.count() > 0:
-            logger.warning("Login required for V2EX signin")
-            return {"status": "error", "message": "需要登陆"}
-
-        await page.wait_for_selector("text=领取", state="visible")
-        signin = page.locator("input[type='button']", has_text="领取")
-        if await signin.count() > 0:
-            await signin.click()
-            logger.info('V2EX签到成功')
-        else:
-            logger.info('V2EX已签到')
-
-        await asyncio.sleep(3)
-        await ctx.close()
-        logger.info("V2EX signin task completed")
+        return await self.run_for_accounts(
+            accounts,
+            lambda account: self._signin(adapter, p, account, self.account_cookies(cookies, account, accounts or []), logger),
+        )
+
+    async def _signin(self, adapter, p: str, account: Optional[str], cookies: Optional[Any], logger) -> Dict[str, Any]:
+        logger.info(f"Running V2EX signin for account: {account}")
+        if V2EX_SIGNIN_ENGINE != "browser":
+            result = await self._signin_http(adapter, p, account, cookies, logger)
+            if result is not None:
+                return result
+        return await self._signin_browser(adapter, p, account, cookies, logger)
+
+    async def _signin_http(self, adapter, p: str, account: Optional[str], cookies: Optional[Any], logger) -> Optional[Dict[str, Any]]:
+        """
+        Tries the browser-free engine; returns None when the browser flow has to take over.
+        """
+        try:
+            session = await adapter.http_cookies("v2ex.com", account, cookies)
+            with StepTimer(logger, "http_signin", p).step("redeem"):
+                status, message = await v2ex_http.redeem(session)
+        except HttpFallback as e:
+            if V2EX_SIGNIN_ENGINE == "http":
+                logger.error(f"HTTP signin failed: {e}")
+                return {"status": "error", "message": str(e)}
+            logger.info(f"HTTP engine fell back to browser: {e}")
+            return None
+        logger.info(f"HTTP signin finished for account {account}: {status} {message}")
+        return {"status": status, "message": message}
+
+    async def _signin_browser(self, adapter, p: str, account: Optional[str], cookies: Optional[Any], logger) -> Dict[str, Any]:
+        timer = StepTimer(logger, "v2ex_signin", p)
+        ctx, page = await adapter.open_context_and_page(account, cookie_str=cookies)
+        try:
+            logger.info("Navigating to V2EX daily mission page")
+            with timer.step("goto_daily"):
+                await page.goto("https://www.v2ex.com/mission/daily", wait_until="domcontentloaded", timeout=40000)
+            with timer.step("daily_ready"):
+                await wait_any(page, ["text=领取", "text=需要先登录"])
+
+            ant = page.get_by_text("需要先登录", exact=False)
+            if await ant.count() > 0:
+                logger.warning("Login required for V2EX signin")
+                return {"status": "error", "message": "需要登陆"}
+
+            await page.wait_for_selector("text=领取", state="visible")
+            signin = page.locator("input[type='button']", has_text="领取")
+            if await signin.count() > 0:
+                with timer.step("redeem"):
+                    await signin.click()
+                    await wait_any(page, ["text=已成功领取每日登录奖励", "text=每日登录奖励已领取"])
+                logger.info('V2EX签到成功')
+            else:
+                logger.info('V2EX已签到')
+        finally:
+            timer.log()
+            await adapter.release_context_and_page(page, account)
+        logger.info(f"V2EX signin completed for account: {account}")
 
         return {"status": "success"}
\ No newline at end of file
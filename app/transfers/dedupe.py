@@ -0,0 +1,65 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+from ..config import TRANSFER_DEDUPE_MAX_ENTRIES, TRANSFER_DEDUPE_INFLIGHT_TTL, TRANSFER_DEDUPE_SUCCESS_TTL, TRANSFER_DEDUPE_FAILURE_TTL
+
+IN_FLIGHT = "in_flight"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+class DedupeIndex:
+    """
+    Bounded index of recently seen shares keyed by canonical share identity.
+
+    Every entry carries a state-dependent TTL: in-flight entries last until the
+    job finishes (or TRANSFER_DEDUPE_INFLIGHT_TTL as a safety net), successes
+    block resubmission for TRANSFER_DEDUPE_SUCCESS_TTL, and failures only for a
+    short TRANSFER_DEDUPE_FAILURE_TTL cooldown so the link can be retried. The
+    least recently marked entries are dropped once the size bound is reached.
+    """
+
+    def __init__(self, max_entries: int = TRANSFER_DEDUPE_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._ttls = {
+            IN_FLIGHT: TRANSFER_DEDUPE_INFLIGHT_TTL,
+            SUCCEEDED: TRANSFER_DEDUPE_SUCCESS_TTL,
+            FAILED: TRANSFER_DEDUPE_FAILURE_TTL,
+        }
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._evictions = 0
+
+    def check(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the live entry for a share, or None when it may be submitted."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] <= time.time():
+            self._entries.pop(key, None)
+            return None
+        return entry
+
+    def mark(self, key: str, state: str, job_id: Optional[str] = None) -> None:
+        now = time.time()
+        self._entries[key] = {"state": state, "job_id": job_id, "expires_at": now + self._ttls[state]}
+        self._entries.move_to_end(key)
+        self._purge(now)
+
+    def discard(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def _purge(self, now: float) -> None:
+        # Expired entries at the head go first; then enforce the size bound
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry["expires_at"] > now:
+                break
+            self._entries.pop(key, None)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        states: Dict[str, int] = {IN_FLIGHT: 0, SUCCEEDED: 0, FAILED: 0}
+        for entry in self._entries.values():
+            states[entry["state"]] += 1
+        return {"size": len(self._entries), "max_entries": self.max_entries, "evictions": self._evictions, **states}
@@ -0,0 +1,77 @@
+import time
+import asyncio
+from typing import Optional, Dict, Any, List
+from ..adapters.registry import resolve_adapter_from_link
+from ..base import ShareAdapter
+from ..config import PREFLIGHT_TIMEOUT, PREFLIGHT_CONCURRENCY
+from ..logger import create_logger
+
+VALID = "valid"
+EXPIRED = "expired"
+NOT_FOUND = "not_found"
+PASSWORD_REQUIRED = "password_required"
+INVALID_CODE = "invalid_code"
+UNKNOWN = "unknown"
+UNSUPPORTED = "unsupported"
+
+# States that make a transfer pointless; their messages match the transfer flows
+DEAD_STATES = {
+    EXPIRED: "分享链接已失效",
+    NOT_FOUND: "分享链接不存在",
+    PASSWORD_REQUIRED: "缺少提取码",
+    INVALID_CODE: "提取码错误",
+}
+
+logger = create_logger("preflight")
+
+async def check_link(adapter: ShareAdapter, link: str) -> Dict[str, Any]:
+    """
+    Classifies a share link over plain HTTP within PREFLIGHT_TIMEOUT seconds.
+
+    Anything that cannot be decided quickly is reported as "unknown" so that the
+    regular transfer flow still gets a chance.
+    """
+    start = time.perf_counter()
+    try:
+        state = await asyncio.wait_for(adapter.preflight(link), PREFLIGHT_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"Preflight timed out for {link}")
+        state = UNKNOWN
+    except Exception as e:
+        logger.warning(f"Preflight failed for {link}: {e}")
+        state = UNKNOWN
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+    logger.info(f"Preflight {adapter.name} {state} in {elapsed_ms}ms: {link}")
+    return {
+        "provider": adapter.name,
+        "share_link": link,
+        "state": state,
+        "message": DEAD_STATES.get(state),
+        "elapsed_ms": elapsed_ms,
+    }
+
+async def check_links(links: List[str]) -> List[Dict[str, Any]]:
+    """Checks many links concurrently, at most PREFLIGHT_CONCURRENCY at a time, keeping their order."""
+    sem = asyncio.Semaphore(PREFLIGHT_CONCURRENCY)
+
+    async def _one(link: str) -> Dict[str, Any]:
+        url = (link or "").strip().strip('`"')
+        adapter = resolve_adapter_from_link(url) if url else None
+        if adapter is None:
+            return {"provider": "unknown", "share_link": url, "state": UNSUPPORTED, "message": "unsupported provider", "elapsed_ms": 0.0}
+        async with sem:
+            return await check_link(adapter, url)
+
+    return await asyncio.gather(*(_one(link) for link in links))
+
+def rejection(check: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Returns the failed TransferResult for a dead link, or None when it should be transferred."""
+    if check["state"] not in DEAD_STATES:
+        return None
+    return {
+        "status": "fail",
+        "provider": check["provider"],
+        "share_link": check["share_link"],
+        "target_path": None,
+        "message": check["message"],
+    }
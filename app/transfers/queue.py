@@ -0,0 +1,187 @@
+import json
+import time
+import sqlite3
+from typing import Optional, Dict, Any, List, Iterable
+from ..config import TRANSFER_DB_PATH, TRANSFER_VISIBILITY_TIMEOUT, TRANSFER_MAX_ATTEMPTS
+from ..utils.sqlite import SqliteStore
+from ..logger import create_logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transfer_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT,
+    provider TEXT NOT NULL,
+    account TEXT,
+    account_key TEXT NOT NULL,
+    url TEXT NOT NULL,
+    cookies TEXT,
+    batch TEXT,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    claimed_at REAL,
+    visible_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transfer_queue_visible ON transfer_queue(visible_at);
+CREATE INDEX IF NOT EXISTS idx_transfer_queue_provider ON transfer_queue(provider, state);
+"""
+
+def _placeholders(values: List[Any]) -> str:
+    return ",".join("?" for _ in values)
+
+def _row_to_item(row: sqlite3.Row) -> Dict[str, Any]:
+    item = dict(row)
+    for key in ("cookies", "batch"):
+        try:
+            item[key] = json.loads(item[key]) if item.get(key) else None
+        except ValueError:
+            item[key] = None
+    return item
+
+class TransferQueue(SqliteStore):
+    """
+    Durable transfer queue kept in SQLite under STORAGE_DIR.
+
+    Claiming an item hides it for TRANSFER_VISIBILITY_TIMEOUT seconds; an item
+    that is neither acked nor touched within that time (its worker crashed or
+    hung) becomes claimable again. Only one row is read per claim, so the queue
+    can hold many thousands of links without loading them into memory.
+
+    A batch item carries several links of one provider/account in `batch`
+    (a list of {"url", "job_id"}); it is claimed and acked as a whole so one
+    worker transfers them in a single browser session.
+    """
+
+    def __init__(self, path: str = TRANSFER_DB_PATH) -> None:
+        super().__init__(path, _SCHEMA)
+        self.logger = create_logger("transfer-queue")
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        if "job_id" not in self._columns(conn, "transfer_queue"):
+            conn.execute("ALTER TABLE transfer_queue ADD COLUMN job_id TEXT")
+        if "batch" not in self._columns(conn, "transfer_queue"):
+            conn.execute("ALTER TABLE transfer_queue ADD COLUMN batch TEXT")
+
+    async def put(self, provider: str, url: str, account: Optional[str], account_key: str, cookies: Optional[Any] = None, job_id: Optional[str] = None, batch: Optional[List[Dict[str, str]]] = None) -> int:
+        def _put(conn: sqlite3.Connection) -> int:
+            now = time.time()
+            cur = conn.execute(
+                "INSERT INTO transfer_queue (job_id, provider, account, account_key, url, cookies, batch, enqueued_at, visible_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    provider,
+                    account,
+                    account_key,
+                    url,
+                    json.dumps(cookies, ensure_ascii=False) if cookies else None,
+                    json.dumps(batch, ensure_ascii=False) if batch else None,
+                    now,
+                    now,
+                ),
+            )
+            return cur.lastrowid
+        return await self.run(_put)
+
+    async def claim(self, exclude_providers: Iterable[str] = (), exclude_accounts: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        """
+        Atomically claims the oldest visible item outside the excluded providers/accounts.
+
+        An item that already used up TRANSFER_MAX_ATTEMPTS is removed and returned
+        with `exhausted` set, so the caller can record the failure.
+        """
+        providers = list(exclude_providers)
+        accounts = list(exclude_accounts)
+
+        def _claim(conn: sqlite3.Connection) -> Optional[Dict[str, Any]]:
+            now = time.time()
+            sql = "SELECT * FROM transfer_queue WHERE visible_at <= ?"
+            params: List[Any] = [now]
+            if providers:
+                sql += f" AND provider NOT IN ({_placeholders(providers)})"
+                params.extend(providers)
+            if accounts:
+                sql += f" AND account_key NOT IN ({_placeholders(accounts)})"
+                params.extend(accounts)
+            sql += " ORDER BY id LIMIT 1"
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(sql, params).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                if row["attempts"] >= TRANSFER_MAX_ATTEMPTS:
+                    self.logger.error(f"Dropping transfer after {row['attempts']} attempts: {row['url']}")
+                    conn.execute("DELETE FROM transfer_queue WHERE id = ?", (row["id"],))
+                    conn.execute("COMMIT")
+                    item = _row_to_item(row)
+                    item["exhausted"] = True
+                    return item
+                conn.execute(
+                    "UPDATE transfer_queue SET state = 'claimed', attempts = attempts + 1, claimed_at = ?, visible_at = ? WHERE id = ?",
+                    (now, now + TRANSFER_VISIBILITY_TIMEOUT, row["id"]),
+                )
+                conn.execute("COMMIT")
+                item = _row_to_item(row)
+                item["attempts"] += 1
+                return item
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return await self.run(_claim)
+
+    async def touch(self, item_id: int) -> None:
+        """Extends the visibility timeout of an item that is still being processed."""
+        def _touch(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "UPDATE transfer_queue SET visible_at = ? WHERE id = ? AND state = 'claimed'",
+                (time.time() + TRANSFER_VISIBILITY_TIMEOUT, item_id),
+            )
+        await self.run(_touch)
+
+    async def ack(self, item_id: int) -> None:
+        def _ack(conn: sqlite3.Connection) -> None:
+            conn.execute("DELETE FROM transfer_queue WHERE id = ?", (item_id,))
+        await self.run(_ack)
+
+    async def recover(self) -> int:
+        """Makes items claimed by a previous process immediately claimable again."""
+        def _recover(conn: sqlite3.Connection) -> int:
+            cur = conn.execute(
+                "UPDATE transfer_queue SET state = 'queued', visible_at = ? WHERE state = 'claimed'",
+                (time.time(),),
+            )
+            return cur.rowcount
+        count = await self.run(_recover)
+        if count:
+            self.logger.info(f"Recovered {count} unfinished transfer(s) from previous run")
+        return count
+
+    async def pending(self, after_id: int = 0, limit: int = 500) -> List[Dict[str, Any]]:
+        """
+        Returns the provider, link and job ID of every link in the next `limit` queue
+        items after `after_id`, one row per link of a batch item, ordered by item ID.
+        Callers page through the queue with the last returned `id`; batch JSON is
+        expanded inside SQLite, so cookies and batches never leave the database.
+        """
+        def _pending(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+            rows = conn.execute(
+                """
+                WITH page AS (SELECT id, provider, url, job_id, batch FROM transfer_queue WHERE id > ? ORDER BY id LIMIT ?)
+                SELECT page.id AS id, page.provider AS provider,
+                       COALESCE(json_extract(link.value, '$.url'), page.url) AS url,
+                       COALESCE(json_extract(link.value, '$.job_id'), page.job_id) AS job_id
+                FROM page LEFT JOIN json_each(page.batch) AS link
+                ORDER BY page.id
+                """,
+                (after_id, limit),
+            ).fetchall()
+            return [dict(r) for r in rows]
+        return await self.run(_pending)
+
+    async def depth(self) -> Dict[str, Dict[str, int]]:
+        def _depth(conn: sqlite3.Connection) -> Dict[str, Dict[str, int]]:
+            result: Dict[str, Dict[str, int]] = {}
+            for row in conn.execute("SELECT provider, state, COUNT(*) AS n FROM transfer_queue GROUP BY provider, state"):
+                result.setdefault(row["provider"], {})[row["state"]] = row["n"]
+            return result
+        return await self.run(_depth)
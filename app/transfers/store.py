@@ -0,0 +1,137 @@
+import json
+import time
+import uuid
+import sqlite3
+from typing import Optional, Dict, Any, List, Tuple
+from ..config import TRANSFER_DB_PATH, TRANSFER_JOB_RETENTION_DAYS
+from ..utils.sqlite import SqliteStore
+from ..logger import create_logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transfer_jobs (
+    id TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    account TEXT,
+    share_link TEXT NOT NULL,
+    status TEXT NOT NULL,
+    message TEXT,
+    target_path TEXT,
+    result TEXT,
+    timings TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_transfer_jobs_created ON transfer_jobs(created_at);
+CREATE INDEX IF NOT EXISTS idx_transfer_jobs_provider ON transfer_jobs(provider, created_at);
+CREATE INDEX IF NOT EXISTS idx_transfer_jobs_status ON transfer_jobs(status, created_at);
+"""
+
+# Old rows are pruned once every this many inserts
+_PRUNE_EVERY = 200
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    for key in ("result", "timings"):
+        try:
+            job[key] = json.loads(job[key]) if job.get(key) else None
+        except ValueError:
+            job[key] = None
+    job["job_id"] = job.pop("id")
+    return job
+
+class TransferJobStore(SqliteStore):
+    """
+    Keeps one row per transfer job with its status, phase timings and final
+    TransferResult, indexed for lookups by provider, status and time. Finished
+    jobs older than `retention_days` are pruned as new ones are created.
+    """
+
+    def __init__(self, path: str = TRANSFER_DB_PATH, retention_days: int = TRANSFER_JOB_RETENTION_DAYS) -> None:
+        super().__init__(path, _SCHEMA)
+        self.retention_days = retention_days
+        self._inserts = 0
+        self.logger = create_logger("transfer-jobs")
+
+    async def create(self, provider: str, share_link: str, account: Optional[str] = None, status: str = "queued", job_id: Optional[str] = None) -> str:
+        job_id = job_id or uuid.uuid4().hex
+        self._inserts += 1
+        prune = self.retention_days > 0 and self._inserts % _PRUNE_EVERY == 1
+
+        def _create(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "INSERT INTO transfer_jobs (id, provider, account, share_link, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, provider, account, share_link, status, time.time()),
+            )
+            if prune:
+                # Unfinished jobs are kept whatever their age
+                deleted = conn.execute(
+                    "DELETE FROM transfer_jobs WHERE finished_at IS NOT NULL AND created_at < ?",
+                    (time.time() - self.retention_days * 86400,),
+                ).rowcount
+                if deleted:
+                    self.logger.info(f"Pruned {deleted} transfer job(s) older than {self.retention_days} day(s)")
+        await self.run(_create)
+        return job_id
+
+    async def mark_running(self, job_id: str) -> None:
+        def _mark(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "UPDATE transfer_jobs SET status = 'running', started_at = ? WHERE id = ?",
+                (time.time(), job_id),
+            )
+        await self.run(_mark)
+
+    async def finish(self, job_id: str, status: str, message: Optional[str] = None, target_path: Optional[str] = None, result: Optional[Dict[str, Any]] = None, timings: Optional[Dict[str, float]] = None) -> None:
+        def _finish(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "UPDATE transfer_jobs SET status = ?, message = ?, target_path = ?, result = ?, timings = ?, finished_at = ? WHERE id = ?",
+                (
+                    status,
+                    message,
+                    target_path,
+                    json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    json.dumps(timings) if timings else None,
+                    time.time(),
+                    job_id,
+                ),
+            )
+        await self.run(_finish)
+
+    async def unfinished(self) -> List[str]:
+        """Returns the IDs of jobs still "queued" or "running"."""
+        def _unfinished(conn: sqlite3.Connection) -> List[str]:
+            return [row["id"] for row in conn.execute("SELECT id FROM transfer_jobs WHERE status IN ('queued', 'running')")]
+        return await self.run(_unfinished)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        def _get(conn: sqlite3.Connection) -> Optional[Dict[str, Any]]:
+            row = conn.execute("SELECT * FROM transfer_jobs WHERE id = ?", (job_id,)).fetchone()
+            return _row_to_job(row) if row is not None else None
+        return await self.run(_get)
+
+    async def query(self, provider: Optional[str] = None, status: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None, limit: int = 50, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if provider:
+            clauses.append("provider = ?")
+            params.append(provider)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        def _query(conn: sqlite3.Connection) -> Tuple[List[Dict[str, Any]], int]:
+            total = conn.execute(f"SELECT COUNT(*) FROM transfer_jobs{where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM transfer_jobs{where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                [*params, limit, offset],
+            ).fetchall()
+            return [_row_to_job(r) for r in rows], total
+        return await self.run(_query)
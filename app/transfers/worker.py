@@ -0,0 +1,348 @@
+import os
+import time
+import asyncio
+from typing import Optional, Dict, Any, List
+from ..adapters.registry import resolve_adapter_from_provider
+from ..config import TRANSFER_WORKERS, TRANSFER_PROVIDER_CONCURRENCY, TRANSFER_PROVIDER_LIMITS, TRANSFER_ACCOUNT_CONCURRENCY, TRANSFER_VISIBILITY_TIMEOUT, TRANSFER_QUEUE_POLL_INTERVAL
+from .queue import TransferQueue
+from .store import TransferJobStore
+from .dedupe import DedupeIndex, IN_FLIGHT, SUCCEEDED, FAILED
+from ..logger import create_logger
+from ..metrics import metrics, TRANSFERS_TOTAL, TRANSFER_SECONDS
+
+def _parse_limits(raw: str) -> Dict[str, int]:
+    """Parses "baidu=2,alipan=3" into a provider -> limit map."""
+    limits: Dict[str, int] = {}
+    for part in (raw or "").split(","):
+        if "=" not in part:
+            continue
+        name, value = part.split("=", 1)
+        try:
+            limits[name.strip().lower()] = int(value)
+        except ValueError:
+            continue
+    return limits
+
+class TransferWorkerPool:
+    """
+    Runs transfers from the durable queue on N workers.
+
+    A worker only claims an item whose provider is below its concurrency limit
+    and whose account profile is not already busy, so a slow provider or account
+    never blocks unrelated work queued behind it.
+    """
+
+    def __init__(self, queue: Optional[TransferQueue] = None, jobs: Optional[TransferJobStore] = None) -> None:
+        self.queue = queue or TransferQueue()
+        self.jobs = jobs or TransferJobStore()
+        self.dedupe = DedupeIndex()
+        self._cond: Optional[asyncio.Condition] = None
+        self._claim_lock: Optional[asyncio.Lock] = None
+        self._generation = 0
+        self._workers: List[asyncio.Task] = []
+        self._in_flight: Dict[str, int] = {}
+        self._busy_accounts: Dict[str, int] = {}
+        self._provider_limits = _parse_limits(TRANSFER_PROVIDER_LIMITS)
+        self.logger = create_logger("transfer-pool")
+
+    def _get_cond(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def provider_limit(self, provider: str) -> int:
+        return self._provider_limits.get(provider, TRANSFER_PROVIDER_CONCURRENCY)
+
+    def _account_key(self, provider: str, account: Optional[str]) -> str:
+        adapter = resolve_adapter_from_provider(provider)
+        try:
+            return os.path.abspath(adapter._resolve_user_data_dir(account))
+        except Exception:
+            return f"{provider}:{account or 'default'}"
+
+    def _saturated_providers(self) -> List[str]:
+        return [p for p, n in self._in_flight.items() if n >= self.provider_limit(p)]
+
+    def _saturated_accounts(self) -> List[str]:
+        return [k for k, n in self._busy_accounts.items() if n >= TRANSFER_ACCOUNT_CONCURRENCY]
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        if self._claim_lock is None:
+            self._claim_lock = asyncio.Lock()
+        # Claims are serialized so the exclusion lists stay accurate until the item is counted
+        async with self._claim_lock:
+            item = await self.queue.claim(self._saturated_providers(), self._saturated_accounts())
+            if item is not None:
+                self._acquire(item)
+            return item
+
+    async def _wake(self) -> None:
+        cond = self._get_cond()
+        async with cond:
+            self._generation += 1
+            cond.notify_all()
+
+    def _acquire(self, item: Dict[str, Any]) -> None:
+        provider = item["provider"]
+        self._in_flight[provider] = self._in_flight.get(provider, 0) + 1
+        self._busy_accounts[item["account_key"]] = self._busy_accounts.get(item["account_key"], 0) + 1
+
+    def _release(self, item: Dict[str, Any]) -> None:
+        provider = item["provider"]
+        self._in_flight[provider] = max(0, self._in_flight.get(provider, 0) - 1)
+        left = self._busy_accounts.get(item["account_key"], 0) - 1
+        if left > 0:
+            self._busy_accounts[item["account_key"]] = left
+        else:
+            self._busy_accounts.pop(item["account_key"], None)
+
+    def share_key(self, provider: str, url: str) -> str:
+        adapter = resolve_adapter_from_provider(provider)
+        return adapter.share_key(url) if adapter is not None else f"{provider}:{url}"
+
+    async def submit(self, provider: str, url: str, account: Optional[str] = None, cookies: Optional[Any] = None) -> str:
+        """Records a queued job for the link and enqueues it; returns the job ID."""
+        job_id = await self.jobs.create(provider, url, account)
+        self.dedupe.mark(self.share_key(provider, url), IN_FLIGHT, job_id)
+        await self.queue.put(provider, url, account, self._account_key(provider, account), cookies, job_id=job_id)
+        await self._wake()
+        return job_id
+
+    async def reject(self, provider: str, url: str, account: Optional[str], result: Dict[str, Any], timings: Optional[Dict[str, float]] = None) -> str:
+        """Records a job that failed before reaching the queue (e.g. a dead link found by preflight)."""
+        job_id = await self.jobs.create(provider, url, account)
+        self.dedupe.mark(self.share_key(provider, url), FAILED, job_id)
+        TRANSFERS_TOTAL.inc(provider=provider, status=result["status"])
+        result = {**result, "job_id": job_id}
+        await self.jobs.finish(job_id, result["status"], result.get("message"), result.get("target_path"), result, timings)
+        return job_id
+
+    async def _heartbeat(self, item_id: int) -> None:
+        while True:
+            await asyncio.sleep(max(1, TRANSFER_VISIBILITY_TIMEOUT // 3))
+            try:
+                await self.queue.touch(item_id)
+            except Exception as e:
+                self.logger.warning(f"Failed to extend visibility for queue item {item_id}: {e}")
+
+    @staticmethod
+    def _result(item: Dict[str, Any], status: str, message: str) -> Dict[str, Any]:
+        return {
+            "status": status,
+            "provider": item["provider"],
+            "share_link": item["url"],
+            "target_path": None,
+            "message": message,
+        }
+
+    async def _run_transfer(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        adapter = resolve_adapter_from_provider(item["provider"])
+        url = item["url"]
+        if adapter is None:
+            self.logger.error(f"Dropping transfer for unknown provider {item['provider']}: {url}")
+            return self._result(item, "error", "unknown_provider")
+        try:
+            self.logger.info(f"Processing transfer request for {adapter.name}: {url}")
+            result = await adapter.transfer(url, account=item.get("account"), cookie_str=item.get("cookies"))
+        except NotImplementedError:
+            self.logger.warning(f"Transfer method not implemented for {adapter.name}")
+            return self._result(item, "error", "transfer_not_implemented")
+        except Exception as e:
+            self.logger.error(f"Transfer failed for {adapter.name}: {e}")
+            return self._result(item, "error", str(e))
+        if not isinstance(result, dict):
+            return self._result(item, "error", "transfer_failed")
+        return result
+
+    async def _process(self, item: Dict[str, Any]) -> Any:
+        if item.get("batch"):
+            return await self._process_batch(item)
+        job_id = item.get("job_id")
+        started = time.time()
+        timings = {"queue_wait": round(started - item["enqueued_at"], 3)}
+        if item.get("exhausted"):
+            result = self._result(item, "error", "max_attempts_exceeded")
+        else:
+            if job_id:
+                await self.jobs.mark_running(job_id)
+            result = await self._run_transfer(item)
+            timings["transfer"] = round(time.time() - started, 3)
+        timings["total"] = round(time.time() - item["enqueued_at"], 3)
+        state = SUCCEEDED if result.get("status") == "success" else FAILED
+        self.dedupe.mark(self.share_key(item["provider"], item["url"]), state, job_id)
+        TRANSFERS_TOTAL.inc(provider=item["provider"], status=result.get("status") or "error")
+        TRANSFER_SECONDS.observe(timings["total"], provider=item["provider"])
+        if job_id:
+            result = {**result, "job_id": job_id}
+            await self.jobs.finish(job_id, result.get("status") or "error", result.get("message"), result.get("target_path"), result, timings)
+        return result
+
+    async def submit_batch(self, provider: str, urls: List[str], account: Optional[str] = None, cookies: Optional[Any] = None) -> List[str]:
+        """
+        Records a queued job per link and enqueues them as one batch item, so a
+        single worker transfers them in one browser session; returns the job IDs.
+        """
+        batch = []
+        for url in urls:
+            job_id = await self.jobs.create(provider, url, account)
+            self.dedupe.mark(self.share_key(provider, url), IN_FLIGHT, job_id)
+            batch.append({"url": url, "job_id": job_id})
+        await self.queue.put(provider, urls[0], account, self._account_key(provider, account), cookies, job_id=batch[0]["job_id"], batch=batch)
+        await self._wake()
+        return [entry["job_id"] for entry in batch]
+
+    async def _run_batch(self, item: Dict[str, Any], urls: List[str]) -> List[Dict[str, Any]]:
+        adapter = resolve_adapter_from_provider(item["provider"])
+        if adapter is None:
+            self.logger.error(f"Dropping batch for unknown provider {item['provider']}")
+            return [self._result({**item, "url": url}, "error", "unknown_provider") for url in urls]
+        try:
+            self.logger.info(f"Processing batch of {len(urls)} transfer(s) for {adapter.name}, account: {item.get('account')}")
+            results = await adapter.transfer_many(urls, account=item.get("account"), cookie_str=item.get("cookies"))
+        except NotImplementedError:
+            return [self._result({**item, "url": url}, "error", "transfer_not_implemented") for url in urls]
+        except Exception as e:
+            self.logger.error(f"Batch transfer failed for {adapter.name}: {e}")
+            return [self._result({**item, "url": url}, "error", str(e)) for url in urls]
+        results = list(results or [])
+        if len(results) != len(urls):
+            self.logger.error(f"Batch for {adapter.name} returned {len(results)} result(s) for {len(urls)} link(s)")
+        # Links without a result of their own are finished as failed rather than left running
+        return [
+            results[i] if i < len(results) and isinstance(results[i], dict) else self._result({**item, "url": url}, "error", "transfer_failed")
+            for i, url in enumerate(urls)
+        ]
+
+    async def _process_batch(self, item: Dict[str, Any]) -> List[Dict[str, Any]]:
+        entries = item["batch"]
+        urls = [entry["url"] for entry in entries]
+        started = time.time()
+        if item.get("exhausted"):
+            results = [self._result({**item, "url": url}, "error", "max_attempts_exceeded") for url in urls]
+        else:
+            for entry in entries:
+                await self.jobs.mark_running(entry["job_id"])
+            results = await self._run_batch(item, urls)
+        finished = time.time()
+        timings = {"queue_wait": round(started - item["enqueued_at"], 3), "transfer": round(finished - started, 3), "total": round(finished - item["enqueued_at"], 3)}
+        out: List[Dict[str, Any]] = []
+        for entry, result in zip(entries, results):
+            result = {**result, "job_id": entry["job_id"]}
+            state = SUCCEEDED if result.get("status") == "success" else FAILED
+            self.dedupe.mark(self.share_key(item["provider"], entry["url"]), state, entry["job_id"])
+            TRANSFERS_TOTAL.inc(provider=item["provider"], status=result.get("status") or "error")
+            TRANSFER_SECONDS.observe(timings["total"], provider=item["provider"])
+            await self.jobs.finish(entry["job_id"], result.get("status") or "error", result.get("message"), result.get("target_path"), result, timings)
+            out.append(result)
+        return out
+
+    async def _wait_for_work(self, generation: int) -> None:
+        cond = self._get_cond()
+        async with cond:
+            if self._generation != generation:
+                return
+            try:
+                # The timeout picks up items whose visibility timeout expired
+                await asyncio.wait_for(cond.wait(), TRANSFER_QUEUE_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self, idx: int) -> None:
+        while True:
+            generation = self._generation
+            try:
+                item = await self._claim()
+            except Exception as e:
+                self.logger.error(f"Worker {idx} failed to claim from queue: {e}")
+                item = None
+            if item is None:
+                await self._wait_for_work(generation)
+                continue
+            heartbeat = asyncio.create_task(self._heartbeat(item["id"]))
+            try:
+                await self._process(item)
+                if not item.get("exhausted"):
+                    await self.queue.ack(item["id"])
+            except Exception as e:
+                self.logger.error(f"Worker {idx} failed on queue item {item['id']}: {e}")
+            finally:
+                heartbeat.cancel()
+                self._release(item)
+                await self._wake()
+
+    async def start(self, workers: Optional[int] = None) -> None:
+        if self._workers:
+            self.logger.info("Transfer workers already started")
+            return
+        await self.queue.recover()
+        await self._restore_dedupe()
+        count = max(1, workers or TRANSFER_WORKERS)
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(count)]
+        self.logger.info(f"Started {count} transfer worker(s)")
+
+    async def _restore_dedupe(self) -> None:
+        """
+        Marks the shares still in the queue as in flight, so a restart does not
+        accept them again, and closes jobs a previous process left unfinished
+        outside the queue.
+        """
+        queued_jobs = set()
+        last_id = 0
+        while True:
+            # Paged by queue item ID so a large backlog is never loaded at once
+            rows = await self.queue.pending(after_id=last_id)
+            if not rows:
+                break
+            for row in rows:
+                self.dedupe.mark(self.share_key(row["provider"], row["url"]), IN_FLIGHT, row["job_id"])
+                queued_jobs.add(row["job_id"])
+            last_id = rows[-1]["id"]
+        orphans = [job_id for job_id in await self.jobs.unfinished() if job_id not in queued_jobs]
+        for job_id in orphans:
+            await self.jobs.finish(job_id, "error", "interrupted")
+        if queued_jobs or orphans:
+            self.logger.info(f"Restored {len(queued_jobs)} in-flight share(s) into the dedupe index, closed {len(orphans)} orphaned job(s)")
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        if self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self.queue.close()
+        self.jobs.close()
+        self.logger.info("Transfer workers stopped")
+
+    async def stats(self) -> Dict[str, Any]:
+        depth = await self.queue.depth()
+        queued = {p: states.get("queued", 0) for p, states in depth.items()}
+        providers = sorted(set(depth) | set(self._in_flight))
+        return {
+            "workers": len(self._workers),
+            "queued_total": sum(queued.values()),
+            "providers": {
+                p: {
+                    "queued": queued.get(p, 0),
+                    "claimed": depth.get(p, {}).get("claimed", 0),
+                    "in_flight": self._in_flight.get(p, 0),
+                    "limit": self.provider_limit(p),
+                }
+                for p in providers
+            },
+            "busy_accounts": len(self._busy_accounts),
+            "dedupe": self.dedupe.stats(),
+        }
+
+transfer_pool = TransferWorkerPool()
+
+async def _queue_depth_samples():
+    depth = await transfer_pool.queue.depth()
+    return [({"provider": p, "state": state}, n) for p, states in depth.items() for state, n in states.items()]
+
+metrics.gauge("pss_transfer_queue_depth", "Items in the durable transfer queue by provider and state", _queue_depth_samples)
+metrics.gauge(
+    "pss_transfers_in_flight",
+    "Transfers currently running by provider",
+    lambda: [({"provider": p}, n) for p, n in transfer_pool._in_flight.items()],
+)
+metrics.gauge("pss_transfer_busy_accounts", "Account profiles with a transfer in progress", lambda: [({}, len(transfer_pool._busy_accounts))])
@@ -1,4 +1,7 @@
+import os
 import json
+import sqlite3
+from urllib.request import pathname2url
 from typing import Dict, List, Union, Optional, Any
 from ..logger import create_logger
 
@@ -86,4 +89,42 @@ def parse_cookie_string(cookie_input: Optional[Any]) -> List[Dict[str, str]]:
     else:
         logger.warning("No cookies could be parsed from the provided cookie input")
         
-    return cookies
\ No newline at end of file
+    return cookies
+
+# Chromium stores expires_utc in microseconds since 1601-01-01
+_CHROME_EPOCH_OFFSET = 11644473600
+
+def profile_cookies(user_data_dir: str) -> List[Dict[str, Any]]:
+    """
+    Reads cookie names, domains and expiry from a persistent Chromium profile without
+    launching it. Values are encrypted on disk and are not returned.
+
+    Args:
+        user_data_dir: Path to the account's user data directory
+
+    Returns:
+        Cookies in storage_state format minus "value" ("expires" is -1 for session cookies)
+    """
+    for rel in (os.path.join("Default", "Network", "Cookies"), os.path.join("Default", "Cookies")):
+        path = os.path.join(user_data_dir, rel)
+        if not os.path.exists(path):
+            continue
+        try:
+            # immutable=1 skips locking, so a profile held open by Chromium can still be read
+            conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro&immutable=1", uri=True)
+            try:
+                rows = conn.execute("SELECT host_key, name, expires_utc, has_expires FROM cookies").fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read profile cookies {path}: {e}")
+            return []
+        return [
+            {
+                "name": name,
+                "domain": host,
+                "expires": expires / 1_000_000 - _CHROME_EPOCH_OFFSET if has_expires and expires else -1,
+            }
+            for host, name, expires, has_expires in rows
+        ]
+    return []
@@ -0,0 +1,45 @@
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Dict, Optional
+import httpx
+from ..config import HTTP_TIMEOUT, HTTP_MAX_CONNECTIONS
+from ..logger import create_logger
+
+logger = create_logger("http")
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36"
+)
+
+_client: Optional[httpx.AsyncClient] = None
+
+class HttpFallback(Exception):
+    """Raised by an HTTP transfer engine when the browser flow has to take over."""
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide pooled HTTP client.
+
+    The client never stores cookies: every account passes its own Cookie header,
+    so requests for different accounts can share the connection pool safely.
+    """
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS),
+            headers={"User-Agent": USER_AGENT},
+            cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+            follow_redirects=True,
+        )
+        logger.info("Created shared HTTP client")
+    return _client
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def cookie_header(cookies: Dict[str, str]) -> str:
+    return "; ".join(f"{name}={value}" for name, value in cookies.items())
@@ -0,0 +1,56 @@
+import os
+import sqlite3
+import asyncio
+import threading
+from typing import Any, Callable
+from ..logger import create_logger
+
+logger = create_logger("sqlite")
+
+class SqliteStore:
+    """
+    Shares one sqlite3 connection between worker threads so that database calls
+    never block the event loop. Subclasses pass their schema and call `run` with
+    a function that receives the connection.
+    """
+
+    def __init__(self, path: str, schema: str) -> None:
+        self.path = path
+        self._schema = schema
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.executescript(self._schema)
+            self._migrate(conn)
+            self._conn = conn
+            logger.info(f"Opened sqlite database: {self.path}")
+        return self._conn
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        """Hook for subclasses to upgrade tables created by an older schema."""
+
+    @staticmethod
+    def _columns(conn: sqlite3.Connection, table: str) -> set:
+        return {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+    def run_sync(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            return fn(self._connect(), *args)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.to_thread(self.run_sync, fn, *args)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
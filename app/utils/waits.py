@@ -0,0 +1,232 @@
+"""
+Event-driven page waits shared by adapters and tasks.
+
+Each helper waits for a concrete DOM, URL or network condition under its own
+deadline and reports whether it was met instead of raising, so callers keep
+their existing fallback logic while no longer sleeping for a fixed time.
+"""
+import re
+import time
+import asyncio
+from contextlib import contextmanager
+from typing import Optional, List, Union, Pattern, Iterator, Tuple, Callable, Any, Sequence
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from ..config import PAGE_STEP_TIMEOUT
+from ..metrics import STEP_SECONDS
+
+SHORT_TIMEOUT = 5000
+
+async def wait_any(page, selectors: List[str], timeout: int = PAGE_STEP_TIMEOUT) -> Optional[str]:
+    """
+    Waits until any of the selectors is visible.
+
+    Args:
+        page: Playwright page
+        selectors: Selectors to race, e.g. ["text=去登录", "text=我的文件"]
+        timeout: Deadline for this step in milliseconds
+
+    Returns:
+        The first selector that is visible, or None when the deadline passed
+    """
+    combined = None
+    for selector in selectors:
+        loc = page.locator(selector)
+        combined = loc if combined is None else combined.or_(loc)
+    try:
+        await combined.first.wait_for(state="visible", timeout=timeout)
+    except PlaywrightTimeoutError:
+        return None
+    for selector in selectors:
+        try:
+            if await page.locator(selector).first.is_visible():
+                return selector
+        except Exception:
+            continue
+    return None
+
+async def wait_visible(target, timeout: int = PAGE_STEP_TIMEOUT, state: str = "visible") -> bool:
+    """Waits for a locator to reach `state` ("visible", "hidden", "attached", "detached")."""
+    try:
+        await target.first.wait_for(state=state, timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+async def wait_hidden(page, selector: str, timeout: int = SHORT_TIMEOUT) -> bool:
+    return await wait_visible(page.locator(selector), timeout=timeout, state="hidden")
+
+async def wait_network_idle(page, timeout: int = SHORT_TIMEOUT) -> bool:
+    try:
+        await page.wait_for_load_state("networkidle", timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+async def wait_url(page, url: Union[str, Pattern], timeout: int = PAGE_STEP_TIMEOUT) -> bool:
+    try:
+        await page.wait_for_url(url, wait_until="domcontentloaded", timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+class ResponseWatcher:
+    """
+    Captures the first network response matching a predicate.
+
+    Enter it before the click that triggers the request, then `wait` for the
+    response; the listener is removed on exit.
+    """
+
+    def __init__(self, page, predicate: Callable[[Any], bool]) -> None:
+        self.page = page
+        self.predicate = predicate
+        self._future: Optional[asyncio.Future] = None
+
+    def _on_response(self, response) -> None:
+        if self._future is None or self._future.done():
+            return
+        try:
+            matched = self.predicate(response)
+        except Exception:
+            matched = False
+        if matched:
+            self._future.set_result(response)
+
+    async def __aenter__(self) -> "ResponseWatcher":
+        self._future = asyncio.get_running_loop().create_future()
+        self.page.on("response", self._on_response)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        try:
+            self.page.remove_listener("response", self._on_response)
+        except Exception:
+            pass
+
+    async def wait(self, timeout: int = PAGE_STEP_TIMEOUT):
+        """Returns the matching response, or None when the deadline passed."""
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._future), timeout / 1000)
+        except asyncio.TimeoutError:
+            return None
+
+def _sets_cookie(header: str, names: Sequence[str]) -> bool:
+    """Whether a (newline-joined) Set-Cookie header sets, not deletes, one of `names`."""
+    for line in header.split("\n"):
+        pair, _, attrs = line.partition(";")
+        name, _, value = pair.strip().partition("=")
+        attrs = attrs.lower()
+        if name in names and value and value != "deleted" and "max-age=0" not in attrs and "1970" not in attrs:
+            return True
+    return False
+
+class LoginWatcher:
+    """
+    Waits for the first sign that a login page has logged in, without polling:
+    a selector reaching a state, the main frame navigating to a matching URL,
+    or a response setting one of the auth cookies.
+    """
+
+    def __init__(self, page, selector: Optional[str] = None, state: str = "visible", url: Optional[Union[str, Pattern]] = None, cookies: Sequence[str] = ()) -> None:
+        self.page = page
+        self.selector = selector
+        self.state = state
+        self.url = re.compile(url) if isinstance(url, str) else url
+        self.cookies = tuple(cookies)
+
+    async def wait(self, timeout: int) -> Optional[str]:
+        """
+        Returns the signal that fired first ("selector", "url" or "cookie"), or None
+        when the deadline passed or the page was closed.
+
+        Args:
+            timeout: Single deadline for all signals in milliseconds
+        """
+        loop = asyncio.get_running_loop()
+        done: asyncio.Future = loop.create_future()
+        tasks: set = set()
+
+        def _spawn(coro) -> None:
+            task = loop.create_task(coro)
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        def _fire(signal: Optional[str]) -> None:
+            if not done.done():
+                done.set_result(signal)
+
+        def _on_navigated(frame) -> None:
+            if frame == self.page.main_frame and self.url.search(frame.url or ""):
+                _fire("url")
+
+        async def _check_cookies(response) -> None:
+            try:
+                header = await response.header_value("set-cookie")
+            except Exception:
+                return
+            if header and _sets_cookie(header, self.cookies):
+                _fire("cookie")
+
+        def _on_response(response) -> None:
+            if response.request.resource_type in ("document", "xhr", "fetch"):
+                _spawn(_check_cookies(response))
+
+        async def _wait_selector() -> None:
+            try:
+                if await wait_visible(self.page.locator(self.selector), timeout=timeout, state=self.state):
+                    _fire("selector")
+            except Exception:
+                pass
+
+        def _on_close(_) -> None:
+            _fire(None)
+
+        listeners = [("close", _on_close)]
+        if self.url is not None:
+            listeners.append(("framenavigated", _on_navigated))
+        if self.cookies:
+            listeners.append(("response", _on_response))
+        for event, handler in listeners:
+            self.page.on(event, handler)
+        if self.selector:
+            _spawn(_wait_selector())
+        try:
+            return await asyncio.wait_for(asyncio.shield(done), timeout / 1000)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            for event, handler in listeners:
+                try:
+                    self.page.remove_listener(event, handler)
+                except Exception:
+                    pass
+            for task in list(tasks):
+                task.cancel()
+
+class StepTimer:
+    """
+    Collects the duration of each step of one flow, logs them on a single line
+    and records each step in the pss_step_duration_seconds histogram.
+    """
+
+    def __init__(self, logger, flow: str, provider: str = "") -> None:
+        self.logger = logger
+        self.flow = flow
+        self.provider = provider
+        self.started = time.perf_counter()
+        self.steps: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.steps.append((name, elapsed * 1000))
+            STEP_SECONDS.observe(elapsed, provider=self.provider, flow=self.flow, step=name)
+
+    def log(self) -> None:
+        total = (time.perf_counter() - self.started) * 1000
+        parts = " ".join(f"{name}={ms:.0f}ms" for name, ms in self.steps)
+        self.logger.info(f"[timing] {self.flow} total={total:.0f}ms {parts}".rstrip())
@@ -0,0 +1,90 @@
+"""
+Offline check of the Baidu HTTP engine.
+
+Starts the Baidu stand-in from `bench.sites` and drives the real
+`BaiduHttpEngine.save` through share/verify -> share/list -> share/transfer
+for every kind of share the stand-in models:
+
+    python -m bench.engines
+
+Each case states the (status, message) the engine must return, or the
+HttpFallback reason it must raise so the browser flow takes over. The run
+exits 1 on any mismatch, so it can gate a change to the engine.
+"""
+import sys
+import json
+import asyncio
+import argparse
+from typing import Dict, Any, List, Optional, Tuple
+from .sites import BaiduSite, BENCH_CODE
+
+_COOKIES = {"BDUSS": "bench", "STOKEN": "bench"}
+_TARGET = "/bench"
+
+# (name, surl, code, expected result or "fallback:<reason>", whether share/transfer is reached)
+_CASES: List[Tuple[str, str, Optional[str], Any, bool]] = [
+    ("plain", "open1", None, ("success", "transferred"), True),
+    ("pwd", "pwd1", BENCH_CODE, ("success", "transferred"), True),
+    ("wrong_code", "pwd2", "xxxx", ("fail", "提取码错误或分享不存在"), False),
+    ("missing_code", "pwd3", None, ("fail", "缺少提取码"), False),
+    ("dead", "dead1", None, ("fail", "分享链接已失效"), False),
+    ("drive_full", "full1", None, ("fail", "网盘空间不足"), True),
+    ("captcha", "captcha1", None, "fallback:captcha_required", False),
+    ("captcha_code", "captcha2", BENCH_CODE, "fallback:captcha_required", False),
+]
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    site = BaiduSite(api_latency=args.api_latency).start()
+    from app.adapters.baidu_http import BaiduHttpEngine
+    from app.utils.http import HttpFallback, close_client
+
+    engine = BaiduHttpEngine(base_url=site.base_url)
+    results: Dict[str, Any] = {}
+    mismatches: List[str] = []
+    try:
+        for name, surl, code, expected, transfers in _CASES:
+            before = len(site.transfers)
+            try:
+                got: Any = tuple(await engine.save(surl, code, dict(_COOKIES), _TARGET))
+            except HttpFallback as e:
+                got = f"fallback:{e}"
+            results[name] = got
+            if got != expected:
+                mismatches.append(f"{name}: expected {expected}, got {got}")
+                continue
+            sent = site.transfers[before:]
+            # A verified code must travel to share/transfer as sekey
+            if transfers != bool(sent):
+                mismatches.append(f"{name}: {len(sent)} share/transfer call(s)")
+            elif sent and code and sent[0]["query"].get("sekey") != "bench+sk":
+                mismatches.append(f"{name}: share/transfer sent sekey {sent[0]['query'].get('sekey')!r}")
+            elif sent and sent[0]["body"].get("path") != _TARGET:
+                mismatches.append(f"{name}: share/transfer sent path {sent[0]['body'].get('path')!r}")
+    finally:
+        await close_client()
+        site.stop()
+
+    return {
+        "results": {name: list(r) if isinstance(r, tuple) else r for name, r in results.items()},
+        "mismatches": mismatches,
+        "site_hits": dict(sorted(site.hits.items())),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the Baidu HTTP engine against a local stand-in site")
+    parser.add_argument("--api-latency", type=int, default=0, help="stand-in delay per API response in ms")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        for name, result in report["results"].items():
+            print(f"  {name:<14}{result}")
+    if report["mismatches"]:
+        print("mismatches:\n  " + "\n  ".join(report["mismatches"]), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
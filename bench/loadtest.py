@@ -0,0 +1,279 @@
+"""
+In-process HTTP load test for the FastAPI endpoints.
+
+Runs the real app (routes, transfer queue, worker pool, scheduler) with the
+share and task adapters replaced by stubs that only sleep, and drives
+`/transfer`, `/tasks/run_now`, `/login/qr` and `/tasks/enabled` through
+httpx's ASGI transport:
+
+    python -m bench.loadtest --rate 200 --duration 20 --transfer-delay 2000
+
+With `--rate` the load is open-loop (requests are issued on schedule whether
+or not earlier ones finished), which is what shows where the single event loop
+saturates; without it `--concurrency` clients send back-to-back requests.
+
+Reports requests/sec and latency percentiles per endpoint, transfer queue
+growth, and event-loop lag measured by a timer on the same loop as the app.
+Client and app share that loop, so the numbers are an upper bound on what a
+uvicorn worker would see.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from typing import Dict, Any, List, Optional, Tuple
+from .transfers import percentile
+
+_ENDPOINTS = ("transfer", "run_now", "login_qr", "tasks_enabled")
+
+def _parse_mix(raw: str) -> List[Tuple[str, int]]:
+    mix = []
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in _ENDPOINTS:
+            raise SystemExit(f"unknown endpoint in --mix: {name} (expected one of {', '.join(_ENDPOINTS)})")
+        mix.append((name, int(weight or 1)))
+    return mix
+
+class LoopLagProbe:
+    """Measures how late a periodic timer fires on the running event loop."""
+
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval) * 1000)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+def _install_stubs(args: argparse.Namespace, storage_dir: str) -> None:
+    """Swaps the registered adapters for stubs that sleep for the configured delays."""
+    from app.base import ShareAdapter, TaskAdapter
+    from app.adapters import registry as adapters_registry
+    from app.tasks import registry as tasks_registry
+    from app.logger import create_logger
+
+    class StubShareAdapter(ShareAdapter):
+        def __init__(self, name: str) -> None:
+            super().__init__()
+            self._name = name
+            self.user_data_dir = os.path.join(storage_dir, f"{name}_userdata")
+            self.logger = create_logger(f"stub-{name}")
+
+        @property
+        def name(self) -> str:
+            return self._name
+
+        async def preflight(self, link: str) -> str:
+            await asyncio.sleep(args.preflight_delay / 1000)
+            return "valid"
+
+        async def transfer(self, link: str, account: Optional[str] = None, cookie_str: Optional[Any] = None) -> Dict[str, Any]:
+            await asyncio.sleep(args.transfer_delay / 1000)
+            return {"status": "success", "provider": self.name, "share_link": link, "target_path": None, "message": "transferred"}
+
+        # QR logins go through the real login session manager, only the page is fake
+        async def open_context_and_page(self, account: Optional[str] = None, cookie_str: Optional[Any] = None):
+            return None, object()
+
+        async def release_context_and_page(self, page, account: Optional[str] = None) -> None:
+            return None
+
+        async def _open_login(self, page) -> Tuple[bool, bytes]:
+            await asyncio.sleep(args.qr_delay / 1000)
+            return False, b"\x89PNG\r\n\x1a\n"
+
+        async def _wait_for_login(self, page, timeout: int) -> Optional[str]:
+            await asyncio.sleep(timeout / 1000)
+            return None
+
+    class StubTaskAdapter(TaskAdapter):
+        @property
+        def name(self) -> str:
+            return "stub"
+
+        async def run(self, provider: Optional[str] = None, accounts: Optional[List[str]] = None, cookies: Optional[Any] = None) -> Dict[str, Any]:
+            await asyncio.sleep(args.task_delay / 1000)
+            return {"status": "success", "message": "stub"}
+
+    baidu, alipan = StubShareAdapter("baidu"), StubShareAdapter("alipan")
+    adapters_registry._REGISTRY.update({"baidu": baidu, "baidupan": baidu, "alipan": alipan, "aliyundrive": alipan})
+    tasks_registry._TASK_REGISTRY["stub"] = StubTaskAdapter()
+
+def _request(name: str, seq: int) -> Tuple[str, str, Dict[str, Any]]:
+    if name == "transfer":
+        if seq % 2:
+            return "POST", "/transfer", {"json": {"url": f"https://www.alipan.com/s/load{seq:08d}", "account": f"acc{seq % 4}"}}
+        return "POST", "/transfer", {"json": {"url": f"https://pan.baidu.com/s/1load{seq:08d}", "account": f"acc{seq % 4}"}}
+    if name == "run_now":
+        return "POST", "/tasks/run_now", {"json": {"adapter": "stub"}}
+    if name == "login_qr":
+        return "GET", "/login/qr", {"params": {"provider": "baidu", "account": f"acc{seq % 4}"}}
+    return "GET", "/tasks/enabled", {}
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    storage_dir = os.environ.setdefault("STORAGE_DIR", tempfile.mkdtemp(prefix="pss-load-"))
+    os.environ.setdefault("PREFLIGHT_ENABLED", "true" if args.preflight else "false")
+    import httpx
+    from app.main import app
+    from app.transfers.worker import transfer_pool
+
+    _install_stubs(args, storage_dir)
+    mix = _parse_mix(args.mix)
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    queue_samples: List[int] = []
+    probe = LoopLagProbe()
+    seq = 0
+
+    async def _queued() -> int:
+        stats = await transfer_pool.stats()
+        return sum(p["queued"] + p["claimed"] for p in stats["providers"].values())
+
+    async def _sample_queue() -> None:
+        while True:
+            queue_samples.append(await _queued())
+            await asyncio.sleep(0.5)
+
+    async def _one(client: "httpx.AsyncClient") -> None:
+        nonlocal seq
+        seq += 1
+        name = random.choices(names, weights)[0]
+        method, path, kwargs = _request(name, seq)
+        start = time.perf_counter()
+        try:
+            resp = await client.request(method, path, **kwargs)
+            if resp.status_code >= 400:
+                errors[name] += 1
+        except Exception as e:
+            errors[name] += 1
+            print(f"{name} request failed: {e}", file=sys.stderr)
+        latencies[name].append((time.perf_counter() - start) * 1000)
+
+    await app.router.startup()
+    transport = httpx.ASGITransport(app=app)
+    client = httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout)
+    queue_start = await _queued()
+    sampler = asyncio.create_task(_sample_queue())
+    probe.start()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    try:
+        if args.rate > 0:
+            inflight = set()
+            interval = 1 / args.rate
+            next_at = started
+            while next_at < deadline:
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                task = asyncio.create_task(_one(client))
+                inflight.add(task)
+                task.add_done_callback(inflight.discard)
+                next_at += interval
+            issued_for = time.perf_counter() - started
+            if inflight:
+                await asyncio.wait(inflight, timeout=args.timeout)
+        else:
+            async def _client_loop() -> None:
+                while time.perf_counter() < deadline:
+                    await _one(client)
+
+            await asyncio.gather(*[_client_loop() for _ in range(args.concurrency)])
+            issued_for = time.perf_counter() - started
+        elapsed = time.perf_counter() - started
+        queue_end = await _queued()
+    finally:
+        await probe.stop()
+        sampler.cancel()
+        await client.aclose()
+        await app.router.shutdown()
+
+    total = sum(len(v) for v in latencies.values())
+    endpoints = {}
+    for name in names:
+        values = latencies[name]
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "rps": round(len(values) / elapsed, 1) if elapsed > 0 else 0.0,
+            "p50_ms": round(percentile(values, 50), 1),
+            "p95_ms": round(percentile(values, 95), 1),
+            "p99_ms": round(percentile(values, 99), 1),
+            "max_ms": round(max(values), 1) if values else 0.0,
+        }
+    return {
+        "mode": f"open-loop {args.rate}/s" if args.rate > 0 else f"closed-loop x{args.concurrency}",
+        "duration_s": round(issued_for, 2),
+        "elapsed_s": round(elapsed, 2),
+        "requests": total,
+        "rps": round(total / elapsed, 1) if elapsed > 0 else 0.0,
+        "endpoints": endpoints,
+        "queue": {
+            "start": queue_start,
+            "peak": max(queue_samples + [queue_start, queue_end]),
+            "end": queue_end,
+            "growth_per_s": round((queue_end - queue_start) / elapsed, 2) if elapsed > 0 else 0.0,
+        },
+        "loop_lag_ms": {
+            "p50": round(percentile(probe.samples, 50), 1),
+            "p99": round(percentile(probe.samples, 99), 1),
+            "max": round(max(probe.samples), 1) if probe.samples else 0.0,
+        },
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the FastAPI endpoints with stubbed adapters")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to generate load for")
+    parser.add_argument("--rate", type=float, default=0, help="open-loop request rate per second (0 = closed loop)")
+    parser.add_argument("--concurrency", type=int, default=16, help="clients for the closed-loop mode")
+    parser.add_argument("--mix", default="transfer=8,run_now=1,login_qr=1,tasks_enabled=2", help="endpoint weights")
+    parser.add_argument("--transfer-delay", type=int, default=1000, help="stub transfer time in ms")
+    parser.add_argument("--task-delay", type=int, default=200, help="stub task run time in ms")
+    parser.add_argument("--qr-delay", type=int, default=300, help="stub QR code generation time in ms")
+    parser.add_argument("--preflight-delay", type=int, default=50, help="stub pre-flight check time in ms")
+    parser.add_argument("--no-preflight", dest="preflight", action="store_false", help="disable pre-flight checks")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request timeout in seconds")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--max-lag", type=float, default=0, help="exit 1 when p99 event-loop lag exceeds this many ms")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"{report['mode']}: {report['requests']} requests in {report['elapsed_s']}s ({report['rps']} req/s)")
+        for name, ep in report["endpoints"].items():
+            print(f"  {name:<14} n={ep['requests']:<6} err={ep['errors']:<4} {ep['rps']:>7} req/s  p50={ep['p50_ms']}ms p95={ep['p95_ms']}ms p99={ep['p99_ms']}ms max={ep['max_ms']}ms")
+        q = report["queue"]
+        print(f"  transfer queue  start={q['start']} peak={q['peak']} end={q['end']} growth={q['growth_per_s']}/s")
+        lag = report["loop_lag_ms"]
+        print(f"  loop lag        p50={lag['p50']}ms p99={lag['p99']}ms max={lag['max']}ms")
+    if args.max_lag and report["loop_lag_ms"]["p99"] > args.max_lag:
+        print(f"p99 loop lag {report['loop_lag_ms']['p99']}ms exceeds --max-lag {args.max_lag}ms", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
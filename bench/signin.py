@@ -0,0 +1,116 @@
+"""
+Offline V2EX sign-in benchmark.
+
+Starts the V2EX stand-in from `bench.sites` and runs the real `v2ex_signin`
+task for a number of accounts, twice:
+
+    python -m bench.signin --accounts 20 --engine http
+
+The first round must redeem every account's reward and the second must find
+it already redeemed. The HTTP engine is pointed at the stand-in through
+V2EX_BASE_URL; browser traffic for www.v2ex.com is routed to it as in
+`bench.transfers`.
+
+Reports per-account p50/p95 latency, the number of browser contexts opened
+and the peak RSS of this process plus its browser children. Use `--max-p95`
+to make the run fail on a regression.
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+import tempfile
+from typing import Dict, Any, List
+from .sites import V2exSite
+from .transfers import RssSampler, percentile, _route_to
+
+_EXPECTED = {"redeem": "已成功领取每日登录奖励", "repeat": "每日登录奖励已领取"}
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    site = V2exSite(args.page_latency, args.api_latency).start()
+    os.environ.setdefault("STORAGE_DIR", tempfile.mkdtemp(prefix="pss-bench-"))
+    os.environ["V2EX_SIGNIN_ENGINE"] = args.engine
+    os.environ["V2EX_BASE_URL"] = site.base_url
+    os.environ["TASK_ACCOUNT_CONCURRENCY"] = str(args.concurrency)
+    # Configuration is read at import time, so the app is imported only now
+    from app.browser import manager
+    from app.tasks.registry import resolve_task_adapter
+    from app.utils.http import close_client
+
+    task = resolve_task_adapter("v2ex_signin")
+    _route_to(manager, "v2ex", site.base_url)
+    accounts = [f"bench{n}" for n in range(args.accounts)]
+    cookies = {account: {".v2ex.com": {"A2": f"bench-{account}"}} for account in accounts}
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    unexpected: List[str] = []
+    sampler = RssSampler()
+    sampler.start()
+    try:
+        for round_name, message in _EXPECTED.items():
+            result = await task.run("v2ex", accounts, cookies)
+            for account, r in (result.get("accounts") or {}).items():
+                latencies.append(r.get("duration_ms", 0.0))
+                status = r.get("status", "error")
+                statuses[status] = statuses.get(status, 0) + 1
+                # The browser flow only reports the status
+                if status != "success" or (r.get("message") and r["message"] != message):
+                    unexpected.append(f"{round_name}/{account}: {status} {r.get('message')}")
+    finally:
+        await sampler.stop()
+        await close_client()
+        pool = manager.stats()
+        await manager.stop()
+        site.stop()
+
+    return {
+        "engine": args.engine,
+        "accounts": len(accounts),
+        "concurrency": args.concurrency,
+        "statuses": statuses,
+        "unexpected": unexpected,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "max_ms": round(max(latencies), 1) if latencies else 0.0,
+        "contexts_opened": pool["misses"],
+        "peak_rss_mb": round(sampler.peak_kb / 1024, 1),
+        "site_hits": dict(sorted(site.hits.items())),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark V2EX sign-ins against a local stand-in site")
+    parser.add_argument("--engine", choices=["browser", "http", "auto"], default="http", help="sign-in engine to exercise")
+    parser.add_argument("--accounts", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--page-latency", type=int, default=50, help="stand-in delay per HTML page in ms")
+    parser.add_argument("--api-latency", type=int, default=0, help="stand-in delay per API response in ms")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--max-p95", type=float, default=0, help="exit 1 when p95 latency exceeds this many ms")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"v2ex_signin ({report['engine']}): {report['accounts']} account(s) x 2 rounds, concurrency {report['concurrency']}")
+        print(f"  statuses      {report['statuses']}")
+        print(f"  latency       p50={report['p50_ms']}ms p95={report['p95_ms']}ms max={report['max_ms']}ms")
+        print(f"  contexts      {report['contexts_opened']} browser context(s) opened")
+        print(f"  peak RSS      {report['peak_rss_mb']} MB (process + browser)")
+
+    failed = False
+    if args.max_p95 and report["p95_ms"] > args.max_p95:
+        print(f"p95 {report['p95_ms']}ms exceeds --max-p95 {args.max_p95}ms", file=sys.stderr)
+        failed = True
+    if report["unexpected"]:
+        print("unexpected results:\n  " + "\n  ".join(report["unexpected"]), file=sys.stderr)
+        failed = True
+    if args.engine == "http" and report["contexts_opened"]:
+        print(f"HTTP engine opened {report['contexts_opened']} browser context(s)", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Local stand-ins for the Baidu and Alipan share sites and the V2EX daily mission.
+
+Each site is a small threaded HTTP server that serves just enough HTML for the
+adapters' selectors ("我的文件", "提取码", "保存到网盘", `[node-path=...]`,
+"文件分类", "极速查看文件", "立即保存", "保存到此处", ...) and the JSON endpoints
+used by the save buttons and by the HTTP engines. Page and API latencies are
+configurable so the benchmark can model a slow provider.
+
+Share IDs starting with "pwd" require the extraction code BENCH_CODE; IDs
+starting with "dead" are reported as expired. Baidu share IDs starting with
+"captcha" make the share APIs demand a captcha (errno -62), and saving a
+share starting with "full" fails for lack of space (errno -10). The V2EX
+stand-in keys accounts by their "A2" cookie and lets each one redeem once.
+
+Run `python -m bench.sites` to browse the stand-ins by hand.
+"""
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+BENCH_CODE = "bnch"
+
+_BAIDU_HOME = """<!doctype html><html><head><meta charset="utf-8"><title>百度网盘</title></head>
+<body><nav><a href="/disk/main">我的文件</a></nav></body></html>"""
+
+_BAIDU_VERIFY = """<!doctype html><html><head><meta charset="utf-8"><title>百度网盘 请输入提取码</title></head>
+<body><form method="get" action="/s/1{surl}">
+<label>请输入提取码</label><input type="text" name="pwd" aria-label="提取码">
+<input type="hidden" name="verified" value="1">
+<a href="#" onclick="this.closest('form').submit(); return false;">提取文件</a>
+</form></body></html>"""
+
+_BAIDU_SHARE = """<!doctype html><html><head><meta charset="utf-8"><title>百度网盘 分享</title></head>
+<body>
+<div class="share-list"><span>bench-{surl}.mkv</span></div>
+<div class="bottom-save-path" onclick="document.getElementById('tree').style.display='block'">保存路径</div>
+<div id="tree" class="file-tree-container" style="display:none">
+  <div node-path="/" onclick="pick(this)">全部文件</div>
+  <div node-path="{node_path}" onclick="pick(this)">{folder}</div>
+  <a node-type="confirm" href="#" onclick="document.getElementById('tree').style.display='none'; return false;">确认</a>
+</div>
+<a id="save" href="#">保存到网盘</a>
+<div id="toast" style="display:none">成功保存</div>
+<script>
+var target = "/";
+function pick(el) {{ target = el.getAttribute("node-path"); }}
+document.getElementById("save").onclick = function (e) {{
+  e.preventDefault();
+  var body = new URLSearchParams({{fsidlist: "[1]", path: target}});
+  fetch("/share/transfer?shareid=1&from=1", {{method: "POST", body: body}})
+    .then(function (r) {{ return r.json(); }})
+    .then(function (d) {{ if (d.errno === 0) document.getElementById("toast").style.display = "block"; }});
+}};
+</script>
+</body></html>"""
+
+_ALIPAN_HOME = """<!doctype html><html><head><meta charset="utf-8"><title>阿里云盘</title></head>
+<body><aside><div>文件分类</div></aside></body></html>"""
+
+_ALIPAN_VERIFY = """<!doctype html><html><head><meta charset="utf-8"><title>阿里云盘 分享</title></head>
+<body><p>bench 分享了文件</p>
+<form method="get" action="/s/{share_id}">
+<input type="text" name="pwd" placeholder="请输入提取码">
+<input type="hidden" name="verified" value="1">
+<button type="submit">极速查看文件</button>
+</form></body></html>"""
+
+_ALIPAN_SHARE = """<!doctype html><html><head><meta charset="utf-8"><title>阿里云盘 分享</title></head>
+<body>
+<div class="share-list"><span>bench-{share_id}.mkv</span></div>
+<button class="btn-save" onclick="document.getElementById('dialog').style.display='block'">立即保存</button>
+<div id="dialog" style="display:none">
+  <div>保存到根目录</div>
+  <div onclick="this.className='selected'">来自分享</div>
+  <button id="here">保存到此处</button>
+</div>
+<script>
+document.getElementById("here").onclick = function () {{
+  var body = {{resource: "file", requests: [{{id: "0", method: "POST", url: "/file/copy", body: {{file_id: "f0", share_id: "{share_id}"}}}}]}};
+  fetch("/adrive/v4/batch", {{method: "POST", headers: {{"Content-Type": "application/json"}}, body: JSON.stringify(body)}})
+    .then(function (r) {{ return r.json(); }})
+    .then(function () {{ document.getElementById("dialog").style.display = "none"; }});
+}};
+</script>
+</body></html>"""
+
+_V2EX_DAILY = """<!doctype html><html><head><meta charset="utf-8"><title>V2EX › 日常任务</title></head>
+<body><div id="Main"><div class="box"><div class="cell">每日登录奖励</div>
+<div class="cell">{body}</div></div></div></body></html>"""
+
+_V2EX_REDEEM_BUTTON = """<input type="button" class="super normal button" value="领取 X 铜币" onclick="location.href = '/mission/daily/redeem?once={once}';">"""
+
+_V2EX_SIGNIN = """<!doctype html><html><head><meta charset="utf-8"><title>V2EX › 登录</title></head>
+<body><div id="Main"><div class="box">你要查看的页面需要先登录</div></div></body></html>"""
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "StandInServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, body: str, content_type: str) -> None:
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _html(self, body: str, status: int = 200) -> None:
+        self.server.site.pause(self.server.site.page_latency)
+        self._send(status, body, "text/html")
+
+    def _redirect(self, location: str) -> None:
+        self.server.site.pause(self.server.site.page_latency)
+        self.send_response(302)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _json(self, payload: Dict[str, Any], status: int = 200) -> None:
+        self.server.site.pause(self.server.site.api_latency)
+        self._send(status, json.dumps(payload, ensure_ascii=False), "application/json")
+
+    def _body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8") if length else ""
+        if "json" in (self.headers.get("Content-Type") or ""):
+            try:
+                return json.loads(raw or "{}")
+            except ValueError:
+                return {}
+        return {k: v[0] for k, v in parse_qs(raw).items()}
+
+    def do_GET(self) -> None:
+        parsed = urlparse(self.path)
+        self.server.site.count(f"GET {parsed.path}")
+        self.server.site.get(self, parsed.path, {k: v[0] for k, v in parse_qs(parsed.query).items()})
+
+    def do_POST(self) -> None:
+        parsed = urlparse(self.path)
+        self.server.site.count(f"POST {parsed.path}")
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        self.server.site.post(self, parsed.path, query, self._body())
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, site: "StandInSite", host: str, port: int) -> None:
+        super().__init__((host, port), _Handler)
+        self.site = site
+
+class StandInSite:
+    """
+    Base class of one stand-in site.
+
+    Args:
+        page_latency: Delay in milliseconds added to every HTML page
+        api_latency: Delay in milliseconds added to every JSON response
+    """
+
+    def __init__(self, page_latency: int = 0, api_latency: int = 0) -> None:
+        self.page_latency = page_latency
+        self.api_latency = api_latency
+        self.hits: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[StandInServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> "StandInSite":
+        self._server = StandInServer(self, host, port)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def pause(self, ms: int) -> None:
+        if ms > 0:
+            time.sleep(ms / 1000)
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.hits[key] = self.hits.get(key, 0) + 1
+
+    def get(self, req: _Handler, path: str, query: Dict[str, str]) -> None:
+        req._html("<h1>404</h1>", status=404)
+
+    def post(self, req: _Handler, path: str, query: Dict[str, str], body: Dict[str, Any]) -> None:
+        req._json({"errno": -1}, status=404)
+
+class BaiduSite(StandInSite):
+    """Stand-in for pan.baidu.com: home page, share pages and the share/* APIs."""
+
+    def __init__(self, page_latency: int = 0, api_latency: int = 0, node_path: str = "/bench") -> None:
+        super().__init__(page_latency, api_latency)
+        self.node_path = node_path
+        # Query and form of every share/transfer call, for checks on what the HTTP engine sent
+        self.transfers: List[Dict[str, Any]] = []
+
+    def get(self, req: _Handler, path: str, query: Dict[str, str]) -> None:
+        if path in ("/", "/disk/main"):
+            return req._html(_BAIDU_HOME)
+        if path.startswith("/s/1"):
+            surl = path[len("/s/1"):]
+            if surl.startswith("dead"):
+                return req._html("<p>啊哦，你来晚了，分享的文件已经被取消了</p>")
+            if surl.startswith("pwd") and (not query.get("verified") or query.get("pwd") != BENCH_CODE):
+                # Like the real site, password-protected shares bounce to /share/init
+                return req._redirect(f"/share/init?surl={surl}")
+            return req._html(_BAIDU_SHARE.format(surl=surl, node_path=self.node_path, folder=self.node_path.strip("/") or "全部文件"))
+        if path == "/share/init":
+            return req._html(_BAIDU_VERIFY.format(surl=query.get("surl", "")))
+        if path == "/share/list":
+            surl = query.get("shorturl", "")
+            if surl.startswith("dead"):
+                return req._json({"errno": 105})
+            if surl.startswith("captcha"):
+                return req._json({"errno": -62})
+            if surl.startswith("pwd") and "BDCLND=" not in (req.headers.get("Cookie") or ""):
+                # Without the verified-code cookie the real API answers as if the share did not exist
+                return req._json({"errno": -9})
+            return req._json({"errno": 0, "share_id": 1, "uk": 1, "list": [{"fs_id": 1, "server_filename": f"bench-{surl}.mkv"}]})
+        if path == "/api/gettemplatevariable":
+            return req._json({"errno": 0, "result": {"bdstoken": "bench", "uk": 1}})
+        super().get(req, path, query)
+
+    def post(self, req: _Handler, path: str, query: Dict[str, str], body: Dict[str, Any]) -> None:
+        if path == "/share/verify":
+            if query.get("surl", "").startswith("captcha"):
+                return req._json({"errno": -62})
+            ok = body.get("pwd") == BENCH_CODE
+            return req._json({"errno": 0, "randsk": "bench%2Bsk"} if ok else {"errno": -9})
+        if path == "/share/transfer":
+            with self._lock:
+                self.transfers.append({"query": query, "body": body})
+            if "surl=full" in (req.headers.get("Referer") or ""):
+                return req._json({"errno": -10})
+            return req._json({"errno": 0, "extra": {"list": [{"to": body.get("path", "/")}]}})
+        super().post(req, path, query, body)
+
+class AlipanSite(StandInSite):
+    """Stand-in for www.alipan.com and its API host: drive home, share pages and the adrive APIs."""
+
+    def get(self, req: _Handler, path: str, query: Dict[str, str]) -> None:
+        if path == "/drive/home":
+            return req._html(_ALIPAN_HOME)
+        if path.startswith("/s/"):
+            share_id = path[len("/s/"):].split("/")[0]
+            if share_id.startswith("dead"):
+                return req._html("<p>分享链接已过期</p>")
+            if share_id.startswith("pwd") and (not query.get("verified") or query.get("pwd") != BENCH_CODE):
+                return req._html(_ALIPAN_VERIFY.format(share_id=share_id))
+            return req._html(_ALIPAN_SHARE.format(share_id=share_id))
+        super().get(req, path, query)
+
+    def post(self, req: _Handler, path: str, query: Dict[str, str], body: Dict[str, Any]) -> None:
+        share_id = body.get("share_id") or query.get("share_id") or ""
+        if path == "/adrive/v3/share_link/get_share_by_anonymous":
+            if share_id.startswith("dead"):
+                return req._json({"code": "ShareLink.Expired"}, status=400)
+            return req._json({"share_id": share_id, "has_pwd": share_id.startswith("pwd")})
+        if path == "/v2/share_link/get_share_token":
+            if share_id.startswith("dead"):
+                return req._json({"code": "ShareLink.Expired"}, status=400)
+            if share_id.startswith("pwd") and body.get("share_pwd") != BENCH_CODE:
+                return req._json({"code": "InvalidResource.SharePwd"}, status=400)
+            return req._json({"share_token": f"bench-{share_id}", "expires_in": 7200})
+        if path == "/adrive/v2/file/list_by_share":
+            return req._json({"items": [{"file_id": f"{share_id}-f0", "name": f"bench-{share_id}.mkv"}], "next_marker": ""})
+        if path == "/adrive/v3/file/search":
+            return req._json({"items": [{"file_id": "bench-folder"}]})
+        if path == "/adrive/v4/batch":
+            requests = body.get("requests") or []
+            return req._json({"responses": [{"id": r.get("id"), "status": 201, "body": {}} for r in requests]})
+        super().post(req, path, query, body)
+
+class V2exSite(StandInSite):
+    """Stand-in for www.v2ex.com: the daily mission page and its redeem URL."""
+
+    def __init__(self, page_latency: int = 0, api_latency: int = 0) -> None:
+        super().__init__(page_latency, api_latency)
+        self._once: Dict[str, str] = {}
+        self._redeemed: Dict[str, bool] = {}
+        self._next_once = 10000
+
+    def _session(self, req: _Handler) -> Optional[str]:
+        for pair in (req.headers.get("Cookie") or "").split(";"):
+            name, _, value = pair.strip().partition("=")
+            if name == "A2" and value:
+                return value
+        return None
+
+    def get(self, req: _Handler, path: str, query: Dict[str, str]) -> None:
+        if path == "/signin":
+            return req._html(_V2EX_SIGNIN)
+        if path.startswith("/mission/daily"):
+            session = self._session(req)
+            if session is None:
+                return req._redirect("/signin?next=/mission/daily")
+            with self._lock:
+                if path == "/mission/daily/redeem":
+                    if session in self._once and query.get("once") == self._once.pop(session):
+                        # Shown once on the next page load, like the real site's flash message
+                        self._redeemed.setdefault(session, True)
+                    return req._redirect("/mission/daily")
+                flash = self._redeemed.get(session)
+                if flash is not None:
+                    self._redeemed[session] = False
+                    body = "已成功领取每日登录奖励" if flash else "每日登录奖励已领取"
+                else:
+                    if session not in self._once:
+                        self._next_once += 1
+                        self._once[session] = str(self._next_once)
+                    once = self._once[session]
+                    body = _V2EX_REDEEM_BUTTON.format(once=once)
+            return req._html(_V2EX_DAILY.format(body=body))
+        super().get(req, path, query)
+
+def alipan_token(drive_id: str = "bench-drive", ttl: int = 3600) -> str:
+    """localStorage "token" value accepted by the Alipan stand-in."""
+    expire = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+    return json.dumps({"access_token": "bench", "default_drive_id": drive_id, "expire_time": expire.isoformat()})
+
+def start_sites(page_latency: int = 0, api_latency: int = 0, node_path: str = "/bench") -> Tuple[BaiduSite, AlipanSite]:
+    baidu = BaiduSite(page_latency, api_latency, node_path).start()
+    alipan = AlipanSite(page_latency, api_latency).start()
+    return baidu, alipan
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the Baidu/Alipan/V2EX stand-in sites")
+    parser.add_argument("--page-latency", type=int, default=0, help="delay per HTML page in ms")
+    parser.add_argument("--api-latency", type=int, default=0, help="delay per API response in ms")
+    args = parser.parse_args()
+    baidu, alipan = start_sites(args.page_latency, args.api_latency)
+    print(f"baidu:  {baidu.base_url}/s/1demo  {baidu.base_url}/s/1pwddemo?pwd={BENCH_CODE}")
+    print(f"alipan: {alipan.base_url}/s/demo  {alipan.base_url}/s/pwddemo")
+    v2ex = V2exSite(args.page_latency, args.api_latency).start()
+    print(f"v2ex:   {v2ex.base_url}/mission/daily (send a Cookie: A2=<anything>)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        baidu.stop()
+        alipan.stop()
+        v2ex.stop()
+
+if __name__ == "__main__":
+    main()
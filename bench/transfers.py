@@ -0,0 +1,253 @@
+"""
+Offline transfer benchmark.
+
+Starts the stand-in sites from `bench.sites`, points the adapters at them and
+runs a batch of transfers through the real adapters and BrowserManager:
+
+    python -m bench.transfers --provider baidu --transfers 40 --concurrency 4 --accounts 2
+
+Browser traffic for pan.baidu.com, www.alipan.com and api.aliyundrive.com is
+routed to the stand-ins, so share links keep their production shape. The HTTP
+engines are pointed at the stand-ins through BAIDU_API_BASE / ALIPAN_API_BASE.
+
+Reports per-transfer p50/p95 latency, transfers per minute, the browser pool
+counters and the peak RSS of this process plus its browser children. Use
+`--max-p95` / `--min-rate` to make the run fail on a regression.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from typing import Dict, Any, List, Optional
+from .sites import BENCH_CODE, start_sites, alipan_token
+
+_ROUTED_HOSTS = {
+    "baidu": ["https://pan.baidu.com/**"],
+    "alipan": ["https://www.alipan.com/**", "https://api.aliyundrive.com/**"],
+    "v2ex": ["https://www.v2ex.com/**"],
+}
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0 for an empty sample."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def _tree_rss_kb(root_pid: int) -> int:
+    """Sums VmRSS of `root_pid` and all of its descendants from /proc (Linux only)."""
+    children: Dict[int, List[int]] = {}
+    rss: Dict[int, int] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        pid = int(entry)
+        try:
+            with open(f"/proc/{pid}/stat", "r") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss[pid] = int(line.split()[1])
+                        break
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(pid)
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total
+
+class RssSampler:
+    """Samples the RSS of this process tree in the background and keeps the peak."""
+
+    def __init__(self, interval: float = 0.25) -> None:
+        self.interval = interval
+        self.peak_kb = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self) -> None:
+        if os.path.isdir("/proc"):
+            self.peak_kb = max(self.peak_kb, _tree_rss_kb(os.getpid()))
+
+    async def _run(self) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.sample()
+
+def _links(provider: str, count: int, protected_every: int, prefix: str = "bench") -> List[str]:
+    links = []
+    for i in range(count):
+        protected = protected_every > 0 and i % protected_every == 0
+        if provider == "baidu":
+            surl = f"pwd{prefix}{i:05d}" if protected else f"{prefix}{i:05d}"
+            links.append(f"https://pan.baidu.com/s/1{surl}?pwd={BENCH_CODE}" if protected else f"https://pan.baidu.com/s/1{surl}")
+        else:
+            share_id = f"pwd{prefix}{i:05d}" if protected else f"{prefix}{i:05d}"
+            links.append(f"https://www.alipan.com/s/{share_id} 提取码: {BENCH_CODE}" if protected else f"https://www.alipan.com/s/{share_id}")
+    return links
+
+def _seed_alipan_token(user_data_dir: str, account: str) -> None:
+    path = os.path.join(user_data_dir, account, "storage_state.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    state = {"cookies": [], "origins": [{"origin": "https://www.alipan.com", "localStorage": [{"name": "token", "value": alipan_token()}]}]}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+def _route_to(manager, provider: str, base_url: str) -> None:
+    """Wraps manager.new_context so every new context sends the provider's hosts to the stand-in."""
+    original = manager.new_context
+    routed = set()
+
+    async def _handle(route) -> None:
+        url = route.request.url
+        path = url.split("://", 1)[1].split("/", 1)[1] if url.count("/") >= 3 else ""
+        # Forward the context's cookies for the production host; the stand-in's own host has none
+        headers = {k: v for k, v in (await route.request.all_headers()).items() if not k.startswith(":")}
+        response = await route.fetch(url=f"{base_url}/{path}", headers=headers, max_redirects=0)
+        await route.fulfill(response=response)
+
+    async def new_context(user_data_dir, cookie_str=None):
+        ctx = await original(user_data_dir, cookie_str)
+        if id(ctx) not in routed:
+            for pattern in _ROUTED_HOSTS[provider]:
+                await ctx.route(pattern, _handle)
+            routed.add(id(ctx))
+        return ctx
+
+    manager.new_context = new_context
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    baidu_site, alipan_site = start_sites(args.page_latency, args.api_latency, f"/{args.target_folder}")
+    site = baidu_site if args.provider == "baidu" else alipan_site
+    os.environ.setdefault("STORAGE_DIR", tempfile.mkdtemp(prefix="pss-bench-"))
+    os.environ["BAIDU_TARGET_FOLDER"] = os.environ["ALIPAN_TARGET_FOLDER"] = args.target_folder
+    os.environ["BAIDU_TRANSFER_ENGINE"] = os.environ["ALIPAN_TRANSFER_ENGINE"] = args.engine
+    os.environ["BAIDU_API_BASE"] = baidu_site.base_url
+    os.environ["ALIPAN_API_BASE"] = alipan_site.base_url
+    # Configuration is read at import time, so the app is imported only now
+    from app.browser import manager
+    from app.adapters.registry import resolve_adapter_from_provider
+    from app.utils.http import close_client
+
+    adapter = resolve_adapter_from_provider(args.provider)
+    _route_to(manager, args.provider, site.base_url)
+    accounts = [f"bench{n}" for n in range(args.accounts)]
+    if args.provider == "alipan":
+        for account in accounts:
+            _seed_alipan_token(adapter.user_data_dir, account)
+    cookie_str = "BDUSS=bench; STOKEN=bench" if args.provider == "baidu" else None
+
+    links = _links(args.provider, args.transfers, args.protected_every)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    sem = asyncio.Semaphore(args.concurrency)
+    sampler = RssSampler()
+
+    async def _one(i: int, link: str) -> None:
+        async with sem:
+            start = time.perf_counter()
+            try:
+                result = await adapter.transfer(link, account=accounts[i % len(accounts)], cookie_str=cookie_str)
+                status = result.get("status", "error")
+            except Exception as e:
+                print(f"transfer {i} raised: {e}", file=sys.stderr)
+                status = "error"
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    await manager.start()
+    sampler.start()
+    if args.warmup:
+        await asyncio.gather(*[_one(i, link) for i, link in enumerate(_links(args.provider, len(accounts), 0, prefix="warmup"))])
+        latencies.clear()
+        statuses.clear()
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*[_one(i, link) for i, link in enumerate(links)])
+        elapsed = time.perf_counter() - started
+    finally:
+        await sampler.stop()
+        await close_client()
+        pool = manager.stats()
+        await manager.stop()
+        baidu_site.stop()
+        alipan_site.stop()
+
+    return {
+        "provider": args.provider,
+        "engine": args.engine,
+        "transfers": len(links),
+        "concurrency": args.concurrency,
+        "accounts": len(accounts),
+        "statuses": statuses,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "max_ms": round(max(latencies), 1) if latencies else 0.0,
+        "transfers_per_min": round(len(latencies) / elapsed * 60, 1) if elapsed > 0 else 0.0,
+        "elapsed_s": round(elapsed, 2),
+        "peak_rss_mb": round(sampler.peak_kb / 1024, 1),
+        "pool": {k: pool[k] for k in ("mode", "max_contexts", "hits", "misses", "evictions", "waits", "timeouts")},
+        "site_hits": dict(sorted(site.hits.items())),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark transfers against local stand-in share sites")
+    parser.add_argument("--provider", choices=["baidu", "alipan"], default="baidu")
+    parser.add_argument("--engine", choices=["browser", "http", "auto"], default="browser", help="transfer engine to exercise")
+    parser.add_argument("--transfers", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--accounts", type=int, default=1)
+    parser.add_argument("--protected-every", type=int, default=2, help="every Nth link needs an extraction code (0 = none)")
+    parser.add_argument("--page-latency", type=int, default=50, help="stand-in delay per HTML page in ms")
+    parser.add_argument("--api-latency", type=int, default=30, help="stand-in delay per API response in ms")
+    parser.add_argument("--target-folder", default="bench", help="target folder name (empty for the drive root)")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="include cold context start-up in the sample")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--max-p95", type=float, default=0, help="exit 1 when p95 latency exceeds this many ms")
+    parser.add_argument("--min-rate", type=float, default=0, help="exit 1 when throughput is below this many transfers/min")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"{report['provider']} ({report['engine']}): {report['transfers']} transfers, concurrency {report['concurrency']}, {report['accounts']} account(s)")
+        print(f"  statuses      {report['statuses']}")
+        print(f"  latency       p50={report['p50_ms']}ms p95={report['p95_ms']}ms max={report['max_ms']}ms")
+        print(f"  throughput    {report['transfers_per_min']} transfers/min ({report['elapsed_s']}s)")
+        print(f"  peak RSS      {report['peak_rss_mb']} MB (process + browser)")
+        print(f"  browser pool  {report['pool']}")
+
+    failed = False
+    if args.max_p95 and report["p95_ms"] > args.max_p95:
+        print(f"p95 {report['p95_ms']}ms exceeds --max-p95 {args.max_p95}ms", file=sys.stderr)
+        failed = True
+    if args.min_rate and report["transfers_per_min"] < args.min_rate:
+        print(f"throughput {report['transfers_per_min']}/min is below --min-rate {args.min_rate}/min", file=sys.stderr)
+        failed = True
+    if report["statuses"].get("success", 0) != report["transfers"]:
+        print(f"not every transfer succeeded: {report['statuses']}", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()